@@ -0,0 +1,186 @@
+"""Module handling advice on the indexes of the database."""
+
+import itertools
+import re
+import time
+from contextlib import closing
+from sqlite3 import connect
+
+from query import LuxQuery, FILTER_KEYS, DETAILS_RELATIONS, build_statement, build_count_statement
+from terms import default_terms
+from lux_query_sql import (LUX_INDEXES, CREATE_LUX_INDEX, DETAILS_LABEL, DIRTY_TRIGGERS,
+                           SEARCH_TABLE)
+
+# tables the queries of the project read, whose indexes are checked
+PROJECT_TABLES = ["objects", "agents", "productions", "nationalities", "agents_nationalities",
+                  "classifiers", "objects_classifiers", "departments", "objects_departments",
+                  "references", SEARCH_TABLE]
+
+# number of objects the details queries are run for
+DETAILS_SAMPLE = 100
+
+# index names in the detail lines of EXPLAIN QUERY PLAN
+PLAN_INDEX = re.compile(r"USING (?:COVERING )?INDEX (\S+)")
+
+class LuxIndexAdvisor():
+    """Class to represent advice on the indexes of one database file.
+    Stores the database file and the search terms the query shapes are run with.
+
+    The query shapes are the statements the project generates: a search and a count
+    for every combination of filters, each details query, and the lookups of the dirty
+    triggers. An index of LUX_INDEXES is missing if no index on its table starts with
+    its columns; a created index is unused if no query shape's plan uses it.
+    """
+
+    def __init__(self, db_file, terms=None):
+        """Initalizes the advisor with the database file.
+
+        Args:
+            db_file (str): database file
+            terms (dict): search term for each filter, by default picked from the database
+        """
+
+        self._db_file = db_file
+        self._query = LuxQuery(db_file)
+        self._terms = dict(terms or {})
+        for key, term in default_terms(db_file).items():
+            self._terms.setdefault(key, term)
+
+    def advise(self, create=False, analyze=False, repeat=1):
+        """Reports the missing and unused indexes and, if asked to, creates the
+        missing ones and runs ANALYZE, timing every query shape before and after.
+
+        Args:
+            create (bool): create the missing indexes, then run ANALYZE
+            analyze (bool): run ANALYZE even if no index is created
+            repeat (int): number of runs each query shape is timed over; the median is kept
+
+        Return:
+            dict: "missing" and "unused" indexes as (name, table, columns), "created"
+            index names and "timings" as [shape, ms before, ms after] when anything changed
+        """
+
+        with closing(connect(self._db_file, isolation_level=None)) as connection:
+            shapes = self.query_shapes(connection)
+            report = {"missing": self.missing_indexes(connection),
+                      "unused": self.unused_indexes(connection, shapes),
+                      "created": [], "timings": None}
+
+            if not (create and report["missing"]) and not analyze:
+                return report
+
+            before = self.time_shapes(connection, shapes, repeat)
+            if create:
+                for name, table, columns in report["missing"]:
+                    connection.execute(CREATE_LUX_INDEX.format(
+                        name=name, table=table, columns=", ".join(columns)))
+                    report["created"].append(name)
+            connection.execute("ANALYZE")
+            after = self.time_shapes(connection, shapes, repeat)
+
+            report["timings"] = [[name, before[name], after[name]] for name in before]
+            report["missing"] = self.missing_indexes(connection)
+            report["unused"] = self.unused_indexes(connection, shapes)
+
+        return report
+
+    def query_shapes(self, connection):
+        """Returns the statements the project generates for this database,
+        with parameters to run them with.
+
+        Args:
+            connection (sqlite3.Connection): connection to the database
+
+        Return:
+            list: (name, SQL statement, parameters) for each query shape
+        """
+
+        shapes = []
+        with closing(connection.cursor()) as cursor:
+            for size in range(len(FILTER_KEYS) + 1):
+                for keys in itertools.combinations(FILTER_KEYS, size):
+                    terms = {key: (self._terms[key] if key in keys else None)
+                             for key in FILTER_KEYS}
+                    shape, params = self._query.statement_shape(cursor, terms)
+                    indexed, present, narrowed = shape[:3]
+                    name = ",".join(keys)
+                    shapes.append((f"search[{name}]", build_statement(*shape), params))
+                    # as in LuxQuery.count, the live count does not narrow separately
+                    count_params = params if indexed else params[len(narrowed):]
+                    shapes.append((f"count[{name}]",
+                                   build_count_statement(indexed, present, narrowed, shape[4]),
+                                   count_params))
+
+            cursor.execute("SELECT id FROM objects ORDER BY id LIMIT ?", [DETAILS_SAMPLE])
+            ids = [row[0] for row in cursor.fetchall()]
+        placeholders = ", ".join("?" * len(ids))
+        shapes.append(("details[label]", DETAILS_LABEL.format(ids=placeholders), ids))
+        for relation, smt_str in DETAILS_RELATIONS.items():
+            shapes.append((f"details[{relation}]", smt_str.format(ids=placeholders), ids))
+
+        # the triggers that look up the objects of a changed agent, classifier or department
+        for name, _, _, select in DIRTY_TRIGGERS:
+            if " FROM " in select:
+                smt_str = select.replace("OLD.id", "?").replace("NEW.id", "?")
+                shapes.append((f"trigger[{name}]", smt_str, [1] * smt_str.count("?")))
+
+        return shapes
+
+    def existing_indexes(self, connection):
+        """Returns every index on the project's tables.
+
+        Return:
+            dict: (table, columns, origin) for each index name, origin being
+            c for created indexes and pk or u for those of constraints
+        """
+
+        indexes = {}
+        for table in PROJECT_TABLES:
+            for _, name, _, origin, _ in connection.execute(f'PRAGMA index_list("{table}")'):
+                columns = tuple(row[2] for row in sorted(
+                    connection.execute(f'PRAGMA index_info("{name}")')))
+                indexes[name] = (table, columns, origin)
+        return indexes
+
+    def missing_indexes(self, connection):
+        """Returns the indexes of LUX_INDEXES whose table exists but has no index
+        starting with their columns, as (name, table, columns)."""
+
+        existing = self.existing_indexes(connection)
+        tables = {row[0] for row in connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+        missing = []
+        for name, table, columns in LUX_INDEXES:
+            if table in tables and not any(
+                    index_table == table and index_columns[:len(columns)] == columns
+                    for index_table, index_columns, _ in existing.values()):
+                missing.append((name, table, columns))
+        return missing
+
+    def unused_indexes(self, connection, shapes):
+        """Returns the created indexes on the project's tables that no query shape's
+        plan uses, as (name, table, columns)."""
+
+        used = set()
+        for _, smt_str, params in shapes:
+            for row in connection.execute("EXPLAIN QUERY PLAN " + smt_str, params):
+                used.update(PLAN_INDEX.findall(row[3]))
+
+        return [(name, table, columns)
+                for name, (table, columns, origin) in self.existing_indexes(connection).items()
+                if origin == "c" and name not in used]
+
+    def time_shapes(self, connection, shapes, repeat=1):
+        """Runs every query shape repeat times and returns the median time in
+        milliseconds for each name."""
+
+        timings = {}
+        for name, smt_str, params in shapes:
+            times = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                connection.execute(smt_str, params).fetchall()
+                times.append((time.perf_counter() - start) * 1000)
+            timings[name] = sorted(times)[len(times) // 2]
+        return timings
@@ -0,0 +1,156 @@
+"""Module handling asyncio access to the database queries."""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from pool import ConnectionPool
+from query import LuxQuery, LuxDetailsQuery
+
+class AsyncQuery():
+    """Abstract class running the blocking searches of a query class on a dedicated,
+    bounded thread pool, so the event loop is never blocked.
+    AsyncQuery should be instantiated as AsyncLuxQuery or AsyncLuxDetailsQuery.
+
+    There is one worker thread per pooled connection. When an awaiting task is
+    cancelled or times out, the statements running on the connections its worker
+    checked out are interrupted so the worker and its connections are freed right
+    away. Connections are found by the task they were checked out for rather than
+    by worker thread, as a generator may keep one across calls on different workers.
+    """
+
+    def __init__(self, db_file, pool=None, size=None):
+        """Initalizes the thread pool and the connection pool behind it.
+
+        Args:
+            db_file (str): database file
+            pool (ConnectionPool): pool to take connections from,
+                by default a read-only pool of its own
+            size (int): size of the pool created when none is given
+        """
+
+        self._db_file = db_file
+        self._pool = pool or ConnectionPool(db_file, size=size)
+        self._executor = ThreadPoolExecutor(max_workers=self._pool.size,
+                                            thread_name_prefix="lux-query")
+
+    async def run(self, func, *args, timeout=None, owner=None, **kwargs):
+        """Runs func(*args, **kwargs) on a worker thread and returns its result.
+
+        Args:
+            func (callable): blocking function using the connection pool
+            timeout (float): seconds to wait before interrupting it, by default no limit
+            owner (object): token the connections func checks out are held on behalf of
+                (see ConnectionPool.owned_by), by default one of this call's own; calls
+                continuing each other's work, like the pages of a generator, share one
+
+        Raises:
+            asyncio.TimeoutError: if func did not finish within timeout
+            asyncio.CancelledError: if the awaiting task was cancelled
+        """
+
+        owner = object() if owner is None else owner
+        state = {"running": False, "cancelled": False}
+        lock = threading.Lock()
+
+        # a cancellation only interrupts while func runs, and the worker only
+        # stops running func once no cancellation is interrupting it
+        def call():
+            with lock:
+                if state["cancelled"]:
+                    raise asyncio.CancelledError
+                state["running"] = True
+            try:
+                with self._pool.owned_by(owner):
+                    return func(*args, **kwargs)
+            finally:
+                with lock:
+                    state["running"] = False
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, call)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            with lock:
+                state["cancelled"] = True
+                if state["running"]:
+                    self._pool.interrupt(owner)
+            raise
+
+    def close(self):
+        """Stops the worker threads once they are done and closes the pooled connections."""
+
+        self._executor.shutdown(wait=True)
+        self._pool.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+class AsyncLuxQuery(AsyncQuery):
+    """Class to represent querying the database for objects from asyncio code.
+    Offers the searches of LuxQuery as coroutines.
+    """
+
+    def __init__(self, db_file, pool=None, size=None, cache=None):
+        """Initalizes the class with the database file.
+
+        Args:
+            db_file, pool, size: as for AsyncQuery
+            cache (ResultCache): cache for search results, by default none
+        """
+
+        super().__init__(db_file, pool, size)
+        self._query = LuxQuery(db_file, self._pool, cache)
+
+    async def search(self, dep=None, agt=None, classifier=None, label=None, *, timeout=None):
+        """Coroutine version of LuxQuery.search."""
+
+        return await self.run(self._query.search, dep, agt, classifier, label, timeout=timeout)
+
+    async def count(self, dep=None, agt=None, classifier=None, label=None, *, timeout=None):
+        """Coroutine version of LuxQuery.count."""
+
+        return await self.run(self._query.count, dep, agt, classifier, label, timeout=timeout)
+
+    async def iter_pages(self, dep=None, agt=None, classifier=None, label=None, *,
+                         page_size=None, timeout=None):
+        """Asynchronous generator version of LuxQuery.iter_pages;
+        timeout applies to fetching each page."""
+
+        kwargs = {} if page_size is None else {"page_size": page_size}
+        pages = self._query.iter_pages(dep, agt, classifier, label, **kwargs)
+        # the connection a page is read on may stay checked out for the next one
+        owner = object()
+        while (page := await self.run(next, pages, None, timeout=timeout,
+                                      owner=owner)) is not None:
+            yield page
+
+class AsyncLuxDetailsQuery(AsyncQuery):
+    """Class to represent querying the database for object details from asyncio code.
+    Offers the searches of LuxDetailsQuery as coroutines.
+    """
+
+    def __init__(self, db_file, pool=None, size=None, cache=None):
+        """Initalizes the class with the database file.
+
+        Args:
+            db_file, pool, size: as for AsyncQuery
+            cache (ResultCache): cache for search results, by default none
+        """
+
+        super().__init__(db_file, pool, size)
+        self._query = LuxDetailsQuery(db_file, self._pool, cache)
+
+    async def search(self, obj_id, *, timeout=None):
+        """Coroutine version of LuxDetailsQuery.search."""
+
+        return await self.run(self._query.search, obj_id, timeout=timeout)
+
+    async def search_many(self, obj_ids, *, timeout=None):
+        """Coroutine version of LuxDetailsQuery.search_many."""
+
+        return await self.run(self._query.search_many, list(obj_ids), timeout=timeout)
@@ -0,0 +1,252 @@
+"""Module handling benchmarks of searches, object details and table rendering.
+
+Results are plain dictionaries that can be saved as JSON and compared with the
+results of another commit run against the same database (see luxsynth.py).
+"""
+
+import itertools
+import os
+import platform
+import resource
+import sqlite3
+import subprocess
+import time
+import tracemalloc
+from contextlib import closing
+from datetime import datetime, timezone
+
+from query import LuxQuery, LuxDetailsQuery, FILTER_KEYS
+from terms import default_terms
+from memquery import InMemoryLuxQuery
+import table
+from table import Table
+
+# default number of timed runs per case, and of untimed runs before them
+REPEAT = 20
+WARMUP = 2
+
+# default number of objects with the most related rows to time the details of
+DETAILS_OBJECTS = 10
+
+# percentiles reported for each case
+PERCENTILES = (50, 90, 99)
+
+# width tables are rendered at, so results do not depend on the terminal
+TABLE_WIDTH = 100
+
+# backends LuxQuery.search can be timed on
+BACKENDS = {"sql": LuxQuery, "memory": InMemoryLuxQuery}
+
+class LuxBench():
+    """Class to represent a benchmark run against one database file.
+    Stores the queries timed and how often each case is run.
+
+    The cases are LuxQuery.search for every combination of filters, LuxDetailsQuery.search
+    for the objects with the most related rows, and Table rendering of search and details
+    results. Neither query has a result cache, so every run goes to the database.
+    """
+
+    def __init__(self, db_file, *, repeat=REPEAT, warmup=WARMUP, backend="sql",
+                 terms=None, details_objects=DETAILS_OBJECTS):
+        """Initalizes the benchmark with the database file.
+
+        Args:
+            db_file (str): database file
+            repeat (int): number of timed runs per case
+            warmup (int): number of untimed runs per case before the timed ones
+            backend (str): sql or memory, the LuxQuery class searches are timed on
+            terms (dict): search term for each filter, by default picked from the database
+            details_objects (int): number of objects to time the details of
+        """
+
+        assert repeat > 0, "repeat must be positive."
+
+        self._db_file = db_file
+        self._repeat = repeat
+        self._warmup = warmup
+        self._backend = backend
+        self._details_objects = details_objects
+        self._query = BACKENDS[backend](db_file)
+        self._details_query = LuxDetailsQuery(db_file)
+        self._terms = dict(terms or {})
+        for key, term in default_terms(db_file).items():
+            self._terms.setdefault(key, term)
+
+    def run(self, only=None):
+        """Runs every case, or those whose name starts with only.
+
+        Return:
+            dict: "environment" (see environment) and "cases",
+            the measurements of each case by name (see measure)
+        """
+
+        cases = {}
+        # a case may come with a function to run, untimed, before each run
+        for name, func, *setup in itertools.chain(self.search_cases(), self.details_cases(),
+                                                  self.table_cases()):
+            if only is None or name.startswith(only):
+                cases[name] = self.measure(func, *setup)
+
+        return {"environment": self.environment(), "cases": cases}
+
+    def search_cases(self):
+        """Generator yielding (name, function) for a search with every combination of filters."""
+
+        for size in range(len(FILTER_KEYS) + 1):
+            for keys in itertools.combinations(FILTER_KEYS, size):
+                terms = {key: self._terms[key] for key in keys}
+                name = "search[" + ",".join(keys) + "]"
+                yield name, lambda terms=terms: self._query.search(**terms)
+
+    def details_cases(self):
+        """Generator yielding (name, function) for the details of the objects with
+        the most related rows, one at a time and all at once."""
+
+        obj_ids = self.high_fanout_objects()
+        if not obj_ids:
+            return
+
+        cycle = itertools.cycle(obj_ids)
+        yield "details[high-fanout]", lambda: self._details_query.search(next(cycle))
+        yield "details_many[high-fanout]", lambda: self._details_query.search_many(obj_ids)
+
+    def table_cases(self):
+        """Generator yielding (name, function, setup) for rendering the table of a search
+        without filters and the Produced By table of the object with the most agents.
+
+        As the same rows are rendered on every run, table cases start each run with an
+        empty cell layout cache, and table_warm cases with the layouts of the previous run.
+        """
+
+        renders = {}
+        response = self._query.search()
+        renders["search"] = lambda: str(Table(response[1], response[3],
+                                              format_str=response[2], max_width=TABLE_WIDTH))
+
+        obj_ids = self.high_fanout_objects()
+        if obj_ids:
+            details = self._details_query.search(obj_ids[0])
+            renders["details"] = lambda: str(Table(details[0], details[4],
+                                                   format_str=details[3], max_width=TABLE_WIDTH))
+
+        # pylint: disable=protected-access
+        for name, func in renders.items():
+            yield f"table[{name}]", func, table._cell_lines.cache_clear
+        for name, func in renders.items():
+            yield f"table_warm[{name}]", func, None
+
+    def measure(self, func, setup=None):
+        """Times func and measures the memory it allocates.
+
+        Args:
+            func (callable): the case to run
+            setup (callable): function run before each run of func, untimed
+
+        Return:
+            dict: number of runs, min, mean, max and percentiles of the run times
+            in milliseconds, and the peak of memory allocated by one run in KiB
+        """
+
+        setup = setup or (lambda: None)
+
+        for _ in range(self._warmup):
+            setup()
+            func()
+
+        times = []
+        for _ in range(self._repeat):
+            setup()
+            start = time.perf_counter()
+            func()
+            times.append((time.perf_counter() - start) * 1000)
+        times.sort()
+
+        # memory is measured on a run of its own, tracing slows the run down
+        setup()
+        tracemalloc.start()
+        try:
+            func()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        result = {"runs": len(times), "min_ms": times[0],
+                  "mean_ms": sum(times) / len(times), "max_ms": times[-1]}
+        for pct in PERCENTILES:
+            result[f"p{pct}_ms"] = percentile(times, pct)
+        result["peak_kib"] = peak / 1024
+
+        return result
+
+    def high_fanout_objects(self):
+        """Returns the ids of the objects with the most agents and references."""
+
+        with closing(sqlite3.connect(self._db_file)) as connection:
+            rows = connection.execute(
+                """SELECT obj_id FROM (
+                    SELECT obj_id FROM productions UNION ALL
+                    SELECT obj_id FROM "references")
+                GROUP BY obj_id ORDER BY COUNT(*) DESC, obj_id LIMIT ?""",
+                [self._details_objects]).fetchall()
+
+        return [row[0] for row in rows]
+
+    def environment(self):
+        """Returns what the results depend on besides the code: the commit, the versions
+        of Python and SQLite, the machine, the database and the benchmark settings."""
+
+        commit = None
+        try:
+            commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                                    cwd=os.path.dirname(os.path.abspath(__file__)),
+                                    capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            pass
+
+        with closing(sqlite3.connect(self._db_file)) as connection:
+            objects = connection.execute("SELECT COUNT(*) FROM objects").fetchone()[0]
+
+        return {
+            "commit": commit,
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "machine": platform.machine(),
+            "db": os.path.abspath(self._db_file),
+            "db_bytes": os.path.getsize(self._db_file),
+            "objects": objects,
+            "backend": self._backend,
+            "repeat": self._repeat,
+            "warmup": self._warmup,
+            "terms": self._terms,
+            "max_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        }
+
+def percentile(times, pct):
+    """Returns the pct-th percentile of sorted times, by the nearest-rank method."""
+
+    rank = max(1, -(-len(times) * pct // 100))
+    return times[min(rank, len(times)) - 1]
+
+def compare(baseline, results, stat="p50_ms"):
+    """Compares the cases of two benchmark results.
+
+    Args:
+        baseline (dict): earlier results, as returned by LuxBench.run
+        results (dict): later results
+        stat (str): measurement to compare
+
+    Return:
+        list: [case, baseline value, value, change in percent] for every case in both,
+        the change being None if the baseline value is 0
+    """
+
+    rows = []
+    for name, result in results["cases"].items():
+        if name in baseline["cases"]:
+            before = baseline["cases"][name][stat]
+            after = result[stat]
+            change = (after - before) / before * 100 if before else None
+            rows.append([name, before, after, change])
+
+    return rows
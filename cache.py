@@ -0,0 +1,154 @@
+"""Module handling an in-process cache of query results."""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from sqlite3 import connect, Error
+from urllib.parse import quote, unquote, urlsplit
+
+class ResultCache():
+    """Class to represent a least-recently-used cache of search results for one database file.
+
+    Every lookup first checks whether the database changed, either through the
+    modification time of the database file (and its write-ahead log) or through
+    PRAGMA data_version, and empties the cache if it did. A result is only stored if
+    the database did not change while it was computed (see stamp), and never if
+    neither could be checked. Cached results are shared between callers and should
+    not be modified.
+    """
+
+    # Default values for the cache; these can be overridden at init-time.
+    _MAXSIZE = 256
+    _TTL = None
+
+    def __init__(self, db_file, *, maxsize=None, ttl=None):
+        """Initalizes an empty cache for the given database file.
+
+        Args:
+            db_file (str): database file the cached results come from, or a file: URI
+            maxsize (int): maximum number of results kept
+            ttl (float): seconds a result stays valid, by default until the database changes
+        """
+
+        assert (maxsize is None) or (maxsize > 0), "maxsize must be positive."
+        assert (ttl is None) or (ttl > 0), "ttl must be positive."
+
+        # a file: URI is watched through the file it names
+        if db_file.startswith("file:"):
+            self._db_path = unquote(urlsplit(db_file).path)
+            self._db_uri = db_file
+        else:
+            self._db_path = db_file
+            self._db_uri = "file:" + quote(os.path.abspath(db_file)) + "?mode=ro"
+
+        self._maxsize = maxsize or ResultCache._MAXSIZE
+        self._ttl = ttl or ResultCache._TTL
+
+        self._entries = OrderedDict()
+        self._stamp = None
+        self._watcher = None
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Returns the result cached under key, or default if there is none
+        or the database changed since it was stored."""
+
+        with self._lock:
+            self._check_stamp()
+            entry = self._entries.get(key)
+            if entry is not None and self._ttl and entry[1] < time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[0]
+
+    def stamp(self):
+        """Returns a value identifying the current state of the database, to be taken
+        before running the query whose result is then stored with put."""
+
+        with self._lock:
+            self._check_stamp()
+            return self._stamp
+
+    def put(self, key, value, stamp):
+        """Stores value under key, evicting the least recently used result if the cache is full.
+        The value is dropped if the database changed since stamp was taken, as it may
+        have been computed from the data as it was before the change.
+
+        Args:
+            key: key to store the value under
+            value: result to store
+            stamp: return value of stamp taken before the result was computed
+        """
+
+        with self._lock:
+            self._check_stamp()
+            if stamp is None or stamp != self._stamp:
+                return
+            expires = time.monotonic() + self._ttl if self._ttl else None
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Removes every cached result."""
+
+        with self._lock:
+            self._entries.clear()
+
+    def info(self):
+        """Returns a dictionary with the hits, misses, maxsize and current size of the cache."""
+
+        with self._lock:
+            return {"hits": self._hits, "misses": self._misses,
+                    "maxsize": self._maxsize, "currsize": len(self._entries)}
+
+    def __len__(self):
+        """Returns the number of cached results."""
+
+        return len(self._entries)
+
+# **************************************
+# *           BEGIN PRIVATE            *
+# **************************************
+
+    def _check_stamp(self):
+        """Empties the cache if the database changed since the last lookup."""
+
+        stamp = self._current_stamp()
+        if stamp != self._stamp:
+            self._entries.clear()
+            self._stamp = stamp
+
+    def _current_stamp(self):
+        """Returns a value that changes whenever the database does,
+        or None if there is no way to tell."""
+
+        mtimes = []
+        for path in (self._db_path, self._db_path + "-wal"):
+            try:
+                mtimes.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                mtimes.append(None)
+
+        # data_version only changes for commits made by other connections,
+        # so a connection of its own is kept just for asking
+        try:
+            if self._watcher is None:
+                self._watcher = connect(self._db_uri, uri=True, check_same_thread=False)
+            data_version = self._watcher.execute("PRAGMA data_version").fetchone()[0]
+        except Error:
+            self._watcher = None
+            data_version = None
+
+        if data_version is None and mtimes == [None, None]:
+            return None
+        return tuple(mtimes), data_version
@@ -0,0 +1,217 @@
+"""Module handling the export of the search corpus to columnar files for analytics.
+
+Arrow IPC and Parquet files need pyarrow; without it, the corpus can still be
+exported to a NumPy .npz file, which needs numpy.
+"""
+
+import os
+import zipfile
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from query import LuxQuery
+
+# export format for each file extension
+EXPORT_FORMATS = {".arrow": "arrow", ".parquet": "parquet", ".npz": "npz"}
+
+# rows fetched and written at a time
+CHUNK_SIZE = 65536
+
+class ExportError(Exception):
+    """Exception class to handle exports the installed packages cannot write or read."""
+
+class LuxExport():
+    """Class to represent the export of every search result to a columnar file.
+    Stores the query the results are read with.
+
+    The file holds one row per result of a search without criteria, in the same
+    order, with the columns of LuxQuery.column_keys: id as a 64-bit integer and
+    every other column as a (nullable) string.
+    """
+
+    def __init__(self, db_file, pool=None):
+        """Initalizes the class with the database file.
+
+        Args:
+            db_file (str): database file
+            pool (ConnectionPool): pool to take connections from,
+                by default a read-only pool of its own
+        """
+
+        self._query = LuxQuery(db_file, pool)
+
+    def export(self, path, export_format=None, chunk_size=CHUNK_SIZE):
+        """Writes the corpus to path, chunk_size rows at a time,
+        so only one chunk is held in memory.
+
+        Args:
+            path (str): file to write
+            export_format (str): arrow, parquet or npz,
+                by default guessed from the extension of path
+            chunk_size (int): number of rows per chunk (record batch, row group or set of arrays)
+
+        Return:
+            int: number of rows written
+
+        Raises:
+            ExportError: if the package the format needs is not installed
+        """
+
+        export_format = export_format or guess_format(path)
+        keys = self._query.column_keys
+        chunks = self._query.iter_pages(page_size=chunk_size)
+
+        if export_format == "npz":
+            return write_npz(path, keys, chunks)
+        return write_arrow(path, keys, chunks, parquet=export_format == "parquet")
+
+def guess_format(path):
+    """Returns the export format for the extension of path: arrow if there is none
+    (or it is unknown) and pyarrow is installed, npz otherwise."""
+
+    extension = os.path.splitext(path)[1].lower()
+    if extension in EXPORT_FORMATS:
+        return EXPORT_FORMATS[extension]
+    return "arrow" if pyarrow is not None else "npz"
+
+def write_arrow(path, keys, chunks, parquet=False):
+    """Writes chunks of rows to an Arrow IPC file, one record batch per chunk,
+    or to a Parquet file, one row group per chunk.
+
+    Args:
+        path (str): file to write
+        keys (list): names of the columns, id first
+        chunks (iterable): lists of rows
+        parquet (bool): write Parquet instead of Arrow IPC
+
+    Return:
+        int: number of rows written
+    """
+
+    if pyarrow is None:
+        raise ExportError("exporting to Arrow or Parquet needs pyarrow")
+
+    schema = pyarrow.schema([(key, pyarrow.int64() if key == "id" else pyarrow.string())
+                             for key in keys])
+    if parquet:
+        writer = pyarrow.parquet.ParquetWriter(path, schema)
+    else:
+        writer = pyarrow.ipc.new_file(path, schema)
+
+    count = 0
+    with writer:
+        for rows in chunks:
+            columns = [column_values(key, rows, idx) for idx, key in enumerate(keys)]
+            batch = pyarrow.record_batch(columns, schema=schema)
+            if parquet:
+                writer.write_batch(batch, row_group_size=len(rows))
+            else:
+                writer.write_batch(batch)
+            count += len(rows)
+
+    return count
+
+def write_npz(path, keys, chunks):
+    """Writes chunks of rows to a NumPy .npz file without holding more than one chunk.
+
+    Each chunk i of a column is stored as the array "<column>.<i>"; string columns are
+    unicode arrays, with None stored as "" and flagged in the boolean array "<column>.null.<i>".
+    The arrays "columns" and "chunks" hold the column names and the number of chunks.
+    read_export puts the chunks back together.
+
+    Args:
+        path (str): file to write
+        keys (list): names of the columns, id first
+        chunks (iterable): lists of rows
+
+    Return:
+        int: number of rows written
+    """
+
+    if numpy is None:
+        raise ExportError("exporting to .npz needs numpy (or pyarrow for .arrow and .parquet)")
+
+    def add(archive, name, array):
+        with archive.open(name + ".npy", "w", force_zip64=True) as file:
+            numpy.lib.format.write_array(file, array, allow_pickle=False)
+
+    count = 0
+    number = 0
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for rows in chunks:
+            for idx, key in enumerate(keys):
+                values = column_values(key, rows, idx)
+                if key == "id":
+                    add(archive, f"{key}.{number}", numpy.array(values, dtype=numpy.int64))
+                else:
+                    add(archive, f"{key}.{number}",
+                        numpy.array(["" if v is None else v for v in values], dtype=str))
+                    add(archive, f"{key}.null.{number}",
+                        numpy.array([v is None for v in values], dtype=bool))
+            count += len(rows)
+            number += 1
+
+        add(archive, "columns", numpy.array(keys, dtype=str))
+        add(archive, "chunks", numpy.array(number, dtype=numpy.int64))
+
+    return count
+
+def read_export(path, export_format=None):
+    """Reads back a file written by LuxExport.export.
+
+    Args:
+        path (str): file to read
+        export_format (str): arrow, parquet or npz, by default guessed from the extension of path
+
+    Return:
+        dict: the values of each column as a list, with None for nulls
+    """
+
+    export_format = export_format or guess_format(path)
+
+    if export_format == "npz":
+        if numpy is None:
+            raise ExportError("reading .npz exports needs numpy")
+        with numpy.load(path) as npz:
+            keys = npz["columns"].tolist()
+            chunks = range(int(npz["chunks"]))
+            data = {}
+            for key in keys:
+                data[key] = []
+                for number in chunks:
+                    values = npz[f"{key}.{number}"].tolist()
+                    if key != "id":
+                        nulls = npz[f"{key}.null.{number}"].tolist()
+                        values = [None if null else v for v, null in zip(values, nulls)]
+                    data[key] += values
+            return data
+
+    if pyarrow is None:
+        raise ExportError("reading Arrow or Parquet exports needs pyarrow")
+    if export_format == "parquet":
+        return pyarrow.parquet.read_table(path).to_pydict()
+    with pyarrow.ipc.open_file(path) as reader:
+        return reader.read_all().to_pydict()
+
+def column_values(key, rows, idx):
+    """Returns the values of column idx of rows, with every column but id as strings.
+
+    Args:
+        key (str): name of the column
+        rows (list): rows of a chunk
+        idx (int): index of the column in each row
+    """
+
+    if key == "id":
+        return [row[idx] for row in rows]
+    return [None if row[idx] is None else str(row[idx]) for row in rows]
@@ -0,0 +1,124 @@
+"""Module handling the search indexes kept alongside the database."""
+
+from contextlib import closing
+from sqlite3 import connect
+from lux_query_sql import (SEARCH_TABLE, SEARCH_DEPARTMENTS_TABLE, DIRTY_TABLE, FTS_TABLE,
+                           DROP_SEARCH_TABLE, CREATE_SEARCH_TABLE, CREATE_SEARCH_TABLE_INDEXES,
+                           POPULATE_SEARCH_TABLE, DROP_SEARCH_DEPARTMENTS_TABLE,
+                           CREATE_SEARCH_DEPARTMENTS_TABLE, POPULATE_SEARCH_DEPARTMENTS_TABLE,
+                           DROP_DIRTY_TABLE, CREATE_DIRTY_TABLE,
+                           DIRTY_TRIGGERS, DROP_DIRTY_TRIGGER, CREATE_DIRTY_TRIGGER,
+                           CLASSIFIER_NAMES_TABLE, CLASSIFIER_NAMES_STORED,
+                           DROP_CLASSIFIER_NAMES_TABLE, CREATE_CLASSIFIER_NAMES_TABLE,
+                           POPULATE_CLASSIFIER_NAMES_TABLE, CLASSIFIER_NAMES_TRIGGERS,
+                           CREATE_CLASSIFIER_NAMES_TRIGGER,
+                           FTS_TRIGRAM, DROP_FTS, CREATE_FTS, POPULATE_FTS)
+
+class LuxIndex():
+    """Class to represent the search indexes of the database.
+    Stores the database file for opening connection to later on.
+
+    The indexes are the search table (one precomputed row per object) with the
+    departments of each object, the full-text index over it, and the triggers
+    that record which objects have changed since the last refresh. The case-folded
+    classifier names the live query reads are stored too, and kept in step by
+    triggers of their own.
+    """
+
+    def __init__(self, db_file):
+        """Initalizes the class with the database file.
+
+        Args:
+            db_file (str): database file
+        """
+
+        self._db_file = db_file
+
+    def build(self):
+        """Drops and recreates the search table, its triggers and the full-text index.
+
+        Return:
+            int: number of objects in the index
+        """
+
+        with connect(self._db_file, isolation_level=None, uri=True) as connection:
+            with closing(connection.cursor()) as cursor:
+                cursor.execute("BEGIN")
+
+                cursor.execute(DROP_SEARCH_TABLE)
+                cursor.execute(DROP_SEARCH_DEPARTMENTS_TABLE)
+                cursor.execute(DROP_DIRTY_TABLE)
+                cursor.execute(DROP_FTS)
+                cursor.execute(DROP_CLASSIFIER_NAMES_TABLE)
+                for trigger in DIRTY_TRIGGERS:
+                    cursor.execute(DROP_DIRTY_TRIGGER.format(name=f"{DIRTY_TABLE}_{trigger[0]}"))
+                for trigger in CLASSIFIER_NAMES_TRIGGERS:
+                    cursor.execute(DROP_DIRTY_TRIGGER.format(
+                        name=f"{CLASSIFIER_NAMES_TABLE}_{trigger[0]}"))
+
+                cursor.execute(CREATE_CLASSIFIER_NAMES_TABLE)
+                cursor.execute(POPULATE_CLASSIFIER_NAMES_TABLE)
+                for name, event, body in CLASSIFIER_NAMES_TRIGGERS:
+                    cursor.execute(CREATE_CLASSIFIER_NAMES_TRIGGER.format(
+                        name=f"{CLASSIFIER_NAMES_TABLE}_{name}", event=event, body=body))
+
+                cursor.execute(CREATE_SEARCH_TABLE)
+                cursor.execute(POPULATE_SEARCH_TABLE.format(
+                    candidate_filter="", classifier_names=CLASSIFIER_NAMES_STORED))
+                for smt_str in CREATE_SEARCH_TABLE_INDEXES:
+                    cursor.execute(smt_str)
+                cursor.execute(CREATE_SEARCH_DEPARTMENTS_TABLE)
+                cursor.execute(POPULATE_SEARCH_DEPARTMENTS_TABLE.format(candidate_filter=""))
+
+                cursor.execute(CREATE_DIRTY_TABLE)
+                for name, table, event, select in DIRTY_TRIGGERS:
+                    cursor.execute(CREATE_DIRTY_TRIGGER.format(
+                        name=f"{DIRTY_TABLE}_{name}", table=table, event=event, select=select))
+
+                if FTS_TRIGRAM:
+                    cursor.execute(CREATE_FTS)
+                    cursor.execute(POPULATE_FTS.format(candidate_filter=""))
+
+                cursor.execute("COMMIT")
+                cursor.execute(f"SELECT COUNT(*) FROM {SEARCH_TABLE}")
+                count = cursor.fetchone()[0]
+
+        return count
+
+    def refresh(self):
+        """Recomputes the search table and full-text index rows of the objects
+        changed since the last build or refresh. Builds the index if there is none yet.
+
+        Return:
+            int: number of objects refreshed
+        """
+
+        with connect(self._db_file, isolation_level=None, uri=True) as connection:
+            with closing(connection.cursor()) as cursor:
+                tables = [SEARCH_TABLE, SEARCH_DEPARTMENTS_TABLE, DIRTY_TABLE,
+                          CLASSIFIER_NAMES_TABLE] + ([FTS_TABLE] if FTS_TRIGRAM else [])
+                cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table'"
+                               f" AND name IN ({', '.join('?' * len(tables))})", tables)
+                if cursor.fetchone()[0] < len(tables):
+                    return self.build()
+
+                dirty_str = f" WHERE id IN (SELECT id FROM {DIRTY_TABLE})"
+
+                cursor.execute("BEGIN")
+                cursor.execute(f"SELECT COUNT(*) FROM {DIRTY_TABLE}")
+                count = cursor.fetchone()[0]
+                cursor.execute(f"DELETE FROM {SEARCH_TABLE}" + dirty_str)
+                cursor.execute(f"DELETE FROM {SEARCH_DEPARTMENTS_TABLE}" + dirty_str)
+                candidate_str = f" WHERE objects.id IN (SELECT id FROM {DIRTY_TABLE})"
+                cursor.execute(POPULATE_SEARCH_TABLE.format(
+                    candidate_filter=candidate_str, classifier_names=CLASSIFIER_NAMES_STORED))
+                cursor.execute(POPULATE_SEARCH_DEPARTMENTS_TABLE.format(
+                    candidate_filter=candidate_str))
+                if FTS_TRIGRAM:
+                    cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN"
+                                   f" (SELECT id FROM {DIRTY_TABLE})")
+                    cursor.execute(POPULATE_FTS.format(candidate_filter=dirty_str))
+                cursor.execute(f"DELETE FROM {DIRTY_TABLE}")
+                cursor.execute("COMMIT")
+
+        return count
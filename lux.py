@@ -1,11 +1,16 @@
 """Module for running lux.py"""
 
 import argparse
+import itertools
 import sqlite3
 import sys
+from contextlib import closing
 
-from table import Table
-from query import LuxQuery
+import profiling
+from table import Table, StreamingTable
+from query import LuxQuery, PAGE_SIZE, SEARCH_LIMIT
+from output import (ArgumentParser, add_output_arguments, terminal_columns, table_width,
+                    write_json, write_jsonl, write_delimited)
 
 DB_NAME = "./lux.sqlite"
 
@@ -14,31 +19,75 @@ class LuxCLI():
     Stores the a query class, and the inputted department, agent, classifers, and label.
     """
 
-    def __init__(self, db_name) -> None:
+    def __init__(self, db_name, argv=None, query=None, *,
+                 stdout=None, stderr=None, columns=None) -> None:
         """Initalizes the CLI with the passed in arguments from the terminal
         and create a query with the given database file.
         Query the database with the args and output the results into Console.
 
         Args:
             db_name (str): database file
+            argv (list): arguments to parse instead of the ones from the terminal
+            query (LuxQuery): query to use instead of creating one, e.g. a warm one
+            stdout (file): stream to write the results to, sys.stdout by default
+            stderr (file): stream to write errors and profiles to, sys.stderr by default
+            columns (int): width of the terminal the output is shown on, None if there is none
         """
 
-        self._query = LuxQuery(db_name)
+        self._query = query or LuxQuery(db_name)
+        self._stdout = stdout or sys.stdout
+        self._stderr = stderr or sys.stderr
+        self._columns = columns
         self._department = None
         self._agent = None
         self._classifier = None
         self._label = None
+        self._page = None
+        self._page_size = PAGE_SIZE
+        self._all = False
+        self._format = "table"
+        self._args = None
+
+        self.parse_args(argv)
+        profiling.run_profiled("lux.py", self._args, self.run, stream=self._stderr)
+
+    def run(self):
+        """Queries the database with the parsed arguments and outputs the results."""
 
-        self.parse_args()
         try:
-            response = self._query.search(dep=self._department,
-                                          agt=self._agent,
-                                          classifier=self._classifier,
-                                          label=self._label)
+            if self._format != "table":
+                self.output_records()
+                return
+
+            if self._page or self._all:
+                search_count = self._query.count(dep=self._department,
+                                                 agt=self._agent,
+                                                 classifier=self._classifier,
+                                                 label=self._label)
+                pages = self._query.iter_pages(dep=self._department,
+                                               agt=self._agent,
+                                               classifier=self._classifier,
+                                               label=self._label,
+                                               page_size=self._page_size)
+                if self._page:
+                    pages = itertools.islice(pages, self._page - 1, self._page)
+                self.output_pages(search_count, pages)
+            else:
+                response = self._query.search(dep=self._department,
+                                              agt=self._agent,
+                                              classifier=self._classifier,
+                                              label=self._label)
+                # fewer rows than the limit of search are already every object found
+                search_count = response[0]
+                if search_count >= SEARCH_LIMIT:
+                    search_count = self._query.count(dep=self._department,
+                                                     agt=self._agent,
+                                                     classifier=self._classifier,
+                                                     label=self._label)
+                self.output_results((search_count,) + tuple(response[1:]))
         except sqlite3.Error as sqlite_error:
-            print(sqlite_error, file=sys.stderr)
+            print(sqlite_error, file=self._stderr)
             sys.exit(1)
-        self.output_results(response)
 
     def output_results(self, response):
         """Takes in the results from a database query and output and
@@ -46,7 +95,8 @@ class LuxCLI():
         department, agent, classification, and title.
 
         Args:
-            response (list): [search_count, columns, format_str, obj_list] returned from db query
+            response (list): [search_count, columns, format_str, obj_list] returned from db query,
+            with search_count the total number of objects found, which may exceed len(obj_list)
         """
 
         search_count = response[0]
@@ -54,22 +104,78 @@ class LuxCLI():
         format_str = response[2]
         obj_list = response[3]
 
-        print(f"Search produced {search_count} objects.")
-        print(Table(columns, obj_list, format_str=format_str))
+        with profiling.stage("render"):
+            table = str(Table(columns, obj_list, format_str=format_str,
+                              max_width=table_width(self._columns)))
+
+        print(f"Search produced {search_count} objects.", file=self._stdout)
+        print(table, file=self._stdout)
 
+    def output_pages(self, search_count, pages):
+        """Displays the number of objects found, then the objects in the console
+        as they arrive, in a table whose column widths are fixed by the first objects
+        (the whole page, when displaying a single page).
+
+        Args:
+            search_count (int): number of objects the search produced
+            pages (iterable): lists of objects, as yielded by LuxQuery.iter_pages
+        """
 
-    def parse_args(self):
+        print(f"Search produced {search_count} objects.", file=self._stdout)
+
+        sample_size = self._page_size if self._page else None
+        table = StreamingTable(self._query.columns, itertools.chain.from_iterable(pages),
+                               format_str=self._query.format_str, sample_size=sample_size,
+                               max_width=table_width(self._columns))
+        for line in table.lines():
+            print(line, file=self._stdout)
+
+    def output_records(self):
+        """Writes the objects of the search (the first 1000, the given page or all of them)
+        to the output in the chosen machine-readable format, as they are read from the cursor.
+        JSON output also holds the number of objects found.
+        """
+
+        terms = {"dep": self._department, "agt": self._agent,
+                 "classifier": self._classifier, "label": self._label}
+        page_size = self._page_size if self._page or self._all else SEARCH_LIMIT
+        keys = self._query.column_keys
+
+        with closing(self._query.iter_pages(**terms, page_size=page_size)) as pages:
+            if self._page:
+                pages = itertools.islice(pages, self._page - 1, self._page)
+            elif not self._all:
+                pages = itertools.islice(pages, 1)
+            rows = itertools.chain.from_iterable(pages)
+
+            if self._format in ("csv", "tsv"):
+                write_delimited(self._stdout, keys, rows, self._format)
+            else:
+                records = (dict(zip(keys, row)) for row in rows)
+                if self._format == "json":
+                    write_json(self._stdout, records, count=self._query.count(**terms))
+                else:
+                    write_jsonl(self._stdout, records)
+
+    def parse_args(self, argv=None):
         """Uses ArgParse to parse the arguments inputted by the user
-        and store it as instance variables.
+        (or argv, if given) and store it as instance variables.
         Takes in:
             -d: department
             -a: agent
             -c: classifer
             -l: label
+            --page: page of results to show
+            --page-size: number of objects per page, with --page or --all
+            --all: show every result instead of the first 1000
+            --format: table, or json, jsonl, csv or tsv for machine-readable output
+            --profile: log the time spent in each stage and the query plans to stderr
+            --slow-ms: threshold above which the full plan of a statement is logged
         """
 
-        parser = argparse.ArgumentParser(
-                    prog = 'lux.py', allow_abbrev=False)
+        parser = ArgumentParser(
+                    prog = 'lux.py', allow_abbrev=False,
+                    stdout=self._stdout, stderr=self._stderr, columns=self._columns)
 
         d_help = "show only those objects whose department label contains department"
         a_help = "show only those objects produced by an agent with name containing agentname"
@@ -80,7 +186,19 @@ class LuxCLI():
         parser.add_argument("-c", help=c_help, metavar='cls')
         parser.add_argument("-l", help=l_help, metavar='label')
 
-        args = parser.parse_args()
+        pages = parser.add_mutually_exclusive_group()
+        pages.add_argument("--page", type=positive_int, metavar='page',
+                           help="show only the given page of objects, counting from 1")
+        pages.add_argument("--all", action="store_true",
+                           help="show every object, printing them as they are found")
+        parser.add_argument("--page-size", type=positive_int, metavar='size',
+                            help="with --page or --all, number of objects per page"
+                            f" (default {PAGE_SIZE})")
+        add_output_arguments(parser)
+
+        args = parser.parse_args(argv)
+        if args.page_size is not None and not (args.page or args.all):
+            parser.error("argument --page-size: only allowed with --page or --all")
 
         #set the instance variables to the args passed in by the user
         #None if nothing is passed in
@@ -88,6 +206,22 @@ class LuxCLI():
         self._agent = args.a
         self._classifier = args.c
         self._label = args.l
+        self._page = args.page
+        self._page_size = args.page_size or PAGE_SIZE
+        self._all = args.all
+        self._format = args.format
+        self._args = args
+
+def positive_int(value):
+    """Argument type for options that take a positive integer."""
+
+    try:
+        number = int(value)
+    except ValueError as err:
+        raise argparse.ArgumentTypeError(f"invalid positive int value: '{value}'") from err
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"invalid positive int value: '{value}'")
+    return number
 
 if __name__ == '__main__':
-    LuxCLI(DB_NAME)
+    LuxCLI(DB_NAME, columns=terminal_columns())
@@ -1,33 +1,352 @@
 """Module for main query in LuxQuery class in query.py."""
 
-QUERY_LUX = """WITH classifier AS (
+import sqlite3
+
+# AS MATERIALIZED needs SQLite 3.35 or later; older versions get a plain CTE,
+# which they may inline, giving the same results
+MATERIALIZED = "MATERIALIZED " if sqlite3.sqlite_version_info >= (3, 35, 0) else ""
+
+# Classifier names case-folded once per classifier, rather than once for every
+# object they classify. Materializing keeps SQLite from inlining LOWER() back
+# into the joins; the names are folded like LIKE folds them, ASCII only.
+CLASSIFIER_NAMES = f"""classifier_name AS {MATERIALIZED}(
+    SELECT id, LOWER(name) AS name FROM classifiers
+)"""
+
+# Classifier names case-folded once and for all by luxindex.py, and kept in
+# step with the classifiers table by triggers. Where they are stored, the
+# statements define the classifier_name CTE from them, so no query folds any
+# name, whatever the SQLite version; CLASSIFIER_NAMES is only a fallback.
+CLASSIFIER_NAMES_TABLE = "lux_classifier_names"
+
+CLASSIFIER_NAMES_STORED = f"""classifier_name AS (
+    SELECT id, name FROM {CLASSIFIER_NAMES_TABLE}
+)"""
+
+# The candidate CTE narrows down the objects that the aggregating CTEs below
+# have to look at; {candidate_filter} is either empty or a WHERE clause, and
+# {classifier_names} is CLASSIFIER_NAMES or CLASSIFIER_NAMES_STORED.
+QUERY_LUX_TEMPLATE = """WITH candidate AS (
+    SELECT objects.id FROM objects{candidate_filter}
+),
+{classifier_names},
+classifier AS (
     SELECT id, group_concat(cls_name, '|') as classification FROM (
-        SELECT objects.id, LOWER(classifiers.name) AS cls_name
-        FROM objects
-        LEFT OUTER JOIN objects_classifiers ON objects_classifiers.obj_id = objects.id
-        LEFT OUTER JOIN classifiers ON classifiers.id = objects_classifiers.cls_id
-        ORDER BY LOWER(classifiers.name)
+        SELECT candidate.id, classifier_name.name AS cls_name
+        FROM candidate
+        LEFT OUTER JOIN objects_classifiers ON objects_classifiers.obj_id = candidate.id
+        LEFT OUTER JOIN classifier_name ON classifier_name.id = objects_classifiers.cls_id
+        ORDER BY classifier_name.name
     )
 GROUP BY id),
 agent as (
     SELECT id, GROUP_CONCAT(agt_name || ' (' || prod_part || ')') as artist FROM (
-        SELECT objects.id, agents.name as agt_name, productions.part as prod_part
-        FROM objects
-        LEFT OUTER JOIN productions ON productions.obj_id = objects.id
+        SELECT candidate.id, agents.name as agt_name, productions.part as prod_part
+        FROM candidate
+        LEFT OUTER JOIN productions ON productions.obj_id = candidate.id
         LEFT OUTER JOIN agents ON productions.agt_id = agents.id
     )
 GROUP BY id),
 department as (
-        SELECT objects.id, departments.name as dep_name
-        FROM objects
-        LEFT OUTER JOIN objects_departments ON objects_departments.obj_id = objects.id
+        SELECT candidate.id, departments.name as dep_name
+        FROM candidate
+        LEFT OUTER JOIN objects_departments ON objects_departments.obj_id = candidate.id
         LEFT OUTER JOIN departments ON departments.id = objects_departments.dep_id
 )
 
-SELECT objects.id, objects.label, agent.artist, 
+SELECT objects.id, objects.label, agent.artist,
 objects.date,  department.dep_name, classifier.classification
-FROM objects
+FROM candidate
+JOIN objects ON objects.id = candidate.id
 LEFT OUTER JOIN classifier ON classifier.id = objects.id
 LEFT OUTER JOIN agent ON agent.id = objects.id
 LEFT OUTER JOIN department ON department.id = objects.id
 """
+
+QUERY_LUX = QUERY_LUX_TEMPLATE.format(candidate_filter="", classifier_names=CLASSIFIER_NAMES)
+
+# Semi-joins for the candidate CTE. Each one holds for every object the
+# matching LIKE filter on the aggregated columns accepts, so they can run
+# before the aggregation without changing the results. They are uncorrelated,
+# so SQLite builds the set of matching objects once, with or without an index
+# on the link table, rather than looking the link table up for every object.
+CANDIDATE_LABEL = "objects.label LIKE ?"
+
+CANDIDATE_DEP = """objects.id IN (
+        SELECT objects_departments.obj_id FROM objects_departments
+        JOIN departments ON departments.id = objects_departments.dep_id
+        WHERE departments.name LIKE ?)"""
+
+CANDIDATE_AGT = """objects.id IN (
+        SELECT productions.obj_id FROM productions
+        JOIN agents ON agents.id = productions.agt_id
+        WHERE agents.name || ' (' || productions.part || ')' LIKE ?)"""
+
+CANDIDATE_CLS = """objects.id IN (
+        SELECT objects_classifiers.obj_id FROM objects_classifiers
+        JOIN classifiers ON classifiers.id = objects_classifiers.cls_id
+        WHERE classifiers.name LIKE ?)"""
+
+# Aggregated columns of QUERY_LUX for a single object, for counting results
+# without aggregating objects no filter needs. AGGREGATE_CLS reads the
+# classifier_name CTE, which the counting statement has to define.
+AGGREGATE_AGT = """(
+        SELECT GROUP_CONCAT(agents.name || ' (' || productions.part || ')')
+        FROM productions
+        LEFT OUTER JOIN agents ON productions.agt_id = agents.id
+        WHERE productions.obj_id = objects.id)"""
+
+AGGREGATE_CLS = """(
+        SELECT group_concat(cls_name, '|') FROM (
+            SELECT classifier_name.name AS cls_name
+            FROM objects_classifiers
+            JOIN classifier_name ON classifier_name.id = objects_classifiers.cls_id
+            WHERE objects_classifiers.obj_id = objects.id
+            ORDER BY classifier_name.name))"""
+
+# Denormalized copy of QUERY_LUX with one row per object, so searches do not
+# have to aggregate the whole database. dep_name is the department shown in
+# the results without a department filter: like the live query, the first of
+# the object's departments by name, NULLs first, so it is NULL if one of them
+# has no name or no longer exists. departments holds every department of the
+# object, newline separated, for the full-text index.
+SEARCH_TABLE = "lux_search"
+
+# One row per object and department name. The department filter is applied to
+# each department on its own, as in the live query, and the department shown
+# is the first by name of those that match.
+SEARCH_DEPARTMENTS_TABLE = "lux_search_departments"
+
+# ids of objects whose search table row is out of date, filled by triggers
+DIRTY_TABLE = "lux_search_dirty"
+
+QUERY_SEARCH_TABLE = f"""SELECT {SEARCH_TABLE}.id, {SEARCH_TABLE}.label, {SEARCH_TABLE}.artist,
+{SEARCH_TABLE}.date, {SEARCH_TABLE}.dep_name, {SEARCH_TABLE}.classification
+FROM {SEARCH_TABLE}"""
+
+# QUERY_SEARCH_TABLE for searches with a department filter, which takes the
+# first parameter and keeps the objects with a matching department
+QUERY_SEARCH_TABLE_DEP = f"""SELECT {SEARCH_TABLE}.id, {SEARCH_TABLE}.label, {SEARCH_TABLE}.artist,
+{SEARCH_TABLE}.date, department.dep_name, {SEARCH_TABLE}.classification
+FROM {SEARCH_TABLE}
+JOIN (
+    SELECT id, MIN(dep_name) AS dep_name FROM {SEARCH_DEPARTMENTS_TABLE}
+    WHERE dep_name LIKE ? GROUP BY id
+) AS department ON department.id = {SEARCH_TABLE}.id"""
+
+# QUERY_SEARCH_TABLE_DEP for pages, which read the search table in label order
+# and look up the first matching department of each object, NULL if there is
+# none, instead of matching every department before the first row is returned
+QUERY_SEARCH_TABLE_DEP_PAGE = f"""SELECT {SEARCH_TABLE}.id, {SEARCH_TABLE}.label,
+{SEARCH_TABLE}.artist, {SEARCH_TABLE}.date, (
+    SELECT MIN(dep_name) FROM {SEARCH_DEPARTMENTS_TABLE}
+    WHERE {SEARCH_DEPARTMENTS_TABLE}.id = {SEARCH_TABLE}.id AND dep_name LIKE ?
+) AS dep_name, {SEARCH_TABLE}.classification
+FROM {SEARCH_TABLE}"""
+
+# keeps the objects with a department matching the parameter, for counting
+SEARCH_TABLE_DEP_FILTER = f"""{SEARCH_TABLE}.id IN (
+    SELECT id FROM {SEARCH_DEPARTMENTS_TABLE} WHERE dep_name LIKE ?)"""
+
+DROP_SEARCH_TABLE = f"DROP TABLE IF EXISTS {SEARCH_TABLE}"
+
+CREATE_SEARCH_TABLE = f"""CREATE TABLE {SEARCH_TABLE} (
+    id INTEGER PRIMARY KEY,
+    label TEXT,
+    artist TEXT,
+    date TEXT,
+    dep_name TEXT,
+    classification TEXT,
+    departments TEXT
+)"""
+
+CREATE_SEARCH_TABLE_INDEXES = [
+    f"CREATE INDEX {SEARCH_TABLE}_label_date ON {SEARCH_TABLE}(label, date)",
+]
+
+DROP_SEARCH_DEPARTMENTS_TABLE = f"DROP TABLE IF EXISTS {SEARCH_DEPARTMENTS_TABLE}"
+
+CREATE_SEARCH_DEPARTMENTS_TABLE = f"""CREATE TABLE {SEARCH_DEPARTMENTS_TABLE} (
+    id INTEGER NOT NULL,
+    dep_name TEXT NOT NULL,
+    PRIMARY KEY (id, dep_name)
+) WITHOUT ROWID"""
+
+# Rows of the departments table, computed from the live query, possibly repeated;
+# {candidate_filter} restricts which objects get (re)computed, as for QUERY_SEARCH_ROWS
+QUERY_SEARCH_DEPARTMENTS_ROWS = """SELECT id, dep_name FROM (
+    SELECT objects.id, departments.name AS dep_name
+    FROM objects
+    JOIN objects_departments ON objects_departments.obj_id = objects.id
+    JOIN departments ON departments.id = objects_departments.dep_id{candidate_filter}
+)
+WHERE dep_name IS NOT NULL
+"""
+
+POPULATE_SEARCH_DEPARTMENTS_TABLE = f"""INSERT OR IGNORE INTO {SEARCH_DEPARTMENTS_TABLE}
+(id, dep_name)
+""" + QUERY_SEARCH_DEPARTMENTS_ROWS
+
+# Every row of the departments table, by object and then by name
+QUERY_SEARCH_DEPARTMENTS_TABLE_ROWS = f"""SELECT id, dep_name FROM {SEARCH_DEPARTMENTS_TABLE}
+ORDER BY id, dep_name"""
+
+DROP_DIRTY_TABLE = f"DROP TABLE IF EXISTS {DIRTY_TABLE}"
+
+CREATE_DIRTY_TABLE = f"CREATE TABLE {DIRTY_TABLE} (id INTEGER PRIMARY KEY)"
+
+# Rows of the search table, computed from the live query; {candidate_filter}
+# restricts which objects get (re)computed, and {classifier_names} is as for
+# QUERY_LUX_TEMPLATE
+QUERY_SEARCH_ROWS = f"""SELECT id, label, artist, date,
+CASE WHEN COUNT(*) > COUNT(dep_name) THEN NULL ELSE MIN(dep_name) END, classification,
+group_concat(dep_name, char(10))
+FROM ({QUERY_LUX_TEMPLATE})
+GROUP BY id
+"""
+
+POPULATE_SEARCH_TABLE = f"""INSERT INTO {SEARCH_TABLE}
+(id, label, artist, date, dep_name, classification, departments)
+""" + QUERY_SEARCH_ROWS
+
+# Every column of the search table, in the order of QUERY_SEARCH_ROWS
+QUERY_SEARCH_TABLE_ROWS = f"""SELECT id, label, artist, date, dep_name, classification,
+departments FROM {SEARCH_TABLE}"""
+
+# (trigger name, table, event, SELECT yielding the ids of the affected objects)
+DIRTY_TRIGGERS = [
+    ("objects_ins", "objects", "INSERT", "SELECT NEW.id"),
+    ("objects_upd", "objects", "UPDATE", "SELECT OLD.id UNION SELECT NEW.id"),
+    ("objects_del", "objects", "DELETE", "SELECT OLD.id"),
+    ("productions_ins", "productions", "INSERT", "SELECT NEW.obj_id"),
+    ("productions_upd", "productions", "UPDATE", "SELECT OLD.obj_id UNION SELECT NEW.obj_id"),
+    ("productions_del", "productions", "DELETE", "SELECT OLD.obj_id"),
+    ("objects_classifiers_ins", "objects_classifiers", "INSERT", "SELECT NEW.obj_id"),
+    ("objects_classifiers_upd", "objects_classifiers", "UPDATE",
+     "SELECT OLD.obj_id UNION SELECT NEW.obj_id"),
+    ("objects_classifiers_del", "objects_classifiers", "DELETE", "SELECT OLD.obj_id"),
+    ("objects_departments_ins", "objects_departments", "INSERT", "SELECT NEW.obj_id"),
+    ("objects_departments_upd", "objects_departments", "UPDATE",
+     "SELECT OLD.obj_id UNION SELECT NEW.obj_id"),
+    ("objects_departments_del", "objects_departments", "DELETE", "SELECT OLD.obj_id"),
+    ("agents_ins", "agents", "INSERT", "SELECT obj_id FROM productions WHERE agt_id = NEW.id"),
+    ("agents_upd", "agents", "UPDATE",
+     "SELECT obj_id FROM productions WHERE agt_id IN (OLD.id, NEW.id)"),
+    ("agents_del", "agents", "DELETE", "SELECT obj_id FROM productions WHERE agt_id = OLD.id"),
+    ("classifiers_ins", "classifiers", "INSERT",
+     "SELECT obj_id FROM objects_classifiers WHERE cls_id = NEW.id"),
+    ("classifiers_upd", "classifiers", "UPDATE",
+     "SELECT obj_id FROM objects_classifiers WHERE cls_id IN (OLD.id, NEW.id)"),
+    ("classifiers_del", "classifiers", "DELETE",
+     "SELECT obj_id FROM objects_classifiers WHERE cls_id = OLD.id"),
+    ("departments_ins", "departments", "INSERT",
+     "SELECT obj_id FROM objects_departments WHERE dep_id = NEW.id"),
+    ("departments_upd", "departments", "UPDATE",
+     "SELECT obj_id FROM objects_departments WHERE dep_id IN (OLD.id, NEW.id)"),
+    ("departments_del", "departments", "DELETE",
+     "SELECT obj_id FROM objects_departments WHERE dep_id = OLD.id"),
+]
+
+DROP_DIRTY_TRIGGER = "DROP TRIGGER IF EXISTS {name}"
+
+CREATE_DIRTY_TRIGGER = """CREATE TRIGGER {name} AFTER {event} ON {table}
+BEGIN
+    INSERT OR IGNORE INTO """ + DIRTY_TABLE + """(id) {select};
+END"""
+
+DROP_CLASSIFIER_NAMES_TABLE = f"DROP TABLE IF EXISTS {CLASSIFIER_NAMES_TABLE}"
+
+CREATE_CLASSIFIER_NAMES_TABLE = f"""CREATE TABLE {CLASSIFIER_NAMES_TABLE} (
+    id INTEGER PRIMARY KEY,
+    name TEXT
+)"""
+
+POPULATE_CLASSIFIER_NAMES_TABLE = f"""INSERT INTO {CLASSIFIER_NAMES_TABLE} (id, name)
+SELECT id, LOWER(name) FROM classifiers"""
+
+# (trigger name, event, statements keeping the folded classifier names in step)
+CLASSIFIER_NAMES_TRIGGERS = [
+    ("ins", "INSERT", f"""INSERT OR REPLACE INTO {CLASSIFIER_NAMES_TABLE} (id, name)
+    VALUES (NEW.id, LOWER(NEW.name));"""),
+    ("upd", "UPDATE", f"""DELETE FROM {CLASSIFIER_NAMES_TABLE} WHERE id = OLD.id;
+    INSERT OR REPLACE INTO {CLASSIFIER_NAMES_TABLE} (id, name)
+    VALUES (NEW.id, LOWER(NEW.name));"""),
+    ("del", "DELETE", f"DELETE FROM {CLASSIFIER_NAMES_TABLE} WHERE id = OLD.id;"),
+]
+
+CREATE_CLASSIFIER_NAMES_TRIGGER = """CREATE TRIGGER {name} AFTER {event} ON classifiers
+BEGIN
+    {body}
+END"""
+
+# Full-text index over the same strings LuxQuery filters on, kept in step
+# with the search table. The trigram tokenizer lets FTS5 answer substring
+# queries, so it can stand in for LIKE '%term%' scans.
+FTS_TABLE = "lux_fts"
+
+# the trigram tokenizer needs SQLite 3.34 or later; older versions go without
+# the full-text index and leave the filtering to LIKE
+FTS_TRIGRAM = sqlite3.sqlite_version_info >= (3, 34, 0)
+
+DROP_FTS = f"DROP TABLE IF EXISTS {FTS_TABLE}"
+
+CREATE_FTS = f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+    label, artist, classification, department, tokenize='trigram'
+)"""
+
+# {candidate_filter} restricts which objects get (re)indexed
+POPULATE_FTS = f"""INSERT INTO {FTS_TABLE}(rowid, label, artist, classification, department)
+SELECT id, label, artist, classification, departments
+FROM {SEARCH_TABLE}{{candidate_filter}}
+"""
+
+# Indexes on the link tables that the joins above, the details queries below and
+# the dirty triggers look rows up by, as (name, table, columns). Each one covers
+# every column its lookups read, so they never have to visit the table itself.
+LUX_INDEXES = [
+    ("lux_productions_obj", "productions", ("obj_id", "agt_id", "part")),
+    ("lux_productions_agt", "productions", ("agt_id", "obj_id")),
+    ("lux_objects_classifiers_obj", "objects_classifiers", ("obj_id", "cls_id")),
+    ("lux_objects_classifiers_cls", "objects_classifiers", ("cls_id", "obj_id")),
+    ("lux_objects_departments_obj", "objects_departments", ("obj_id", "dep_id")),
+    ("lux_objects_departments_dep", "objects_departments", ("dep_id", "obj_id")),
+    ("lux_agents_nationalities_agt", "agents_nationalities", ("agt_id", "nat_id")),
+    ("lux_references_obj", "references", ("obj_id", "type", "content")),
+]
+
+CREATE_LUX_INDEX = 'CREATE INDEX IF NOT EXISTS {name} ON "{table}"({columns})'
+
+# Queries for LuxDetailsQuery, one per relation of the objects so that no
+# relation multiplies the rows of another. {ids} is a list of placeholders,
+# one per object id, and each row starts with the id of its object. The
+# classifiers of an object and the nationalities of an agent come in the
+# order of their ids, as the single query of the original program read them
+# through the (obj_id, cls_id) and (agt_id, nat_id) keys of the link tables,
+# and the agents in the order of their productions rows, as it scanned them.
+DETAILS_LABEL = "SELECT objects.id, objects.label FROM objects WHERE objects.id IN ({ids})"
+
+DETAILS_AGENTS = """SELECT productions.obj_id, productions.part, agents.name,
+agents.begin_date, agents.end_date, agents.id, agents.begin_bce, agents.end_bce
+FROM productions
+LEFT OUTER JOIN agents ON productions.agt_id = agents.id
+WHERE productions.obj_id IN ({ids})
+ORDER BY productions.obj_id, productions.rowid"""
+
+DETAILS_NATIONALITIES = """SELECT DISTINCT productions.obj_id, agents.id, nationalities.descriptor
+FROM productions
+JOIN agents ON productions.agt_id = agents.id
+JOIN agents_nationalities ON agents_nationalities.agt_id = agents.id
+JOIN nationalities ON nationalities.id = agents_nationalities.nat_id
+WHERE productions.obj_id IN ({ids})
+ORDER BY productions.obj_id, agents.id, nationalities.id"""
+
+DETAILS_CLASSIFIERS = """SELECT objects_classifiers.obj_id, classifiers.name
+FROM objects_classifiers
+JOIN classifiers ON classifiers.id = objects_classifiers.cls_id
+WHERE objects_classifiers.obj_id IN ({ids})
+ORDER BY objects_classifiers.obj_id, classifiers.id"""
+
+DETAILS_REFERENCES = """SELECT "references".obj_id, "references".type, "references".content
+FROM "references"
+WHERE "references".obj_id IN ({ids})
+ORDER BY "references".obj_id, "references".type, "references".content"""
@@ -0,0 +1,194 @@
+"""Module for running luxbatch.py"""
+
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from pool import ConnectionPool
+from query import LuxQuery
+
+DB_NAME = "./lux.sqlite"
+
+# keys a search spec may use for each argument of LuxQuery.search
+SPEC_KEYS = {
+    "dep": ("dep", "d"),
+    "agt": ("agt", "a"),
+    "classifier": ("cls", "classifier", "c"),
+    "label": ("label", "l"),
+}
+
+# query of the current worker; set by init_worker in each worker process,
+# or once for all worker threads
+_QUERY = None
+
+class LuxBatchCLI():
+    """Class to represent the command line interface for the program.
+    Stores the input file of search specs, where to write results and how to run them.
+    """
+
+    def __init__(self, db_name):
+        """Initalizes the CLI with the arguments given by the user, runs every search
+        spec of the input file in parallel and writes one JSON line per spec, in input order.
+
+        Args:
+            db_name (str): database file
+        """
+
+        self._db_name = db_name
+        self._input = None
+        self._input_format = None
+        self._output = None
+        self._workers = None
+        self._processes = False
+        self._limit = None
+
+        self.parse_args()
+
+        try:
+            specs = read_specs(self._input, self._input_format)
+            if self._processes:
+                executor = ProcessPoolExecutor(max_workers=self._workers,
+                                               initializer=init_worker,
+                                               initargs=(self._db_name, 1))
+            else:
+                init_worker(self._db_name, self._workers)
+                executor = ThreadPoolExecutor(max_workers=self._workers)
+
+            with executor, self.open_output() as out:
+                chunksize = 16 if self._processes else 1
+                for result in executor.map(run_spec, specs, [self._limit] * len(specs),
+                                           chunksize=chunksize):
+                    out.write(json.dumps(result) + "\n")
+        except (OSError, ValueError) as err:
+            print(err, file=sys.stderr)
+            sys.exit(1)
+
+    def open_output(self):
+        """Returns the file to write results to, stdout if no output file was given."""
+
+        if self._output in (None, "-"):
+            return os.fdopen(os.dup(sys.stdout.fileno()), "w", encoding="utf-8")
+        return open(self._output, "w", encoding="utf-8")
+
+    def parse_args(self):
+        """Uses ArgParse to parse the arguments inputted by the user and store it
+        as instance variables.
+
+        Takes in:
+            input: JSONL or CSV file of search specs, - for stdin
+            --format: jsonl or csv, by default guessed from the file extension
+            -o: output file, by default stdout
+            --workers: number of worker threads or processes
+            --processes: use worker processes instead of threads
+            --limit: maximum number of objects written per search
+        """
+
+        parser = argparse.ArgumentParser(
+                    prog = 'luxbatch.py', allow_abbrev=False)
+
+        i_help = ("file of search specs with the keys dep, agt, cls and label,"
+                  " one JSON object per line or CSV with a header row; - for stdin")
+        parser.add_argument("input", help=i_help)
+        parser.add_argument("--format", choices=["jsonl", "csv"], dest="input_format",
+                            help="format of the input, by default guessed from its extension")
+        parser.add_argument("-o", metavar='output',
+                            help="file to write results to (default stdout)")
+        parser.add_argument("--workers", type=int, default=os.cpu_count(), metavar='n',
+                            help="number of searches run at once (default: number of cores)")
+        parser.add_argument("--processes", action="store_true",
+                            help="run searches in worker processes instead of threads")
+        parser.add_argument("--limit", type=int, metavar='n',
+                            help="write at most n objects per search (default: all)")
+
+        args = parser.parse_args()
+
+        self._input = args.input
+        self._input_format = args.input_format
+        self._output = args.o
+        self._workers = max(1, args.workers or 1)
+        self._processes = args.processes
+        self._limit = args.limit
+
+def read_specs(path, input_format=None):
+    """Reads search specs from a JSONL or CSV file.
+
+    Args:
+        path (str): file to read, - for stdin
+        input_format (str): jsonl or csv, by default csv iff path ends in .csv
+
+    Return:
+        list: one dictionary per spec, as found in the file
+    """
+
+    if input_format is None:
+        input_format = "csv" if path.lower().endswith(".csv") else "jsonl"
+
+    if path == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(path, encoding="utf-8", newline="") as file:
+            lines = file.read().splitlines()
+
+    if input_format == "csv":
+        return [dict(row) for row in csv.DictReader(lines)]
+
+    specs = []
+    for number, line in enumerate(lines, 1):
+        if line.strip():
+            try:
+                specs.append(json.loads(line))
+            except ValueError as err:
+                raise ValueError(f"{path}:{number}: {err}") from err
+    return specs
+
+def init_worker(db_name, pool_size):
+    """Creates the query the searches of this worker process (or of all worker threads)
+    run on, with one read-only connection per worker.
+
+    Args:
+        db_name (str): database file
+        pool_size (int): number of connections
+    """
+
+    global _QUERY # pylint: disable=global-statement
+    _QUERY = LuxQuery(db_name, ConnectionPool(db_name, size=pool_size))
+
+def run_spec(spec, limit=None):
+    """Runs one search spec and returns its result as a dictionary for a JSON line:
+    the spec, the number of objects found and the objects (or the error).
+
+    Args:
+        spec (dict): search spec, see SPEC_KEYS
+        limit (int): maximum number of objects returned, by default all
+    """
+
+    result = {"spec": spec}
+    try:
+        if not isinstance(spec, dict):
+            raise ValueError("a search spec must be an object")
+        terms = {}
+        for arg, keys in SPEC_KEYS.items():
+            for key in keys:
+                if spec.get(key) is not None and not isinstance(spec[key], str):
+                    raise ValueError(f"the value of {key} must be a string")
+            terms[arg] = next((spec[key] for key in keys if spec.get(key)), None)
+
+        result["count"] = _QUERY.count(**terms)
+        keys = _QUERY.column_keys
+        rows = []
+        for row in _QUERY.iter_search(**terms):
+            if limit is not None and len(rows) >= limit:
+                break
+            rows.append(dict(zip(keys, row)))
+        result["objects"] = rows
+    except (sqlite3.Error, ValueError) as err:
+        result["error"] = str(err)
+
+    return result
+
+if __name__ == '__main__':
+    LuxBatchCLI(DB_NAME)
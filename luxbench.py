@@ -0,0 +1,145 @@
+"""Module for running luxbench.py"""
+
+import argparse
+import json
+import sqlite3
+import sys
+
+from bench import LuxBench, BACKENDS, REPEAT, WARMUP, DETAILS_OBJECTS, PERCENTILES, compare
+from lux import positive_int
+from table import Table
+
+DB_NAME = "./lux.sqlite"
+
+class LuxBenchCLI():
+    """Class to represent the command line interface for the program.
+    Stores the benchmark settings inputted by the user and where to save the results.
+    """
+
+    def __init__(self, db_name):
+        """Initalizes the CLI with the arguments given by the user, runs the benchmark
+        against the database file and displays the results in the console.
+
+        Args:
+            db_name (str): database file
+        """
+
+        self._db_name = db_name
+        self._repeat = REPEAT
+        self._warmup = WARMUP
+        self._backend = "sql"
+        self._terms = {}
+        self._details_objects = DETAILS_OBJECTS
+        self._only = None
+        self._output = None
+        self._baseline = None
+
+        self.parse_args()
+
+        try:
+            baseline = None
+            if self._baseline:
+                with open(self._baseline, encoding="utf-8") as file:
+                    baseline = json.load(file)
+
+            bench = LuxBench(self._db_name, repeat=self._repeat, warmup=self._warmup,
+                             backend=self._backend, terms=self._terms,
+                             details_objects=self._details_objects)
+            results = bench.run(self._only)
+
+            if self._output:
+                with open(self._output, "w", encoding="utf-8") as file:
+                    json.dump(results, file, indent=2)
+                    file.write("\n")
+        except (sqlite3.Error, OSError, ValueError) as err:
+            print(err, file=sys.stderr)
+            sys.exit(1)
+
+        self.output_results(results, baseline)
+
+    def output_results(self, results, baseline=None):
+        """Displays the environment and a table of the measurements of each case,
+        and, given a baseline, a table of the change in median time of each case.
+
+        Args:
+            results (dict): results of LuxBench.run
+            baseline (dict): earlier results to compare with
+        """
+
+        environment = results["environment"]
+        print(f"Commit {environment['commit']}, Python {environment['python']},"
+              f" SQLite {environment['sqlite']}, {environment['objects']} objects,"
+              f" {environment['backend']} backend, {environment['repeat']} runs per case.")
+
+        columns = ["Case", "Runs"] + [f"p{pct} ms" for pct in PERCENTILES] + ["Max ms", "Peak KiB"]
+        rows = [[name, str(case["runs"])]
+                + [f"{case[f'p{pct}_ms']:.3f}" for pct in PERCENTILES]
+                + [f"{case['max_ms']:.3f}", f"{case['peak_kib']:.0f}"]
+                for name, case in results["cases"].items()]
+        print(Table(columns, rows))
+
+        if baseline is not None:
+            print()
+            print(f"Compared with commit {baseline['environment']['commit']}:")
+            rows = [[name, f"{before:.3f}", f"{after:.3f}",
+                     "-" if change is None else f"{change:+.1f}%"]
+                    for name, before, after, change in compare(baseline, results)]
+            print(Table(["Case", "Baseline p50 ms", "p50 ms", "Change"], rows))
+
+    def parse_args(self):
+        """Uses ArgParse to parse the arguments inputted by the user and store it
+        as instance variables.
+
+        Takes in:
+            --db: database file
+            --repeat: number of timed runs per case
+            --warmup: number of untimed runs per case
+            --backend: sql or memory
+            -d, -a, -c, -l: search terms, by default picked from the database
+            --details-objects: number of objects to time the details of
+            --only: run only the cases whose name starts with this
+            -o: file to save the results to as JSON
+            --compare: JSON results of an earlier run to compare with
+        """
+
+        parser = argparse.ArgumentParser(
+                    prog = 'luxbench.py', allow_abbrev=False)
+
+        parser.add_argument("--db", default=self._db_name, metavar='file',
+                            help=f"database file (default {self._db_name})")
+        parser.add_argument("--repeat", type=positive_int, default=REPEAT, metavar='n',
+                            help=f"number of timed runs per case (default {REPEAT})")
+        parser.add_argument("--warmup", type=int, default=WARMUP, metavar='n',
+                            help=f"number of untimed runs per case before them (default {WARMUP})")
+        parser.add_argument("--backend", choices=list(BACKENDS), default="sql",
+                            help="LuxQuery backend to time searches on (default sql)")
+        parser.add_argument("-d", metavar='dep', help="department term of the searches")
+        parser.add_argument("-a", metavar='agt', help="agent term of the searches")
+        parser.add_argument("-c", metavar='cls', help="classifier term of the searches")
+        parser.add_argument("-l", metavar='label', help="label term of the searches")
+        parser.add_argument("--details-objects", type=positive_int, default=DETAILS_OBJECTS,
+                            metavar='n', help="number of objects with the most related rows"
+                            f" to time the details of (default {DETAILS_OBJECTS})")
+        parser.add_argument("--only", metavar='prefix',
+                            help="run only the cases whose name starts with prefix,"
+                            " e.g. search or table")
+        parser.add_argument("-o", metavar='file', help="save the results to file as JSON")
+        parser.add_argument("--compare", metavar='file',
+                            help="JSON results of an earlier run to compare median times with")
+
+        args = parser.parse_args()
+
+        self._db_name = args.db
+        self._repeat = args.repeat
+        self._warmup = args.warmup
+        self._backend = args.backend
+        self._terms = {key: term for key, term in
+                       (("dep", args.d), ("agt", args.a), ("classifier", args.c),
+                        ("label", args.l)) if term}
+        self._details_objects = args.details_objects
+        self._only = args.only
+        self._output = args.o
+        self._baseline = args.compare
+
+if __name__ == '__main__':
+    LuxBenchCLI(DB_NAME)
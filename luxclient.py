@@ -0,0 +1,67 @@
+"""Module for running luxclient.py, a thin client for luxserver.py.
+
+Usage:
+    luxclient.py lux [lux.py arguments]
+    luxclient.py luxdetails [luxdetails.py arguments]
+
+The output is the same as running lux.py or luxdetails.py directly, without
+paying for their imports and database connection on every invocation.
+The socket defaults to ./lux.sock and can be set with LUX_SOCKET.
+"""
+
+import json
+import os
+import socket
+import sys
+
+from output import terminal_columns
+
+SOCKET_NAME = "./lux.sock"
+
+PROGRAMS = ("lux", "luxdetails")
+
+def main(argv):
+    """Sends the program and arguments in argv to the server and reproduces its output
+    as it arrives.
+
+    Args:
+        argv (list): the program ("lux" or "luxdetails") followed by its arguments
+
+    Return:
+        int: exit status of the program
+    """
+
+    if not argv or argv[0] not in PROGRAMS:
+        print(f"usage: luxclient.py {{{','.join(PROGRAMS)}}} [arguments]", file=sys.stderr)
+        return 2
+
+    request = {
+        "prog": argv[0],
+        "argv": argv[1:],
+        "columns": terminal_columns(),
+        "stdin": sys.stdin.read() if "-" in argv[1:] else None,
+    }
+
+    streams = {"stdout": sys.stdout, "stderr": sys.stderr}
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(os.environ.get("LUX_SOCKET", SOCKET_NAME))
+            sock.sendall(json.dumps(request).encode("utf-8"))
+            sock.shutdown(socket.SHUT_WR)
+            with sock.makefile("rb") as response:
+                for line in response:
+                    message = json.loads(line.decode("utf-8"))
+                    if "status" in message:
+                        return message["status"]
+                    for name, text in message.items():
+                        streams[name].write(text)
+                        streams[name].flush()
+    except OSError as err:
+        print(f"cannot reach luxserver.py: {err}", file=sys.stderr)
+        return 1
+
+    print("luxserver.py closed the connection before the program finished", file=sys.stderr)
+    return 1
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -1,43 +1,73 @@
 """Module for running luxdetails.py"""
 
-import argparse
 import sys
 import sqlite3
 
+import profiling
 from table import Table
-from query import LuxDetailsQuery, NoSearchResultsError
+from query import LuxDetailsQuery
+from output import (ArgumentParser, add_output_arguments, terminal_columns, table_width,
+                    write_json, write_jsonl, write_delimited)
 
 DB_NAME = "./lux.sqlite"
 
+# columns of CSV and TSV output, which has one row per relation of each object:
+# its label, each agent, each classifier and each reference
+RECORD_COLUMNS = ["id", "relation", "label", "part", "name", "timespan", "nationalities",
+                  "classifier", "type", "content"]
+
 class LuxDetailsCLI():
     """"Class to represent the command line interface for the program.
-    Stores the a query class, and the inputted id of the object.
+    Stores the a query class, and the inputted ids of the objects.
     """
 
-    def __init__(self, db_name):
-        """Initalizes the CLI with the id given be the user
+    def __init__(self, db_name, argv=None, query=None, *,
+                 stdin=None, stdout=None, stderr=None, columns=None):
+        """Initalizes the CLI with the ids given be the user
         and create a query with the given database file.
-        Query the database with based on the given id and output the results into Console.
+        Query the database with based on the given ids and output the results into Console,
+        one object after the other.
 
         Args:
             db_name (str): database file
+            argv (list): arguments to parse instead of the ones from the terminal
+            query (LuxDetailsQuery): query to use instead of creating one, e.g. a warm one
+            stdin (file): stream to read the ids of - from, sys.stdin by default
+            stdout (file): stream to write the details to, sys.stdout by default
+            stderr (file): stream to write errors and profiles to, sys.stderr by default
+            columns (int): width of the terminal the output is shown on, None if there is none
         """
 
-        self._query = LuxDetailsQuery(db_name)
-        self._id = None
+        self._query = query or LuxDetailsQuery(db_name)
+        self._stdin = stdin or sys.stdin
+        self._stdout = stdout or sys.stdout
+        self._stderr = stderr or sys.stderr
+        self._columns = columns
+        self._ids = []
+        self._format = "table"
+        self._args = None
+
+        self.parse_args(argv)
+        profiling.run_profiled("luxdetails.py", self._args, self.run, stream=self._stderr)
 
-        self.parse_args()
+    def run(self):
+        """Queries the details of the parsed ids and outputs them."""
+
+        if self._format != "table":
+            self.output_records()
+            return
 
         try:
-            response = self._query.search(self._id)
+            responses = self._query.search_many(self._ids)
         except sqlite3.Error as err:
-            print(err, file=sys.stderr)
-            sys.exit()
-        except NoSearchResultsError:
-            print("Invalid id.")
+            print(err, file=self._stderr)
             sys.exit()
 
-        self.output_results(response)
+        for obj_id in self._ids:
+            if obj_id in responses:
+                self.output_results(responses[obj_id])
+            else:
+                print("Invalid id.", file=self._stdout)
 
     def output_results(self, response):
         """Takes in the results from a database query
@@ -56,7 +86,14 @@ class LuxDetailsCLI():
         format_str_produced = response[3]
         agent_rows_list = response[4]
         obj_dict = response[5]
-        information_list = self.parse_type_content(obj_dict['ref_type'], obj_dict['ref_content'])
+        information_list = obj_dict['references']
+
+        with profiling.stage("render"):
+            max_width = table_width(self._columns)
+            produced_by_table = str(Table(columns_produced_by, agent_rows_list,
+                                          format_str=format_str_produced, max_width=max_width))
+            information_table = str(Table(columns_information, information_list,
+                                          format_str=format_str_informaton, max_width=max_width))
 
         divider = "----------------\n"
         space = "\n"
@@ -72,8 +109,7 @@ class LuxDetailsCLI():
         res += divider
         res += "Produced By\n"
         res += divider
-        res += str(Table(columns_produced_by, agent_rows_list,
-                        format_str=format_str_produced)) + space
+        res += produced_by_table + space
         res += space
 
         res += divider
@@ -86,36 +122,88 @@ class LuxDetailsCLI():
         res += "Information\n"
         res += divider
 
-        res += str(Table(columns_information, information_list,
-                         format_str=format_str_informaton)) + space
+        res += information_table + space
         res += space
 
-        print(res, end="")
+        print(res, end="", file=self._stdout)
 
-    def parse_type_content(self, list_type, list_content):
-        """Parse type and content to fit Table requirements."""
+    def output_records(self):
+        """Writes the details of every object found to the output in the chosen machine-readable
+        format, in the order of the ids; ids no object was found for are reported as errors.
+        """
 
-        new_list = []
-        for index, type_elem in enumerate(list_type):
-            new_list.append([type_elem, list_content[index]])
-        return new_list
+        try:
+            records = self._query.records_many(self._ids)
+        except sqlite3.Error as err:
+            print(err, file=self._stderr)
+            sys.exit()
 
-    def parse_args(self):
-        """Uses ArgParse to parse the arguments inputted by the user and store it
-        as instance variables.
+        def found():
+            for obj_id in self._ids:
+                if obj_id in records:
+                    yield records[obj_id]
+                else:
+                    print(f"Invalid id: {obj_id}", file=self._stderr)
+
+        match self._format:
+            case "json":
+                write_json(self._stdout, found())
+            case "jsonl":
+                write_jsonl(self._stdout, found())
+            case _:
+                rows = (row for record in found() for row in record_rows(record))
+                write_delimited(self._stdout, RECORD_COLUMNS, rows, self._format)
+
+    def parse_args(self, argv=None):
+        """Uses ArgParse to parse the arguments inputted by the user (or argv, if given)
+        and store it as instance variables.
 
         Takes in:
-            -id: id
+            id: one or more ids, or - to read whitespace-separated ids from stdin
+            --format: table, or json, jsonl, csv or tsv for machine-readable output
+            --profile: log the time spent in each stage and the query plans to stderr
+            --slow-ms: threshold above which the full plan of a statement is logged
         """
 
-        parser = argparse.ArgumentParser(
-                    prog = 'luxdetails.py', allow_abbrev=False)
+        parser = ArgumentParser(
+                    prog = 'luxdetails.py', allow_abbrev=False,
+                    stdout=self._stdout, stderr=self._stderr, columns=self._columns)
+
+        id_help = ("the ids of the objects whose details should be shown,"
+                   " or - to read them from stdin")
+        parser.add_argument("id", nargs="+", help=id_help)
+        add_output_arguments(parser)
+
+        args = parser.parse_args(argv)
 
-        parser.add_argument("id", help="the id of the object whose details should be shown")
+        for obj_id in args.id:
+            if obj_id == "-":
+                self._ids += self._stdin.read().split()
+            else:
+                self._ids.append(obj_id)
+        self._format = args.format
+        self._args = args
+
+def record_rows(record):
+    """Flattens a record of LuxDetailsQuery.records_many into rows of RECORD_COLUMNS,
+    one per relation, leaving the columns of other relations empty.
+
+    Args:
+        record (dict): details of one object
+    """
 
-        args = parser.parse_args()
+    def row(relation, **values):
+        values.update(id=record["id"], relation=relation)
+        return [values.get(column) for column in RECORD_COLUMNS]
 
-        self._id = args.id
+    yield row("label", label=record["label"])
+    for agent in record["agents"]:
+        yield row("agent", part=agent["part"], name=agent["name"],
+                  timespan=agent["timespan"], nationalities="|".join(agent["nationalities"]))
+    for classifier in record["classifiers"]:
+        yield row("classifier", classifier=classifier)
+    for reference in record["references"]:
+        yield row("reference", type=reference["type"], content=reference["content"])
 
 if __name__ == '__main__':
-    LuxDetailsCLI(DB_NAME)
+    LuxDetailsCLI(DB_NAME, columns=terminal_columns())
@@ -0,0 +1,66 @@
+"""Module for running luxexport.py"""
+
+import argparse
+import sqlite3
+import sys
+
+from export import LuxExport, ExportError, CHUNK_SIZE
+from lux import positive_int
+
+DB_NAME = "./lux.sqlite"
+
+class LuxExportCLI():
+    """Class to represent the command line interface for the program.
+    Stores the export class and the output file, format and chunk size inputted by the user.
+    """
+
+    def __init__(self, db_name):
+        """Initalizes the CLI with the arguments given by the user
+        and exports the search corpus of the given database file.
+
+        Args:
+            db_name (str): database file
+        """
+
+        self._export = LuxExport(db_name)
+        self._output = None
+        self._format = None
+        self._chunk_size = CHUNK_SIZE
+
+        self.parse_args()
+
+        try:
+            count = self._export.export(self._output, self._format, self._chunk_size)
+            print(f"Exported {count} objects to {self._output}.")
+        except (sqlite3.Error, ExportError, OSError) as err:
+            print(err, file=sys.stderr)
+            sys.exit(1)
+
+    def parse_args(self):
+        """Uses ArgParse to parse the arguments inputted by the user and store it
+        as instance variables.
+
+        Takes in:
+            output: file to write
+            --format: arrow, parquet or npz, by default guessed from the extension of output
+            --chunk-size: number of objects written at a time
+        """
+
+        parser = argparse.ArgumentParser(
+                    prog = 'luxexport.py', allow_abbrev=False)
+
+        o_help = "file to write; .arrow and .parquet need pyarrow, .npz needs numpy"
+        parser.add_argument("output", help=o_help)
+        parser.add_argument("--format", choices=["arrow", "parquet", "npz"],
+                            help="format of the file, by default guessed from its extension")
+        parser.add_argument("--chunk-size", type=positive_int, default=CHUNK_SIZE, metavar='n',
+                            help=f"number of objects written at a time (default {CHUNK_SIZE})")
+
+        args = parser.parse_args()
+
+        self._output = args.output
+        self._format = args.format
+        self._chunk_size = args.chunk_size
+
+if __name__ == '__main__':
+    LuxExportCLI(DB_NAME)
@@ -0,0 +1,109 @@
+"""Module for running luxindex.py"""
+
+import argparse
+import sqlite3
+import sys
+
+from index import LuxIndex
+from advisor import LuxIndexAdvisor
+from lux import positive_int
+from table import Table
+
+DB_NAME = "./lux.sqlite"
+
+class LuxIndexCLI():
+    """Class to represent the command line interface for the program.
+    Stores the index class and the command inputted by the user.
+    """
+
+    def __init__(self, db_name):
+        """Initalizes the CLI with the command given by the user
+        and runs it against the given database file.
+
+        Args:
+            db_name (str): database file
+        """
+
+        self._db_name = db_name
+        self._index = LuxIndex(db_name)
+        self._command = None
+        self._create = False
+        self._analyze = False
+        self._repeat = 1
+
+        self.parse_args()
+
+        try:
+            if self._command == "build":
+                print(f"Indexed {self._index.build()} objects.")
+            elif self._command == "refresh":
+                print(f"Refreshed {self._index.refresh()} objects.")
+            else:
+                advisor = LuxIndexAdvisor(self._db_name)
+                self.output_advice(advisor.advise(self._create, self._analyze, self._repeat))
+        except sqlite3.Error as err:
+            print(err, file=sys.stderr)
+            sys.exit(1)
+
+    def output_advice(self, report):
+        """Displays the indexes created, missing and unused and, if any were created
+        or ANALYZE was run, a table of the time of each query shape before and after.
+
+        Args:
+            report (dict): report of LuxIndexAdvisor.advise
+        """
+
+        def describe(indexes):
+            return [f"  {name} ON {table}({', '.join(columns)})"
+                    for name, table, columns in indexes] or ["  none"]
+
+        if report["created"]:
+            print("Created indexes:")
+            print("\n".join(f"  {name}" for name in report["created"]))
+        print("Missing indexes:")
+        print("\n".join(describe(report["missing"])))
+        print("Indexes no query uses:")
+        print("\n".join(describe(report["unused"])))
+
+        if report["timings"] is not None:
+            print()
+            rows = [[name, f"{before:.3f}", f"{after:.3f}",
+                     f"{(after - before) / before * 100:+.1f}%" if before else "-"]
+                    for name, before, after in report["timings"]]
+            print(Table(["Query", "Before ms", "After ms", "Change"], rows))
+
+    def parse_args(self):
+        """Uses ArgParse to parse the arguments inputted by the user and store it
+        as instance variables.
+
+        Takes in:
+            command: build, refresh or advise
+            --create: with advise, create the missing indexes and run ANALYZE
+            --analyze: with advise, run ANALYZE
+            --repeat: with advise, number of runs each query is timed over
+        """
+
+        parser = argparse.ArgumentParser(
+                    prog = 'luxindex.py', allow_abbrev=False)
+
+        c_help = "build creates the search index from scratch, refresh brings it up to date," \
+            " advise reports the indexes the queries are missing or do not use"
+        parser.add_argument("command", choices=["build", "refresh", "advise"], help=c_help)
+        parser.add_argument("--create", action="store_true",
+                            help="with advise, create the missing indexes and run ANALYZE,"
+                            " timing every query before and after")
+        parser.add_argument("--analyze", action="store_true",
+                            help="with advise, run ANALYZE, timing every query before and after")
+        parser.add_argument("--repeat", type=positive_int, default=1, metavar='n',
+                            help="with advise, number of runs each query is timed over,"
+                            " the median is shown (default 1)")
+
+        args = parser.parse_args()
+
+        self._command = args.command
+        self._create = args.create
+        self._analyze = args.analyze
+        self._repeat = args.repeat
+
+if __name__ == '__main__':
+    LuxIndexCLI(DB_NAME)
@@ -0,0 +1,78 @@
+"""Module for running luxserver.py"""
+
+import argparse
+import sqlite3
+import sys
+
+from server import LuxServer
+
+DB_NAME = "./lux.sqlite"
+SOCKET_NAME = "./lux.sock"
+
+class LuxServerCLI():
+    """Class to represent the command line interface for the program.
+    Stores the socket and database file the server is started with.
+    """
+
+    def __init__(self, db_name):
+        """Initalizes the CLI with the arguments given by the user
+        and serves requests until interrupted.
+
+        Args:
+            db_name (str): database file
+        """
+
+        self._db_name = db_name
+        self._socket_name = SOCKET_NAME
+        self._pool_size = None
+        self._memory = False
+
+        self.parse_args()
+
+        try:
+            server = LuxServer(self._socket_name, self._db_name, self._pool_size,
+                               memory=self._memory)
+        except (OSError, sqlite3.Error) as err:
+            print(err, file=sys.stderr)
+            sys.exit(1)
+
+        with server:
+            print(f"Serving {self._db_name} on {self._socket_name}.", file=sys.stderr)
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+
+    def parse_args(self):
+        """Uses ArgParse to parse the arguments inputted by the user and store it
+        as instance variables.
+
+        Takes in:
+            --socket: path of the Unix socket to listen on
+            --db: database file
+            --pool-size: number of connections to keep open
+            --memory: answer searches from memory instead of the database
+        """
+
+        parser = argparse.ArgumentParser(
+                    prog = 'luxserver.py', allow_abbrev=False)
+
+        parser.add_argument("--socket", default=SOCKET_NAME, metavar='path',
+                            help=f"Unix socket to listen on (default {SOCKET_NAME})")
+        parser.add_argument("--db", default=self._db_name, metavar='file',
+                            help=f"database file (default {self._db_name})")
+        parser.add_argument("--pool-size", type=int, metavar='size',
+                            help="number of database connections to keep open")
+        parser.add_argument("--memory", action="store_true",
+                            help="load the search results into memory at start-up and answer"
+                            " searches from there; changes to the database are not seen")
+
+        args = parser.parse_args()
+
+        self._socket_name = args.socket
+        self._db_name = args.db
+        self._pool_size = args.pool_size
+        self._memory = args.memory
+
+if __name__ == '__main__':
+    LuxServerCLI(DB_NAME)
@@ -0,0 +1,77 @@
+"""Module for running luxsynth.py"""
+
+import argparse
+import sqlite3
+import sys
+
+from synthetic import SyntheticLux, OBJECTS
+from lux import positive_int
+
+class LuxSynthCLI():
+    """Class to represent the command line interface for the program.
+    Stores the database file to write and the scale and seed inputted by the user.
+    """
+
+    def __init__(self):
+        """Initalizes the CLI with the arguments given by the user
+        and writes a synthetic database."""
+
+        self._db_name = None
+        self._objects = OBJECTS
+        self._seed = 0
+        self._high_fanout = None
+        self._fanout = None
+
+        self.parse_args()
+
+        kwargs = {"seed": self._seed}
+        if self._high_fanout is not None:
+            kwargs["high_fanout"] = self._high_fanout
+        if self._fanout is not None:
+            kwargs["fanout"] = self._fanout
+
+        try:
+            counts = SyntheticLux(self._objects, **kwargs).generate(self._db_name)
+        except (sqlite3.Error, OSError) as err:
+            print(err, file=sys.stderr)
+            sys.exit(1)
+
+        print(f"Wrote {self._db_name}: " +
+              ", ".join(f"{count} {table}" for table, count in counts.items()) + ".")
+
+    def parse_args(self):
+        """Uses ArgParse to parse the arguments inputted by the user and store it
+        as instance variables.
+
+        Takes in:
+            db: database file to write
+            --objects: number of objects
+            --seed: seed of the random data
+            --high-fanout: number of objects with many agents and references
+            --fanout: number of agents and references of those objects
+        """
+
+        parser = argparse.ArgumentParser(
+                    prog = 'luxsynth.py', allow_abbrev=False)
+
+        parser.add_argument("db", help="database file to write, replaced if it exists")
+        parser.add_argument("--objects", type=positive_int, default=OBJECTS, metavar='n',
+                            help=f"number of objects (default {OBJECTS});"
+                            " the other tables scale with it")
+        parser.add_argument("--seed", type=int, default=0, metavar='n',
+                            help="seed of the random data (default 0)")
+        parser.add_argument("--high-fanout", type=int, metavar='n',
+                            help="number of objects with many agents and references (default 10)")
+        parser.add_argument("--fanout", type=positive_int, metavar='n',
+                            help="number of agents and references of those objects (default 200)")
+
+        args = parser.parse_args()
+
+        self._db_name = args.db
+        self._objects = args.objects
+        self._seed = args.seed
+        self._high_fanout = args.high_fanout
+        self._fanout = args.fanout
+
+if __name__ == '__main__':
+    LuxSynthCLI()
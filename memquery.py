@@ -0,0 +1,381 @@
+"""Module handling searches answered from memory instead of the database."""
+
+import bisect
+import itertools
+import re
+import string
+import threading
+from contextlib import closing
+from functools import lru_cache
+
+from query import (LuxQuery, RESULT_COLUMNS, PAGE_SIZE, SEARCH_LIMIT,
+                   STATEMENT_CACHE_SIZE, search_sort_keys)
+from lux_query_sql import (QUERY_SEARCH_ROWS, QUERY_SEARCH_TABLE_ROWS,
+                           QUERY_SEARCH_DEPARTMENTS_ROWS, QUERY_SEARCH_DEPARTMENTS_TABLE_ROWS,
+                           CLASSIFIER_NAMES, CLASSIFIER_NAMES_STORED)
+
+# index of the column of the loaded rows each filter other than dep matches
+# against; dep matches each department of an object on its own, as the live query does
+FILTER_COLUMNS = {
+    "agt": 2,
+    "classifier": 5,
+    "label": 1,
+}
+
+# index of the department shown in the loaded rows
+DEP_COLUMN = RESULT_COLUMNS["dep"][1]
+
+# SQLite's LIKE only ignores the case of ASCII letters
+ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+# separates the values of a column in its search buffer; no term can match across it
+BUFFER_SEPARATOR = "\0"
+
+# once a term has been found in 1/SCAN_FRACTION of the distinct values of a column,
+# the remaining values are checked one by one instead of being looked up in its buffer
+SCAN_FRACTION = 16
+
+# LIKE wildcards and the pattern each one stands for within a single value
+LIKE_WILDCARDS = {"%": f"[^{BUFFER_SEPARATOR}]*", "_": f"[^{BUFFER_SEPARATOR}]"}
+
+class InMemoryLuxQuery(LuxQuery):
+    """Class to represent searching a copy of the search results held in memory.
+
+    Every object's row is loaded once, and a row per department of each object
+    showing that department. Each filtered column gets an index of its distinct
+    values, lowercased, and the rows holding each of them. A search matches each
+    term against the distinct values of its column and intersects the rows found;
+    a department term picks, for each object, its first matching department by
+    name. Without one, an object shows the department the search table stores for
+    it (see QUERY_SEARCH_ROWS), as the live query does. The rows are then put in
+    the sort order of search, whose rank is kept for each sort order, returning
+    the same rows in the same order as LuxQuery.
+
+    Changes to the database are not picked up until reload is called.
+    """
+
+    def __init__(self, db_file, pool=None, cache=None):
+        """Initalizes the class with the database file and loads every row into memory,
+        from the search table if it is up to date, otherwise from the live query.
+
+        Args:
+            db_file (str): database file
+            pool (ConnectionPool): pool to take connections from,
+                by default a read-only pool of its own
+            cache (ResultCache): unused, searches are answered from memory
+        """
+
+        super().__init__(db_file, pool, cache)
+        self._loaded = None
+        self._lock = threading.Lock()
+
+        self.reload()
+
+    def reload(self):
+        """Loads every row from the database again, replacing the indexes and sort
+        orders built from the previous ones; searches already running finish on those.
+
+        Return:
+            int: number of rows loaded
+        """
+
+        with self._pool.connection() as connection:
+            with closing(connection.cursor()) as cursor:
+                if self.index_is_fresh(cursor):
+                    cursor.execute(QUERY_SEARCH_TABLE_ROWS)
+                    rows = cursor.fetchall()
+                    cursor.execute(QUERY_SEARCH_DEPARTMENTS_TABLE_ROWS)
+                    departments = cursor.fetchall()
+                else:
+                    # the search tables store every column but id as text
+                    names = (CLASSIFIER_NAMES_STORED if self.classifier_names_stored(cursor)
+                             else CLASSIFIER_NAMES)
+                    cursor.execute(QUERY_SEARCH_ROWS.format(candidate_filter="",
+                                                            classifier_names=names))
+                    rows = [(row[0],) + tuple(None if v is None else str(v) for v in row[1:])
+                            for row in cursor]
+                    cursor.execute(QUERY_SEARCH_DEPARTMENTS_ROWS.format(candidate_filter=""))
+                    departments = sorted({(obj_id, str(name)) for obj_id, name in cursor})
+
+        # results leave out the departments column, which is only filtered on
+        rows = [row[:6] for row in rows]
+        positions = {row[0]: idx for idx, row in enumerate(rows)}
+
+        # a row per department of each object, an object's rows ordered by name
+        dep_rows, owners = [], []
+        for obj_id, name in departments:
+            idx = positions.get(obj_id)
+            if idx is not None:
+                row = rows[idx]
+                dep_rows.append(row[:DEP_COLUMN] + (name,) + row[DEP_COLUMN + 1:])
+                owners.append(idx)
+
+        indexes = {key: build_index([row[column] for row in rows])
+                   for key, column in FILTER_COLUMNS.items()}
+        indexes["dep"] = build_index([row[DEP_COLUMN] for row in dep_rows])
+
+        loaded = {"rows": rows, "dep_rows": dep_rows, "owners": owners,
+                  "indexes": indexes, "orders": {}}
+        with self._lock:
+            self._loaded = loaded
+
+        return len(rows)
+
+    def search(self, dep=None, agt=None, classifier=None, label=None):
+        """Searches the rows in memory; takes the same arguments and returns
+        the same response as LuxQuery.search."""
+
+        terms = {"dep": dep, "agt": agt, "classifier": classifier, "label": label}
+        rows, matched = self.match(terms, limit=SEARCH_LIMIT)
+        data = [rows[idx] for idx in matched]
+
+        return len(data), self._columns, self._format_str, data
+
+    def count(self, dep=None, agt=None, classifier=None, label=None):
+        """Counts the rows in memory satisfying the search criteria, as LuxQuery.count."""
+
+        terms = {"dep": dep, "agt": agt, "classifier": classifier, "label": label}
+        with self._lock:
+            loaded = self._loaded
+        found = self.find(loaded, terms)
+
+        return len(loaded["rows"]) if found is None else len(found)
+
+    def iter_pages(self, dep=None, agt=None, classifier=None, label=None, *,
+                   page_size=PAGE_SIZE, after=None):
+        """Generator yielding every result of a search in memory, a page at a time;
+        takes the same arguments and yields the same pages as LuxQuery.iter_pages."""
+
+        assert page_size > 0, "page_size must be positive."
+
+        terms = {"dep": dep, "agt": agt, "classifier": classifier, "label": label}
+        rows, matched = self.match(terms)
+
+        start = 0
+        if after is not None:
+            columns = sort_columns(search_sort_keys(terms))
+            start = bisect.bisect_right(matched, sort_key(after, columns),
+                                        key=lambda idx: sort_key(rows[idx], columns))
+
+        for page_start in range(start, len(matched), page_size):
+            yield [rows[idx] for idx in matched[page_start:page_start + page_size]]
+
+    def match(self, terms, limit=None):
+        """Finds the rows satisfying the search criteria, in sort order.
+
+        Args:
+            terms (dict): search terms keyed like the arguments of search
+            limit (int): maximum number of rows to find, by default all of them
+
+        Return:
+            tuple: the rows the search picks from (a row per department of each
+            object with a department term) and the indexes of the matching ones
+            in sort order
+        """
+
+        with self._lock:
+            loaded = self._loaded
+        rows = loaded["dep_rows"] if terms["dep"] else loaded["rows"]
+        order, rank = self.sort_order(loaded, search_sort_keys(terms), bool(terms["dep"]))
+
+        found = self.find(loaded, terms)
+        if found is None:
+            return rows, order[:limit]
+
+        # going through the sort order only pays off if it reaches limit
+        # matching rows sooner than sorting them all would take
+        if limit is not None and limit * len(order) < len(found) ** 2:
+            return rows, list(itertools.islice(filter(found.__contains__, order), limit))
+        return rows, sorted(found, key=rank.__getitem__)[:limit]
+
+    def find(self, loaded, terms):
+        """Finds the rows satisfying the search criteria, in no particular order.
+
+        Each term is matched against the distinct values of its column and the
+        objects found for every term are intersected, starting from the smallest
+        column; once fewer objects are left than a column has distinct values, its
+        term is checked on their values instead. With a department term, each object
+        found is represented by the row of its first matching department.
+
+        Args:
+            loaded (dict): the rows and indexes loaded by reload
+            terms (dict): search terms keyed like the arguments of search
+
+        Return:
+            set: indexes of the matching rows, of the department rows with a department
+            term and of the object rows otherwise, or None if there are no terms
+        """
+
+        indexes = loaded["indexes"]
+
+        objects = None
+        for key in sorted((key for key in FILTER_COLUMNS if terms[key]),
+                          key=lambda key: len(indexes[key][0])):
+            needle = terms[key].translate(ASCII_LOWER)
+            if objects is None:
+                objects = match_index(indexes[key], needle)
+            elif len(objects) < len(indexes[key][2]):
+                objects = match_rows(indexes[key], needle, objects)
+            else:
+                objects.intersection_update(match_index(indexes[key], needle))
+            if not objects:
+                return objects
+
+        if not terms["dep"]:
+            return objects
+
+        # the department rows of an object follow each other by name, so going
+        # through them backwards leaves each object's first matching one
+        owners = loaded["owners"]
+        dep_rows = sorted(match_index(indexes["dep"], terms["dep"].translate(ASCII_LOWER)),
+                          reverse=True)
+        first = dict(zip(map(owners.__getitem__, dep_rows), dep_rows))
+        if objects is None:
+            return set(first.values())
+        return {first[idx] for idx in objects.intersection(first)}
+
+    def sort_order(self, loaded, sort_keys, departments=False):
+        """Returns the indexes of the rows in the sort order of search for the given
+        sort keys, and the rank of each row in it; each order is only sorted once.
+
+        Args:
+            loaded (dict): the rows and indexes loaded by reload
+            sort_keys (tuple): keys of the columns to sort by after label and date
+            departments (bool): sort the department rows instead of the object rows
+        """
+
+        with self._lock:
+            sorted_rows = loaded["orders"].get((sort_keys, departments))
+        if sorted_rows is not None:
+            return sorted_rows
+
+        rows = loaded["dep_rows"] if departments else loaded["rows"]
+        columns = sort_columns(sort_keys)
+        order = sorted(range(len(rows)), key=lambda idx: sort_key(rows[idx], columns))
+        rank = [0] * len(rows)
+        for position, idx in enumerate(order):
+            rank[idx] = position
+
+        with self._lock:
+            loaded["orders"][(sort_keys, departments)] = (order, rank)
+
+        return order, rank
+
+def build_index(values):
+    """Builds the search index of a column: its distinct values, lowercased as LIKE
+    compares them and joined by BUFFER_SEPARATOR, and the rows holding each of them.
+
+    Args:
+        values (list): value of the column for each row
+
+    Return:
+        tuple: the buffer, the offset each distinct value starts at, the distinct
+        values, the indexes of the rows holding each of them and the lowercased
+        value of each row (None for NULL)
+    """
+
+    row_values = [None if value is None else str(value).translate(ASCII_LOWER)
+                  for value in values]
+    groups = {}
+    for idx, value in enumerate(row_values):
+        if value is not None:
+            groups.setdefault(value, []).append(idx)
+
+    lowered = list(groups)
+    starts = []
+    offset = 0
+    for value in lowered:
+        starts.append(offset)
+        offset += len(value) + len(BUFFER_SEPARATOR)
+
+    text = BUFFER_SEPARATOR.join(lowered)
+
+    return text, starts, lowered, list(groups.values()), row_values
+
+def match_index(index, needle):
+    """Returns the set of indexes of the rows whose value is LIKE %needle%.
+
+    The needle is looked up in the buffer, skipping to the next value after each
+    match; once it has matched a large share of the values, the remaining ones are
+    checked one by one instead.
+
+    Args:
+        index (tuple): search index of the column, as built by build_index
+        needle (str): lowercased search term, possibly with LIKE wildcards
+    """
+
+    text, starts, lowered, groups, _ = index
+
+    if BUFFER_SEPARATOR in needle:
+        return set()
+
+    wildcards = "%" in needle or "_" in needle
+    if wildcards:
+        pattern = like_pattern(needle)
+        def find(pos):
+            found = pattern.search(text, pos)
+            return found.start() if found else -1
+    else:
+        def find(pos):
+            return text.find(needle, pos)
+
+    matched = []
+    pos = find(0)
+    while pos >= 0:
+        value = bisect.bisect_right(starts, pos) - 1
+        matched.append(value)
+        if value + 1 == len(starts):
+            break
+        if len(matched) * SCAN_FRACTION > len(starts):
+            rest = range(value + 1, len(starts))
+            if wildcards:
+                matched.extend(idx for idx in rest if pattern.search(lowered[idx]))
+            else:
+                matched.extend(idx for idx in rest if needle in lowered[idx])
+            break
+        pos = find(starts[value + 1])
+
+    return set(itertools.chain.from_iterable(map(groups.__getitem__, matched)))
+
+def match_rows(index, needle, rows):
+    """Returns the set of the given rows whose value is LIKE %needle%,
+    checking each of their values.
+
+    Args:
+        index (tuple): search index of the column, as built by build_index
+        needle (str): lowercased search term, possibly with LIKE wildcards
+        rows (iterable): indexes of the rows to check
+    """
+
+    values = index[4]
+
+    if BUFFER_SEPARATOR in needle:
+        return set()
+
+    if "%" in needle or "_" in needle:
+        pattern = like_pattern(needle)
+        return {idx for idx in rows if values[idx] is not None and pattern.search(values[idx])}
+    return {idx for idx in rows if values[idx] is not None and needle in values[idx]}
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def like_pattern(needle):
+    """Compiles a lowercase LIKE term with wildcards into a regular expression
+    matching %needle% within a single value of a search buffer."""
+
+    return re.compile("".join(LIKE_WILDCARDS.get(char) or re.escape(char) for char in needle))
+
+def sort_columns(sort_keys):
+    """Returns the indexes of the row columns search sorts by, given its sort keys."""
+
+    keys = ("label", "date") + sort_keys + ("id",)
+    return tuple(RESULT_COLUMNS[key][1] for key in keys)
+
+def sort_key(row, columns):
+    """Returns a key sorting rows as SQLite's ORDER BY does on the given columns:
+    NULLs first, then numbers, then text and then blobs, each in their own order."""
+
+    return tuple((0, 0) if row[idx] is None
+                 else (1, row[idx]) if isinstance(row[idx], (int, float))
+                 else (2, row[idx]) if isinstance(row[idx], str)
+                 else (3, row[idx])
+                 for idx in columns)
@@ -0,0 +1,142 @@
+"""Module for the output of the CLIs: results in machine-readable formats instead of
+a Table, and the terminal and streams the output is laid out for and written to."""
+
+import argparse
+import csv
+import functools
+import json
+import os
+import sys
+
+import profiling
+from table import Table
+
+# formats the CLIs accept for --format; table is the default, human-readable one
+FORMATS = ["table", "json", "jsonl", "csv", "tsv"]
+
+DELIMITERS = {"csv": ",", "tsv": "\t"}
+
+# width argparse lays help out for without a terminal, as shutil.get_terminal_size does
+HELP_COLUMNS = 80
+
+class ArgumentParser(argparse.ArgumentParser):
+    """Class to represent an argparse.ArgumentParser that writes its help and errors
+    to the given streams and lays them out for the given terminal width, rather than
+    for the terminal of the process, so that a CLI can run on behalf of a client.
+    """
+
+    def __init__(self, *args, stdout=None, stderr=None, columns=None, **kwargs):
+        """Initalizes the parser like an argparse.ArgumentParser.
+
+        Args:
+            stdout (file): stream the help goes to, sys.stdout by default
+            stderr (file): stream errors go to, sys.stderr by default
+            columns (int): width of the terminal, None if there is none
+        """
+
+        kwargs.setdefault("formatter_class", functools.partial(
+            argparse.HelpFormatter, width=(columns or HELP_COLUMNS) - 2))
+        super().__init__(*args, **kwargs)
+        self._stdout = stdout or sys.stdout
+        self._stderr = stderr or sys.stderr
+
+    def print_usage(self, file=None):
+        super().print_usage(file or self._stdout)
+
+    def print_help(self, file=None):
+        super().print_help(file or self._stdout)
+
+    def error(self, message):
+        self.print_usage(self._stderr)
+        self.exit(2, f"{self.prog}: error: {message}\n")
+
+    def exit(self, status=0, message=None):
+        if message:
+            self._stderr.write(message)
+        raise SystemExit(status)
+
+def add_output_arguments(parser):
+    """Adds the arguments choosing the output format and profiling to the parser of a CLI:
+    --format, --profile and --slow-ms (see profiling.run_profiled).
+
+    Args:
+        parser (argparse.ArgumentParser): parser to add the arguments to
+    """
+
+    parser.add_argument("--format", choices=FORMATS, default="table",
+                        help="output format (default table)")
+    parser.add_argument("--profile", action="store_true",
+                        help="log the time spent in each stage, the rows fetched and"
+                        " the query plans to stderr as JSON")
+    parser.add_argument("--slow-ms", type=float, metavar='ms',
+                        help="with --profile, log the full plan of statements slower than"
+                        f" this (default {profiling.SLOW_QUERY_MS:g})")
+
+def terminal_columns():
+    """Returns the width of the terminal the way shutil.get_terminal_size finds it,
+    or None if there is no terminal."""
+
+    try:
+        columns = int(os.environ.get("COLUMNS", 0))
+    except ValueError:
+        columns = 0
+    if columns > 0:
+        return columns
+
+    try:
+        return os.get_terminal_size(sys.__stdout__.fileno()).columns
+    except (AttributeError, ValueError, OSError):
+        return None
+
+def table_width(columns):
+    """Returns the max_width of the Tables shown on a terminal of the given width,
+    or without a terminal if columns is None, as Table works it out for its own."""
+
+    max_width = Table._MAX_WIDTH # pylint: disable=protected-access
+    return min(max_width, columns) if columns else max_width
+
+def write_json(out, records, *, count=None):
+    """Writes records as one JSON array, one record at a time, so they need not
+    be held in memory.
+
+    Args:
+        out (file): file to write to
+        records (iterable): dictionaries to write
+        count (int): if given, the array is written as the objects of
+            {"count": count, "objects": [...]}
+    """
+
+    if count is not None:
+        out.write('{"count": ' + json.dumps(count) + ', "objects": ')
+    out.write("[")
+    for number, record in enumerate(records):
+        out.write(("\n" if number == 0 else ",\n") + json.dumps(record))
+    out.write("\n]")
+    if count is not None:
+        out.write("}")
+    out.write("\n")
+
+def write_jsonl(out, records):
+    """Writes one record per line as JSON.
+
+    Args:
+        out (file): file to write to
+        records (iterable): dictionaries to write
+    """
+
+    for record in records:
+        out.write(json.dumps(record) + "\n")
+
+def write_delimited(out, keys, rows, output_format):
+    """Writes a header row of keys, then every row, as CSV or TSV.
+
+    Args:
+        out (file): file to write to
+        keys (list): names of the columns
+        rows (iterable): lists of values, one per column; None is written as an empty field
+        output_format (str): csv or tsv
+    """
+
+    writer = csv.writer(out, delimiter=DELIMITERS[output_format], lineterminator="\n")
+    writer.writerow(keys)
+    writer.writerows(rows)
@@ -0,0 +1,225 @@
+"""Module handling a pool of reusable connections to the database."""
+
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from sqlite3 import connect, Error, OperationalError
+from urllib.parse import quote
+
+import profiling
+
+class PoolTimeoutError(OperationalError):
+    """Exception class to handle no connection becoming free in time."""
+
+class ConnectionPool():
+    """Class to represent a pool of open connections to one database file.
+    Connections are opened lazily up to size and handed out to one caller at a time,
+    so the pool can be shared between threads and query classes.
+    """
+
+    # Default values for the pool; these can be overridden at init-time.
+    _SIZE = 4
+    _TIMEOUT = 30.0
+    _MMAP_SIZE = 256 * 1024 * 1024
+    _CACHE_SIZE = -64 * 1024
+    _CACHED_STATEMENTS = 512
+
+    def __init__(self, db_file, *, size=None, read_only=True, timeout=None,
+                 mmap_size=None, cache_size=None):
+        """Initalizes the pool for the given database file. No connection is opened yet.
+
+        Args:
+            db_file (str): database file, or a "file:" URI
+            size (int): maximum number of open connections
+            read_only (bool): open connections with mode=ro and PRAGMA query_only
+            timeout (float): seconds to wait for a free connection
+            mmap_size (int): bytes of the database to memory-map (PRAGMA mmap_size)
+            cache_size (int): page cache size, negative values are in KiB (PRAGMA cache_size)
+        """
+
+        assert (size is None) or (size > 0), "size must be positive."
+
+        self._db_file = db_file
+        self._size = size or ConnectionPool._SIZE
+        self._read_only = read_only
+        self._timeout = ConnectionPool._TIMEOUT if timeout is None else timeout
+        self._mmap_size = ConnectionPool._MMAP_SIZE if mmap_size is None else mmap_size
+        self._cache_size = ConnectionPool._CACHE_SIZE if cache_size is None else cache_size
+
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._closed = False
+        self._in_use = {}
+        self._owner = threading.local()
+        self._lock = threading.Lock()
+
+    @property
+    def size(self):
+        """Maximum number of connections the pool opens."""
+
+        return self._size
+
+    @contextmanager
+    def connection(self):
+        """Checks out a healthy connection for the duration of a with block
+        and returns it to the pool afterwards.
+
+        Raises:
+            PoolTimeoutError: if every connection stays busy for longer than the timeout
+        """
+
+        with profiling.stage("connect"):
+            connection = self._checkout()
+        with self._lock:
+            self._in_use[connection] = self.owner()
+        try:
+            yield connection
+        finally:
+            with self._lock:
+                self._in_use.pop(connection, None)
+            self._checkin(connection)
+
+    def owner(self):
+        """Returns who the connections checked out in this thread are held on behalf of:
+        the owner given to owned_by, or else threading.get_ident() of the thread."""
+
+        owner = getattr(self._owner, "value", None)
+        return threading.get_ident() if owner is None else owner
+
+    @contextmanager
+    def owned_by(self, owner):
+        """Checks out the connections of a with block on behalf of owner, so that interrupt
+        finds them by owner even when they are used later on, or from another thread.
+
+        Args:
+            owner (object): hashable token, e.g. one per task
+        """
+
+        previous = getattr(self._owner, "value", None)
+        self._owner.value = owner
+        try:
+            yield
+        finally:
+            self._owner.value = previous
+
+    def interrupt(self, owner):
+        """Aborts the statements running on the connections checked out on behalf of owner,
+        if any; each statement raises sqlite3.OperationalError where it runs.
+
+        Args:
+            owner (object): owner given to owned_by, or threading.get_ident() of the thread
+                that checked the connections out otherwise
+
+        Return:
+            bool: True if a connection was interrupted
+        """
+
+        with self._lock:
+            connections = [connection for connection, holder in self._in_use.items()
+                           if holder == owner]
+            for connection in connections:
+                connection.interrupt()
+        return bool(connections)
+
+    def close(self):
+        """Closes every idle connection. Connections checked out at the time,
+        or afterwards, are closed when they are returned."""
+
+        self._closed = True
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(connection)
+
+# **************************************
+# *           BEGIN PRIVATE            *
+# **************************************
+
+    def _uri(self):
+        """Returns the URI to open the database file with."""
+
+        if self._db_file.startswith("file:"):
+            return self._db_file
+
+        uri = "file:" + quote(os.path.abspath(self._db_file))
+        if self._read_only:
+            uri += "?mode=ro"
+        return uri
+
+    def _open(self):
+        """Opens and tunes a new connection."""
+
+        connection = connect(self._uri(), isolation_level=None, uri=True,
+                             check_same_thread=False,
+                             cached_statements=ConnectionPool._CACHED_STATEMENTS)
+        connection.execute(f"PRAGMA mmap_size = {int(self._mmap_size)}")
+        connection.execute(f"PRAGMA cache_size = {int(self._cache_size)}")
+        if self._read_only:
+            connection.execute("PRAGMA query_only = ON")
+        return connection
+
+    def _is_healthy(self, connection):
+        """Returns True iff the connection can still run a statement."""
+
+        try:
+            connection.execute("SELECT 1").fetchone()
+        except Error:
+            return False
+        return True
+
+    def _checkout(self):
+        """Returns an idle healthy connection, opening one if the pool is not full yet."""
+
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                connection = None
+
+            if connection is None:
+                with self._lock:
+                    can_open = self._opened < self._size
+                    if can_open:
+                        self._opened += 1
+                if can_open:
+                    try:
+                        return self._open()
+                    except Error:
+                        with self._lock:
+                            self._opened -= 1
+                        raise
+                try:
+                    connection = self._idle.get(timeout=self._timeout)
+                except queue.Empty as err:
+                    raise PoolTimeoutError("timed out waiting for a database connection") from err
+
+            if self._is_healthy(connection):
+                return connection
+            self._discard(connection)
+
+    def _checkin(self, connection):
+        """Returns a connection to the pool, rolling back anything left open on it."""
+
+        if self._closed:
+            self._discard(connection)
+            return
+        if connection.in_transaction:
+            try:
+                connection.rollback()
+            except Error:
+                self._discard(connection)
+                return
+        self._idle.put(connection)
+
+    def _discard(self, connection):
+        """Closes a connection and frees its slot in the pool."""
+
+        try:
+            connection.close()
+        except Error:
+            pass
+        with self._lock:
+            self._opened -= 1
@@ -0,0 +1,248 @@
+"""Module handling opt-in profiling of searches.
+
+While a profile is active in a thread, the queries run in that thread record
+the time spent in each stage (connect, execute, fetch, clean, format, render),
+the rows fetched and the EXPLAIN QUERY PLAN of every statement. The profile is
+logged as one JSON object on the "lux.profile" logger when it ends, and handed
+to every hook added with add_hook. Statements slower than the slow-query
+threshold are also logged on their own, with their full plan.
+
+Without an active profile, stage, execute and fetch only cost a thread-local lookup.
+"""
+
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+LOGGER = logging.getLogger("lux.profile")
+
+# default threshold above which a statement's full plan is logged
+SLOW_QUERY_MS = 500.0
+
+# stages a profile reports, in order, even if no time was spent in them
+STAGES = ("connect", "execute", "fetch", "clean", "format", "render")
+
+_local = threading.local()
+_hooks = []
+
+class Profile():
+    """Class to represent the profile of one request.
+    Stores the time spent in each stage and the statements run.
+    """
+
+    def __init__(self, name, *, slow_ms=None):
+        """Initalizes an empty profile.
+
+        Args:
+            name (str): name of the request, e.g. the program run
+            slow_ms (float): threshold above which a statement's full plan is logged
+        """
+
+        self._name = name
+        self._slow_ms = SLOW_QUERY_MS if slow_ms is None else slow_ms
+        self._start = time.perf_counter()
+        self._total_ms = None
+        self._stages = dict.fromkeys(STAGES, 0.0)
+        self._rows = 0
+        self._statements = []
+
+    @contextmanager
+    def stage(self, name):
+        """Adds the time spent in a with block to the given stage."""
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._stages[name] = self._stages.get(name, 0.0) + \
+                (time.perf_counter() - start) * 1000
+
+    def add_statement(self, cursor, smt_str, params, execute_ms):
+        """Records a statement that was just executed on cursor, with its plan."""
+
+        try:
+            plan = [list(row) for row in
+                    cursor.connection.execute("EXPLAIN QUERY PLAN " + smt_str, params)]
+        except Exception as err: # pylint: disable=broad-except
+            plan = [[None, None, None, f"EXPLAIN QUERY PLAN failed: {err}"]]
+
+        self._statements.append({"sql": smt_str, "params": list(params),
+                                 "execute_ms": execute_ms, "fetch_ms": 0.0, "rows": 0,
+                                 "plan": plan})
+
+    def add_rows(self, count, fetch_ms):
+        """Adds rows fetched, and the time fetching them took, to the last statement."""
+
+        self._rows += count
+        if self._statements:
+            self._statements[-1]["rows"] += count
+            self._statements[-1]["fetch_ms"] += fetch_ms
+
+    def finish(self):
+        """Stops the clock of the profile."""
+
+        self._total_ms = (time.perf_counter() - self._start) * 1000
+
+    def slow_statements(self):
+        """Returns the statements whose execute and fetch time exceeds the threshold."""
+
+        return [statement for statement in self._statements
+                if statement["execute_ms"] + statement["fetch_ms"] > self._slow_ms]
+
+    def report(self):
+        """Returns the profile as a dictionary that can be logged as JSON. Plans are
+        shortened to their detail lines, indented by depth."""
+
+        statements = []
+        for statement in self._statements:
+            summary = {key: value for key, value in statement.items() if key != "plan"}
+            summary["plan"] = plan_lines(statement["plan"])
+            statements.append(summary)
+
+        return {
+            "event": "profile",
+            "name": self._name,
+            "total_ms": self._total_ms,
+            "stages_ms": dict(self._stages),
+            "rows": self._rows,
+            "statements": statements,
+        }
+
+def current():
+    """Returns the profile active in this thread, or None."""
+
+    return getattr(_local, "profile", None)
+
+@contextmanager
+def profile(name, *, slow_ms=None, stream=None):
+    """Profiles the queries run in a with block in this thread, and logs the profile
+    and any slow statements when the block ends.
+
+    Args:
+        name (str): name of the request, e.g. the program run
+        slow_ms (float): threshold above which a statement's full plan is logged
+        stream (file): if given, the logs are also written to stream while the block runs
+
+    Yields:
+        Profile: the active profile
+    """
+
+    handler = None
+    level = LOGGER.level
+    if stream is not None:
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        LOGGER.addHandler(handler)
+        LOGGER.setLevel(logging.INFO)
+
+    active = Profile(name, slow_ms=slow_ms)
+    previous = current()
+    _local.profile = active
+    try:
+        yield active
+    finally:
+        _local.profile = previous
+        active.finish()
+        try:
+            emit(active)
+        finally:
+            if handler is not None:
+                LOGGER.removeHandler(handler)
+                LOGGER.setLevel(level)
+
+def run_profiled(name, args, run, *, stream=None):
+    """Calls run, within a profile if the parsed arguments of a CLI ask for one
+    (see output.add_output_arguments).
+
+    Args:
+        name (str): name of the request, e.g. the program run
+        args (argparse.Namespace): parsed arguments, with profile and slow_ms
+        run (callable): function to call
+        stream (file): stream the profile is written to
+
+    Return:
+        the return value of run
+    """
+
+    if not args.profile:
+        return run()
+    with profile(name, slow_ms=args.slow_ms, stream=stream):
+        return run()
+
+def emit(active):
+    """Logs a finished profile, logs its slow statements with their full plans
+    and passes the report to every hook."""
+
+    report = active.report()
+    LOGGER.info(json.dumps(report))
+
+    for statement in active.slow_statements():
+        LOGGER.warning(json.dumps({"event": "slow_query", "name": report["name"],
+                                   "sql": statement["sql"], "params": statement["params"],
+                                   "execute_ms": statement["execute_ms"],
+                                   "fetch_ms": statement["fetch_ms"], "rows": statement["rows"],
+                                   "plan": statement["plan"]}))
+
+    for hook in list(_hooks):
+        hook(report)
+
+def add_hook(hook):
+    """Registers a function called with the report (see Profile.report) of every profile."""
+
+    _hooks.append(hook)
+
+def remove_hook(hook):
+    """Unregisters a function added with add_hook."""
+
+    _hooks.remove(hook)
+
+@contextmanager
+def stage(name):
+    """Adds the time spent in a with block to a stage of the active profile, if any."""
+
+    active = current()
+    if active is None:
+        yield
+        return
+    with active.stage(name):
+        yield
+
+def execute(cursor, smt_str, params=()):
+    """Executes a statement on cursor and, if a profile is active,
+    records it with its plan and the time it took."""
+
+    active = current()
+    if active is None:
+        return cursor.execute(smt_str, params)
+
+    start = time.perf_counter()
+    with active.stage("execute"):
+        cursor.execute(smt_str, params)
+    active.add_statement(cursor, smt_str, params, (time.perf_counter() - start) * 1000)
+    return cursor
+
+def fetch(cursor, size=None):
+    """Fetches every remaining row of cursor, or the next size rows, and,
+    if a profile is active, records how many there were and how long it took."""
+
+    active = current()
+    if active is None:
+        return cursor.fetchall() if size is None else cursor.fetchmany(size)
+
+    start = time.perf_counter()
+    with active.stage("fetch"):
+        rows = cursor.fetchall() if size is None else cursor.fetchmany(size)
+    active.add_rows(len(rows), (time.perf_counter() - start) * 1000)
+    return rows
+
+def plan_lines(plan):
+    """Returns the detail lines of an EXPLAIN QUERY PLAN, indented by their depth."""
+
+    depths = {0: -1}
+    lines = []
+    for node_id, parent, _, detail in plan:
+        depths[node_id] = depths.get(parent, -1) + 1
+        lines.append("  " * depths[node_id] + str(detail))
+    return lines
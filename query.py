@@ -1,9 +1,108 @@
 """Module handling queries for the database."""
 
+import re
 from contextlib import closing
-from sqlite3 import connect
-from datetime import datetime
-from lux_query_sql import QUERY_LUX
+from functools import lru_cache
+import profiling
+from pool import ConnectionPool
+from lux_query_sql import (QUERY_LUX_TEMPLATE, QUERY_SEARCH_TABLE, QUERY_SEARCH_TABLE_DEP,
+                           QUERY_SEARCH_TABLE_DEP_PAGE,
+                           SEARCH_TABLE, SEARCH_DEPARTMENTS_TABLE, SEARCH_TABLE_DEP_FILTER,
+                           DIRTY_TABLE, FTS_TABLE, CANDIDATE_LABEL,
+                           CANDIDATE_DEP, CANDIDATE_AGT, CANDIDATE_CLS, CLASSIFIER_NAMES,
+                           CLASSIFIER_NAMES_TABLE, CLASSIFIER_NAMES_STORED,
+                           AGGREGATE_AGT, AGGREGATE_CLS, DETAILS_LABEL, DETAILS_AGENTS,
+                           DETAILS_NATIONALITIES, DETAILS_CLASSIFIERS, DETAILS_REFERENCES)
+
+# expressions search filters and sorts on, for the live query and the search table
+LIVE_COLUMNS = {
+    "dep": "department.dep_name",
+    "dep_sort": "department.dep_name",
+    "agt": "agent.artist",
+    "classifier": "classifier.classification",
+    "label": "objects.label",
+    "date": "objects.date",
+    "id": "objects.id",
+    "group_by": " GROUP BY objects.id, objects.label",
+}
+SEARCH_TABLE_COLUMNS = {
+    "dep": "department.dep_name",
+    "dep_sort": f"{SEARCH_TABLE}.dep_name",
+    "agt": f"{SEARCH_TABLE}.artist",
+    "classifier": f"{SEARCH_TABLE}.classification",
+    "label": f"{SEARCH_TABLE}.label",
+    "date": f"{SEARCH_TABLE}.date",
+    "id": f"{SEARCH_TABLE}.id",
+    "group_by": "",
+}
+
+# LIKE filters and the FTS5 column each of them can be answered from
+FTS_COLUMNS = {
+    "dep": "department",
+    "agt": "artist",
+    "classifier": "classification",
+    "label": "label",
+}
+
+# the trigram tokenizer cannot match anything shorter than this
+FTS_MIN_TERM = 3
+
+# order of the filters in the WHERE clause
+FILTER_KEYS = ("dep", "label", "agt", "classifier")
+
+# filter on a single object for each search term that cannot be answered by a semi-join
+COUNT_FILTERS = {
+    "dep": CANDIDATE_DEP,
+    "agt": f"{AGGREGATE_AGT} LIKE ?",
+    "classifier": f"{AGGREGATE_CLS} LIKE ?",
+    "label": CANDIDATE_LABEL,
+}
+
+# statement fetching each relation of an object for LuxDetailsQuery
+DETAILS_RELATIONS = {
+    "agents": DETAILS_AGENTS,
+    "nationalities": DETAILS_NATIONALITIES,
+    "classifiers": DETAILS_CLASSIFIERS,
+    "references": DETAILS_REFERENCES,
+}
+
+# number of objects LuxDetailsQuery.search_many fetches per query
+DETAILS_BATCH_SIZE = 500
+
+# name and index of the result column behind each sort key, for paging through results
+RESULT_COLUMNS = {
+    "id": ("id", 0),
+    "label": ("label", 1),
+    "agt": ("artist", 2),
+    "date": ("date", 3),
+    "dep": ("dep_name", 4),
+    "classifier": ("classification", 5),
+}
+
+# default number of rows fetched per page when streaming results
+PAGE_SIZE = 1000
+
+# number of rows search returns at most
+SEARCH_LIMIT = 1000
+
+# number of statement shapes kept; there are only a few hundred possible ones
+STATEMENT_CACHE_SIZE = 512
+
+# agent dates: a year, optionally with a month and a day and a time after them,
+# and a minus sign for years before the common era
+DATE_PATTERN = re.compile(r"\s*(-?)(\d+)(?:-\d{1,2}(?:-\d{1,2})?)?(?:[T ].*)?", re.DOTALL)
+
+# number of distinct dates whose year is kept; agents share few of them
+DATE_CACHE_SIZE = 4096
+
+# semi-join for each filter, and the characters that keep a term from being
+# pushed into it: LIKE wildcards and the separator of the aggregated column
+CANDIDATE_FILTERS = {
+    "dep": (CANDIDATE_DEP, "%_"),
+    "agt": (CANDIDATE_AGT, "%_,"),
+    "classifier": (CANDIDATE_CLS, "%_|"),
+    "label": (CANDIDATE_LABEL, ""),
+}
 
 class NoSearchResultsError(Exception):
     """Exception class to handle no search results."""
@@ -37,20 +136,25 @@ class LuxQuery(Query):
     Stores the columns for the output table.
     """
 
-    def __init__(self, db_file):
+    def __init__(self, db_file, pool=None, cache=None):
         """Initalizes the class with the database file and
         the columns and format_str for the output table.
 
         Args:
             db_file (str): database file
+            pool (ConnectionPool): pool to take connections from,
+                by default a read-only pool of its own
+            cache (ResultCache): cache for search results, by default none
         """
 
         self._db_file = db_file
+        self._pool = pool or ConnectionPool(db_file)
+        self._cache = cache
         self._columns = ["ID", "Label", "Produced By", "Date", "Member Of", "Classified As"]
         self._format_str=["w", "w", "w", "w", "w", "p"]
 
     def search(self, dep=None, agt=None, classifier=None, label=None):
-        """Opens a connection to the database and uses the given argument to create a
+        """Takes a connection from the pool and uses the given argument to create a
         SQL statement that query the database satisfying the search criteria.
 
         Args:
@@ -71,68 +175,294 @@ class LuxQuery(Query):
             then by classifier, then by department name.
         """
 
-        with connect(self._db_file, isolation_level=None, uri=True) as connection:
-            with closing(connection.cursor()) as cursor:
-                # making query backbone to be used in each of the 4 queries below
-                smt_str = QUERY_LUX
-                smt_count = 0
-                smt_params = []
-
-                # WHERE clause
-                if dep or label or agt or classifier:
-                    smt_str += " WHERE"
-                if dep:
-                    smt_str += " department.dep_name LIKE ?"
-                    smt_params.append(f"%{dep}%")
-                    smt_count += 1
-                if label:
-                    if smt_count >= 1:
-                        smt_str += " AND"
-                    smt_str += " objects.label LIKE ?"
-                    smt_params.append(f"%{label}%")
-                    smt_count += 1
-                if agt:
-                    if smt_count >= 1:
-                        smt_str += " AND"
-                    smt_str += " agent.artist LIKE ?"
-                    smt_count += 1
-                    smt_params.append(f"%{agt}%")
-                if classifier:
-                    if smt_count >= 1:
-                        smt_str += " AND"
-                    smt_str += " classifier.classification LIKE ?"
-                    smt_count += 1
-                    smt_params.append(f"%{classifier}%")
-
-                smt_str += " GROUP BY objects.id, objects.label"
-
-                #create the sort order for the query based on present args
-                sort_str = " ORDER BY objects.label, objects.date, "
-                sort_list = []
-                params_list = {
-                    agt: 'agent.artist',
-                    classifier:  'classifier.classification',
-                    dep: 'department.dep_name',
-                }
-
-                for key, value in params_list.items():
-                    if key:
-                        sort_list.append(value)
+        terms = {"dep": dep, "agt": agt, "classifier": classifier, "label": label}
 
-                for key, value in params_list.items():
-                    if not key:
-                        sort_list.append(value)
+        cache_key = ("search", dep, agt, classifier, label)
+        if self._cache is not None:
+            response = self._cache.get(cache_key)
+            if response is not None:
+                return response
+            stamp = self._cache.stamp()
 
-                param_sort_str = sort_str +  ", ".join(sort_list)
-                smt_str += param_sort_str
-                smt_str += " LIMIT 1000"
+        with self._pool.connection() as connection:
+            with closing(connection.cursor()) as cursor:
+                shape, smt_params = self.statement_shape(cursor, terms)
+                smt_str = build_statement(*shape)
 
                 #execute the statement and fetch the results
-                cursor.execute(smt_str, smt_params)
-                data = cursor.fetchall()
+                profiling.execute(cursor, smt_str, smt_params)
+                data = profiling.fetch(cursor)
                 search_count = len(data)
 
-        return search_count, self._columns, self._format_str, data
+        response = search_count, self._columns, self._format_str, data
+        if self._cache is not None:
+            self._cache.put(cache_key, response, stamp)
+
+        return response
+
+    def count(self, dep=None, agt=None, classifier=None, label=None):
+        """Counts every object satisfying the search criteria, without the limit
+        of 1000 objects of search and without building the result rows.
+
+        Args:
+            dep, agt, classifier, label (str): search criteria, as for search
+
+        Return:
+            int: number of objects found
+        """
+
+        terms = {"dep": dep, "agt": agt, "classifier": classifier, "label": label}
+
+        cache_key = ("count", dep, agt, classifier, label)
+        if self._cache is not None:
+            search_count = self._cache.get(cache_key)
+            if search_count is not None:
+                return search_count
+            stamp = self._cache.stamp()
+
+        with self._pool.connection() as connection:
+            with closing(connection.cursor()) as cursor:
+                shape, smt_params = self.statement_shape(cursor, terms)
+                indexed, present, narrowed = shape[:3]
+                if not indexed:
+                    # the count filters every term once, without a separate narrowing step
+                    smt_params = smt_params[len(narrowed):]
+                smt_str = build_count_statement(indexed, present, narrowed, shape[4])
+
+                profiling.execute(cursor, smt_str, smt_params)
+                search_count = profiling.fetch(cursor)[0][0]
+
+        if self._cache is not None:
+            self._cache.put(cache_key, search_count, stamp)
+
+        return search_count
+
+    @property
+    def columns(self):
+        """Column names of the result rows."""
+
+        return self._columns
+
+    @property
+    def format_str(self):
+        """Table format specifiers for the result columns."""
+
+        return self._format_str
+
+    @property
+    def column_keys(self):
+        """Names of the result columns for machine-readable output, e.g. produced_by."""
+
+        return [column.lower().replace(" ", "_") for column in self._columns]
+
+    def iter_pages(self, dep=None, agt=None, classifier=None, label=None, *,
+                   page_size=PAGE_SIZE, after=None):
+        """Generator yielding every result of a search, a page at a time.
+
+        Pages are fetched with keyset pagination on the sort order of search
+        (plus the object id to break ties), so only one page is held in memory at
+        a time. On the search table, each page after the first seeks its first label
+        on the label index and reads on in label order until the page is full, so
+        walking every page reads the table about once. The full-text index is not
+        used, as its matches would be looked up again for every page. A connection is only taken
+        from the pool while a page is fetched. Without an up-to-date search table,
+        the pages are fetched from one statement instead, on a connection held
+        until the generator finishes or is closed.
+
+        Args:
+            dep, agt, classifier, label (str): search criteria, as for search
+            page_size (int): number of rows per page
+            after (list): row to resume after, e.g. the last row of an earlier page
+
+        Yields:
+            list: the rows of the next page, never empty
+        """
+
+        assert page_size > 0, "page_size must be positive."
+
+        terms = {"dep": dep, "agt": agt, "classifier": classifier, "label": label}
+
+        # the full-text index would have to be matched again for every page
+        with self._pool.connection() as connection:
+            with closing(connection.cursor()) as cursor:
+                shape, smt_params = self.statement_shape(cursor, terms, fts=False)
+        indexed, sort_keys = shape[0], shape[3]
+
+        # without the search table every page would aggregate the objects all over again,
+        # so the pages are read from a single statement, keeping its connection meanwhile
+        if not indexed:
+            page_params = [] if after is None else page_params_after(after, sort_keys)
+            smt_str = build_statement(*shape, keyset=after is not None,
+                                      bounded=is_bounded(after))
+            with self._pool.connection() as connection:
+                with closing(connection.cursor()) as cursor:
+                    profiling.execute(cursor, smt_str, smt_params + page_params + [-1])
+                    while page := profiling.fetch(cursor, page_size):
+                        yield page
+            return
+
+        while True:
+            page_params = [] if after is None else page_params_after(after, sort_keys)
+            smt_str = build_statement(*shape, keyset=after is not None,
+                                      bounded=is_bounded(after))
+
+            with self._pool.connection() as connection:
+                with closing(connection.cursor()) as cursor:
+                    profiling.execute(cursor, smt_str, smt_params + page_params + [page_size])
+                    page = profiling.fetch(cursor)
+
+            if page:
+                yield page
+            if len(page) < page_size:
+                return
+            after = page[-1]
+
+    def iter_search(self, dep=None, agt=None, classifier=None, label=None, *,
+                    page_size=PAGE_SIZE, after=None):
+        """Generator yielding every result of a search one row at a time,
+        in the same order as search but without its limit of 1000 objects.
+        Takes the same arguments as iter_pages.
+        """
+
+        for page in self.iter_pages(dep, agt, classifier, label,
+                                    page_size=page_size, after=after):
+            yield from page
+
+    def statement_shape(self, cursor, terms, fts=True):
+        """Works out which statement answers a search and the parameters to run it with.
+
+        Searches of the same shape share one statement: which filters are present,
+        which of them can narrow down the candidates early, the sort order, and for
+        the live query whether the case-folded classifier names are stored.
+
+        Args:
+            cursor (sqlite3.Cursor): cursor used to inspect the database
+            terms (dict): search terms keyed like the arguments of search
+            fts (bool): narrow the search table down with the full-text index
+
+        Returns:
+            tuple: arguments for build_statement and the list of parameters
+        """
+
+        # read from the search table when it is up to date,
+        # otherwise aggregate the objects on the fly
+        indexed = self.index_is_fresh(cursor)
+        if indexed and not fts:
+            narrowed, smt_params = (), []
+        elif indexed:
+            narrowed, smt_params = self.fts_filter(cursor, terms)
+        else:
+            narrowed, smt_params = self.candidate_filter(terms)
+
+        present = tuple(key for key in FILTER_KEYS if terms[key])
+        filter_params = [f"%{terms[key]}%" for key in present]
+        if indexed and "dep" in present:
+            # the department filter of the search table comes before the other clauses
+            smt_params = filter_params[:1] + smt_params + filter_params[1:]
+        else:
+            smt_params += filter_params
+
+        stored_names = not indexed and self.classifier_names_stored(cursor)
+
+        return (indexed, present, narrowed, search_sort_keys(terms), stored_names), smt_params
+
+    def candidate_filter(self, terms):
+        """Picks the filters that can narrow down the objects the live query
+        aggregates, using a semi-join per filter.
+
+        A term containing the separator of its aggregated column could match
+        across two values, and a LIKE wildcard could match the separator itself,
+        so such terms are only applied after the aggregation. The filters of the
+        statement are applied afterwards either way, so the results do not change.
+
+        Args:
+            terms (dict): search terms keyed like the arguments of search
+
+        Returns:
+            tuple: keys of the filters pushed down and the list of their parameters
+        """
+
+        narrowed = []
+        params = []
+        for key, term in terms.items():
+            if term and not any(char in term for char in CANDIDATE_FILTERS[key][1]):
+                narrowed.append(key)
+                params.append(f"%{term}%")
+
+        return tuple(narrowed), params
+
+    def index_is_fresh(self, cursor):
+        """Checks whether the search table and full-text index exist and
+        have no pending changes to pick up.
+
+        Args:
+            cursor (sqlite3.Cursor): cursor to run the check on
+
+        Return:
+            bool: True if searches can be answered from the search table
+        """
+
+        cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table'"
+                       " AND name IN (?, ?, ?)",
+                       [SEARCH_TABLE, SEARCH_DEPARTMENTS_TABLE, DIRTY_TABLE])
+        if cursor.fetchone()[0] < 3:
+            return False
+
+        cursor.execute(f"SELECT 1 FROM {DIRTY_TABLE} LIMIT 1")
+        return cursor.fetchone() is None
+
+    def classifier_names_stored(self, cursor):
+        """Checks whether the case-folded classifier names are stored in the database
+        (see CLASSIFIER_NAMES_STORED), for the live query to read rather than fold.
+
+        Args:
+            cursor (sqlite3.Cursor): cursor to run the check on
+        """
+
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                       [CLASSIFIER_NAMES_TABLE])
+        return cursor.fetchone() is not None
+
+    def fts_filter(self, cursor, terms):
+        """Picks the filters the full-text index can narrow the search table down with.
+
+        The index only ever narrows the candidates down; the LIKE filters of the
+        statement still decide the final result, so the output is the same with or
+        without it. Terms that are too short for the trigram tokenizer or contain
+        LIKE wildcards are left to the LIKE filters alone.
+
+        Args:
+            cursor (sqlite3.Cursor): cursor used to check whether the index exists
+            terms (dict): search terms keyed like the arguments of search
+
+        Returns:
+            tuple: keys of the filters matched against the index
+            and the list holding the MATCH expression, if any
+        """
+
+        narrowed = []
+        phrases = []
+        for key, term in terms.items():
+            if term and len(term) >= FTS_MIN_TERM and "%" not in term and "_" not in term:
+                phrase = term.replace('"', '""')
+                narrowed.append(key)
+                phrases.append(f'{FTS_COLUMNS[key]} : "{phrase}"')
+
+        if not phrases:
+            return (), []
+
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                       [FTS_TABLE])
+        if cursor.fetchone() is None:
+            return (), []
+
+        return tuple(narrowed), [" AND ".join(phrases)]
+
+    def statement_cache_info(self):
+        """Returns the hits, misses, maxsize and currsize of the statement cache
+        shared by all LuxQuery instances."""
+
+        return build_statement.cache_info()
 
     def format_data(self, data):
         pass
@@ -140,59 +470,383 @@ class LuxQuery(Query):
     def clean_data(self, data):
         pass
 
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def build_statement(indexed, present, narrowed, sort_keys, stored_names=False,
+                    keyset=None, bounded=False):
+    """Builds the SQL statement for one shape of search (see LuxQuery.statement_shape).
+    Statements are cached, and so are the SQLite statements prepared from them
+    since each shape always yields the very same string.
+
+    Args:
+        indexed (bool): read from the search table instead of aggregating on the fly
+        present (tuple): keys of the filters in the search, in FILTER_KEYS order
+        narrowed (tuple): keys of the filters that narrow down the candidates early
+        sort_keys (tuple): keys of the columns to sort by after label and date
+        stored_names (bool): read the case-folded classifier names stored in the
+            database rather than folding them in the live query
+        keyset (bool): None for the first 1000 results, otherwise build a page query;
+            False for the first page, True for a page after a given key
+        bounded (bool): for a page after a key whose label is not NULL, also bound
+            the label from below, so that the page starts from a seek on the index
+
+    Returns:
+        str: SQL statement taking the narrowing parameters, then the filter parameters,
+        and for pages the key parameters (see page_params) and the page size; on the
+        search table, a department filter parameter comes first
+    """
+
+    columns = SEARCH_TABLE_COLUMNS if indexed else LIVE_COLUMNS
+    filters = present
+
+    clauses = []
+    page_clauses = []
+    if indexed:
+        smt_str = QUERY_SEARCH_TABLE
+        if "dep" in present:
+            # the department filter is joined in, and so is the department it matched;
+            # pages look it up for each object instead and drop those without one
+            smt_str = QUERY_SEARCH_TABLE_DEP
+            if keyset is not None:
+                smt_str = QUERY_SEARCH_TABLE_DEP_PAGE
+                page_clauses.append("dep_name IS NOT NULL")
+            columns = dict(columns, dep_sort=columns["dep"])
+            filters = present[1:]
+        if narrowed:
+            clauses.append(f"{SEARCH_TABLE}.id IN (SELECT rowid FROM {FTS_TABLE}"
+                           f" WHERE {FTS_TABLE} MATCH ?)")
+    else:
+        candidate_str = ""
+        if narrowed:
+            candidate_str = " WHERE " + " AND ".join(
+                CANDIDATE_FILTERS[key][0] for key in narrowed)
+        smt_str = QUERY_LUX_TEMPLATE.format(
+            candidate_filter=candidate_str,
+            classifier_names=CLASSIFIER_NAMES_STORED if stored_names else CLASSIFIER_NAMES)
+
+    # WHERE clause
+    clauses += [f"{columns[key]} LIKE ?" for key in filters]
+    if clauses:
+        smt_str += " WHERE " + " AND ".join(clauses)
+
+    smt_str += columns["group_by"]
+
+    if keyset is None:
+        sort_list = [columns["label"], columns["date"]]
+        sort_list += [columns["dep_sort" if key == "dep" else key] for key in sort_keys]
+        sort_list.append(columns["id"])
+        smt_str += " ORDER BY " + ", ".join(sort_list)
+        smt_str += f" LIMIT {SEARCH_LIMIT}"
+        return smt_str
+
+    # page through the results in sort order, resuming after the key of the last row
+    # seen; NULLs sort first, so a NULL in the key is smaller than any value. The
+    # OR of the comparisons cannot be looked up in an index, so the label bound,
+    # which can, keeps every page from scanning the results before it
+    page_keys = [RESULT_COLUMNS[key][0] for key in ("label", "date") + sort_keys + ("id",)]
+    page_str = f"SELECT * FROM ({smt_str}) AS results"
+    if keyset:
+        after = []
+        for idx, name in enumerate(page_keys):
+            equal = [f"{prev} IS ?" for prev in page_keys[:idx]]
+            after.append("(" + " AND ".join(
+                equal + [f"({name} > ? OR (? IS NULL AND {name} IS NOT NULL))"]) + ")")
+        if bounded:
+            page_clauses.append(f"{page_keys[0]} >= ?")
+        page_clauses.append("(" + " OR ".join(after) + ")")
+    if page_clauses:
+        page_str += " WHERE " + " AND ".join(page_clauses)
+    page_str += " ORDER BY " + ", ".join(page_keys)
+    page_str += " LIMIT ?"
+
+    return page_str
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def build_count_statement(indexed, present, narrowed, stored_names=False):
+    """Builds the SQL statement counting the results of one shape of search.
+
+    The search table is counted with the same filters as build_statement. Otherwise
+    objects are counted straight from the objects table: a semi-join decides each
+    term that could be pushed down, and the aggregated column is only computed, for
+    one object at a time, for the terms that could not.
+
+    Args:
+        indexed, present, narrowed, stored_names: as for build_statement
+
+    Returns:
+        str: SQL statement taking the parameters of build_statement when indexed,
+        otherwise only the filter parameters
+    """
+
+    clauses = []
+    if indexed:
+        smt_str = f"SELECT COUNT(*) FROM {SEARCH_TABLE}"
+        if "dep" in present:
+            clauses.append(SEARCH_TABLE_DEP_FILTER)
+        if narrowed:
+            clauses.append(f"{SEARCH_TABLE}.id IN (SELECT rowid FROM {FTS_TABLE}"
+                           f" WHERE {FTS_TABLE} MATCH ?)")
+        clauses += [f"{SEARCH_TABLE_COLUMNS[key]} LIKE ?" for key in present if key != "dep"]
+    else:
+        smt_str = "SELECT COUNT(*) FROM objects"
+        for key in present:
+            if key in narrowed:
+                clauses.append(CANDIDATE_FILTERS[key][0])
+            else:
+                clauses.append(COUNT_FILTERS[key])
+        if "classifier" in present and "classifier" not in narrowed:
+            names = CLASSIFIER_NAMES_STORED if stored_names else CLASSIFIER_NAMES
+            smt_str = f"WITH {names} {smt_str}"
+
+    if clauses:
+        smt_str += " WHERE " + " AND ".join(clauses)
+
+    return smt_str
+
+def search_sort_keys(terms):
+    """Returns the keys of the columns a search sorts by after label and date.
+
+    Args:
+        terms (dict): search terms keyed like the arguments of search
+    """
+
+    #create the sort order for the query based on present args
+    params_list = {
+        terms["agt"]: "agt",
+        terms["classifier"]: "classifier",
+        terms["dep"]: "dep",
+    }
+    sort_keys = tuple(value for key, value in params_list.items() if key)
+    sort_keys += tuple(value for key, value in params_list.items() if not key)
+
+    return sort_keys
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def date_year(date, bce=False):
+    """Returns the year of an agent's date as shown in timespans, e.g. 1850 for
+    1850-01-01 and 500 BCE for 0500-03-01 with bce set, or the date itself if it
+    is not understood (see DATE_PATTERN).
+
+    Args:
+        date (str): date as stored in the agents table
+        bce (bool): whether the date is before the common era
+    """
+
+    match = DATE_PATTERN.fullmatch(str(date))
+    if match is None:
+        return str(date)
+
+    year = int(match.group(2))
+    if bce or match.group(1):
+        return f"{year} BCE"
+    return str(year)
+
+def is_bounded(row):
+    """Returns True if a page resuming after row can bound the label from below
+    (see build_statement), i.e. if there is a row and its label is not NULL."""
+
+    return row is not None and row[RESULT_COLUMNS["label"][1]] is not None
+
+def page_params_after(row, sort_keys):
+    """Returns the parameters for a page statement resuming after row,
+    starting with the label bound if is_bounded(row).
+
+    Args:
+        row (list): result row to resume after
+        sort_keys (tuple): sort keys of the statement, as for build_statement
+    """
+
+    values = [row[RESULT_COLUMNS[key][1]] for key in ("label", "date") + sort_keys + ("id",)]
+
+    params = values[:1] if is_bounded(row) else []
+    for idx, value in enumerate(values):
+        params += values[:idx] + [value, value]
+    return params
+
 class LuxDetailsQuery(Query):
     """"Class to represent querying the database.
     Stores the database file for opening connection to later on.
     Stores the columns for the output table.
     """
 
-    def __init__(self, db_file):
+    def __init__(self, db_file, pool=None, cache=None):
+        """Initalizes the class with the database file and
+        the columns and format_str for the output tables.
+
+        Args:
+            db_file (str): database file
+            pool (ConnectionPool): pool to take connections from,
+                by default a read-only pool of its own
+            cache (ResultCache): cache for search results, by default none
+        """
+
         self._db_file = db_file
+        self._pool = pool or ConnectionPool(db_file)
+        self._cache = cache
         self._columns_produced_by = ["Part", "Name", "Timespan", "Nationalities"]
         self._columns_information = ["Type", "Content"]
         self._format_str_produced=["w", "w", "p", "w"]
         self._format_str_information=["w","w"]
 
     def search(self, obj_id):
-        with connect(self._db_file, isolation_level=None, uri=True) as connection:
+        """Takes a connection from the pool and queries the label, agents, classifiers
+        and references of the object with the given id.
+
+        Args:
+            obj_id (str): id of the object
+
+        Return:
+            list: columns and format_str for both Tables,
+            a list of agents and a dictionary with the object's information
+
+        Raises:
+            NoSearchResultsError: if there is no object with the given id
+        """
+
+        responses = self.search_many([obj_id])
+        if obj_id not in responses:
+            raise NoSearchResultsError
+
+        return responses[obj_id]
+
+    def search_many(self, obj_ids):
+        """Queries the details of many objects at once, with one query per relation
+        for every DETAILS_BATCH_SIZE objects rather than a few queries per object.
+
+        Args:
+            obj_ids (iterable): ids of the objects
+
+        Return:
+            dict: the response of search for each id an object was found for;
+            ids no object was found for are left out
+        """
+
+        responses = {}
+        missing = {}
+        for obj_id in obj_ids:
+            response = None
+            if self._cache is not None:
+                response = self._cache.get(("details", obj_id))
+            if response is not None:
+                responses[obj_id] = response
+            else:
+                missing.setdefault(self.object_key(obj_id), []).append(obj_id)
+
+        if self._cache is not None:
+            stamp = self._cache.stamp()
+
+        for key, data in self.iter_details(list(missing)):
+            # data formatting
+            with profiling.stage("clean"):
+                agent_dict, obj_dict = self.clean_data(data)
+            with profiling.stage("format"):
+                agent_rows_list = self.format_data(agent_dict)
+
+            response = [self._columns_produced_by, self._columns_information,
+                        self._format_str_information, self._format_str_produced,
+                        agent_rows_list, obj_dict]
+            for obj_id in missing.get(key, []):
+                responses[obj_id] = response
+                if self._cache is not None:
+                    self._cache.put(("details", obj_id), response, stamp)
+
+        return responses
+
+    def records_many(self, obj_ids):
+        """Queries the details of many objects like search_many, but returns each object
+        as a structured record for machine-readable output rather than as Table rows:
+
+            {"id": ..., "label": ...,
+             "agents": [{"part": ..., "name": ..., "timespan": ..., "nationalities": [...]}],
+             "classifiers": [...],
+             "references": [{"type": ..., "content": ...}]}
+
+        Args:
+            obj_ids (iterable): ids of the objects
+
+        Return:
+            dict: the record for each id an object was found for;
+            ids no object was found for are left out
+        """
+
+        missing = {}
+        for obj_id in obj_ids:
+            missing.setdefault(self.object_key(obj_id), []).append(obj_id)
+
+        records = {}
+        for key, data in self.iter_details(list(missing)):
+            with profiling.stage("clean"):
+                agent_dict, obj_dict = self.clean_data(data)
+
+            # unlike the tables, records leave out the empty rows of objects
+            # without agents or references
+            agents = []
+            if data["agents"]:
+                agents = [{"part": agent["part"], "name": agent["name"],
+                           "timespan": agent["timespan"],
+                           "nationalities": list(agent["nationality"])}
+                          for agent in agent_dict.values()]
+            references = []
+            if data["references"]:
+                references = [{"type": ref_type, "content": ref_content}
+                              for ref_type, ref_content in obj_dict["references"]]
+
+            record = {"id": key, "label": obj_dict["label"], "agents": agents,
+                      "classifiers": obj_dict["classifier"], "references": references}
+            for obj_id in missing[key]:
+                records[obj_id] = record
+
+        return records
+
+    def iter_details(self, keys):
+        """Generator yielding (key, data) for every object found, as fetch_details returns
+        them, with one query per relation for every DETAILS_BATCH_SIZE objects.
+
+        Args:
+            keys (list): object ids, as returned by object_key
+        """
+
+        for start in range(0, len(keys), DETAILS_BATCH_SIZE):
+            yield from self.fetch_details(keys[start:start + DETAILS_BATCH_SIZE]).items()
+
+    def fetch_details(self, keys):
+        """Takes a connection from the pool and fetches every relation of the given objects.
+
+        Args:
+            keys (list): object ids, as returned by object_key
+
+        Return:
+            dict: for each object found, its label and the rows fetched for each relation
+            (agents, nationalities, classifiers, references), without the object id
+        """
+
+        ids = ", ".join("?" * len(keys))
+        details = {}
+
+        with self._pool.connection() as connection:
             with closing(connection.cursor()) as cursor:
-                # objects.label, productions.part, agents.name, nationalities.descriptor,
-                # agents.begin_date, agents.end_date, classifiers.name
-                smt_str = "SELECT DISTINCT objects.label, productions.part, agents.name,"
-                smt_str += "agents.begin_date, agents.end_date,"
-                smt_str += " nationalities.descriptor, classifiers.name,"
-                smt_str += " \"references\".type, \"references\".content, agents.id"
-                # joining objects and agents using productions
-                smt_str += " FROM objects LEFT OUTER JOIN"
-                smt_str += " productions ON productions.obj_id = objects.id"
-                smt_str += " LEFT OUTER JOIN agents on productions.agt_id = agents.id"
-                # joining nationalities using agents_nationalities
-                smt_str += " LEFT OUTER JOIN agents_nationalities"
-                smt_str += " ON agents_nationalities.agt_id = agents.id"
-                smt_str += " LEFT OUTER JOIN nationalities ON"
-                smt_str += " nationalities.id = agents_nationalities.nat_id"
-                # joining references
-                smt_str += " LEFT OUTER JOIN \"references\" ON \"references\".obj_id = objects.id"
-                # joining classifiers using objects_classifiers
-                smt_str += " LEFT OUTER JOIN objects_classifiers ON"
-                smt_str += " objects_classifiers.obj_id = objects.id"
-                smt_str += " LEFT OUTER JOIN classifiers"
-                smt_str += " ON classifiers.id = objects_classifiers.cls_id"
-                smt_str += " WHERE objects.id = ?"
-                smt_params = [obj_id]
-
-                # execute the statement and fetch the results
-                cursor.execute(smt_str, smt_params)
-                data = cursor.fetchall()
-                if not data:
-                    raise NoSearchResultsError
-
-        # data formatting
-        agent_dict, obj_dict = self.clean_data(data)
-        agent_rows_list = self.format_data(agent_dict)
-
-        return [self._columns_produced_by, self._columns_information,
-                self._format_str_information, self._format_str_produced, agent_rows_list, obj_dict]
+                # one query per relation, so the rows fetched grow with each relation
+                # on its own rather than with the product of all of them
+                profiling.execute(cursor, DETAILS_LABEL.format(ids=ids), keys)
+                for key, label in profiling.fetch(cursor):
+                    details[key] = {"label": label}
+                    details[key].update((relation, []) for relation in DETAILS_RELATIONS)
+
+                for relation, smt_str in DETAILS_RELATIONS.items():
+                    profiling.execute(cursor, smt_str.format(ids=ids), keys)
+                    for row in profiling.fetch(cursor):
+                        if row[0] in details:
+                            details[row[0]][relation].append(row[1:])
+
+        return details
+
+    def object_key(self, obj_id):
+        """Returns the object id as stored in the database, so that ids given as strings
+        (e.g. from the command line) find their objects' rows."""
+
+        try:
+            return int(obj_id)
+        except (TypeError, ValueError):
+            return obj_id
 
     def format_data(self, data):
         """Transform each agent's dictionary into a list to fit the Table class requirements.
@@ -214,10 +868,7 @@ class LuxDetailsQuery(Query):
                 break
 
             #join appropriate strings together
-            if data[key]["nationality"] and data[key]["nationality"][0]:
-                data[key]["nationality"] = "|".join(data[key]["nationality"])
-            else:
-                data[key]["nationality"] = ""
+            data[key]["nationality"] = "|".join(data[key]["nationality"])
 
             rows_list.append(list(data[key].values()))
 
@@ -226,90 +877,79 @@ class LuxDetailsQuery(Query):
     def clean_data(self, data):
         """Creates dictionaries for the object queried and the agents associated with that object
         with their relevant information
-        (label, part_produced, produced_by, nationality, begin_date, end_date,
-        classifier, ref_type, ref_content, agent_id).
+        (label, part_produced, produced_by, nationality, timespan,
+        classifier, ref_type, ref_content).
         Stores them in master dictionaries (obj_dict, agent_dict). agent_dict has agent's id as key.
 
         Args:
-            data (list): data returned from cursor.fetchall()
+            data (dict): the object's label and the rows fetched for each relation
+                (agents, nationalities, classifiers, references)
 
         Returns:
             agent_dict (dict):
                 key: agent's id
                 value: dictionary with all information relevant to the agent
             obj_dict (dict):
-                value: dictionary with all information relevant to the obhect
+                value: dictionary with all information relevant to the obhect,
+                with each reference as a [type, content] pair in references
         """
 
         #master dictionary
         agent_dict = {}
-        obj_dict = {}
-
-        #loop through each row in the data, get the relevant data,
-        # and store them in the dictionary for the relevant object
-        for row in data:
-            label = row[0]
-            part_produced = row[1]
-            produced_by = row[2]
-            begin_date = row[3]
-            end_date = row[4]
-            nationality = row[5]
-            classifier = row[6]
-            ref_type = row[7]
-            ref_content = row[8]
-            agent_id = row[9]
-
-            timespan = self.parse_date(begin_date, end_date)
-
-            # create dictionary for object if not already done
-            if not obj_dict:
-                obj_dict =  {
-                    "label" : label,
-                    "classifier" : [classifier],
-                    "ref_type": [ref_type],
-                    "ref_content": [ref_content]
-                }
-            # if dictionary has already been created, then we append classifiers
-            else:
-                if classifier not in obj_dict["classifier"]:
-                    obj_dict['classifier'].append(classifier)
-                # if ref_type not in obj_dict['ref_type'] and :
-                obj_dict['ref_type'].append(ref_type)
-                if ref_content not in obj_dict['ref_content']:
-                    obj_dict['ref_content'].append(ref_content)
-                else:
-                    if ref_type:
-                        obj_dict['ref_type'].pop()
-
-            # if agent has not been stored in agent_dict yet
+
+        # an agent takes the first part it had in the production; nationalities
+        # are kept as dictionary keys, an ordered set without duplicates
+        for part_produced, produced_by, begin_date, end_date, agent_id, begin_bce, end_bce \
+                in data["agents"]:
             if agent_id not in agent_dict:
                 agent_dict[agent_id] = {
                     "part": part_produced,
                     "name": produced_by,
-                    "timespan": timespan,
-                    "nationality": [nationality],
+                    "timespan": self.parse_date(begin_date, end_date, begin_bce, end_bce),
+                    "nationality": {},
                 }
-            # if agent has information stored in dictionary, then we append nationality
-            else:
-                if nationality not in agent_dict[agent_id]['nationality']:
-                    agent_dict[agent_id]['nationality'].append(nationality)
+
+        # objects without agents still get an (empty) row in the Produced By table
+        if not agent_dict:
+            agent_dict[None] = {
+                "part": None,
+                "name": None,
+                "timespan": self.parse_date(None, None),
+                "nationality": {},
+            }
+
+        for agent_id, nationality in data["nationalities"]:
+            agent_dict[agent_id]['nationality'][nationality] = None
+
+        # a reference is only listed once per content, with the first type seen for it
+        references = {}
+        for ref_type, ref_content in data["references"]:
+            references.setdefault(ref_content, ref_type)
+
+        # objects without references still get an (empty) row in the Information table
+        if not references:
+            references[None] = None
+
+        obj_dict = {
+            "label": data["label"],
+            "classifier": list(dict.fromkeys(classifier for (classifier,) in data["classifiers"])),
+            "references": [[ref_type, ref_content] for ref_content, ref_type in references.items()],
+            "ref_type": list(references.values()),
+            "ref_content": list(references.keys()),
+        }
 
         return agent_dict, obj_dict
 
-    def parse_date(self, begin_date, end_date):
+    def parse_date(self, begin_date, end_date, begin_bce=False, end_bce=False):
         """Given a begin_date (str) and end_date (str)
         formats the timespan needed for table in the form of {begin_year}-{end_year}.
-        """
 
-        begin_year = ""
-        end_year = ""
-
-        if begin_date:
-            begin_date_dt = datetime.strptime(begin_date, '%Y-%m-%d')
-            begin_year = begin_date_dt.year
+        Dates may be full (YYYY-MM-DD) or partial (YYYY or YYYY-MM), and years
+        before the common era, flagged by begin_bce and end_bce or a minus sign,
+        are shown as {year} BCE. A date that is not understood is shown as it is.
+        """
 
-        if end_date:
-            end_date_dt = datetime.strptime(end_date, '%Y-%m-%d')
-            end_year = end_date_dt.year
+        begin_year = date_year(begin_date, bool(begin_bce)) if begin_date else ""
+        end_year = date_year(end_date, bool(end_bce)) if end_date else ""
 
         return f"{begin_year}-{end_year}"
@@ -0,0 +1,151 @@
+"""Module handling a long-running server that answers lux.py and luxdetails.py requests."""
+
+import io
+import json
+import os
+import socketserver
+import traceback
+
+from pool import ConnectionPool
+from query import LuxQuery, LuxDetailsQuery
+from memquery import InMemoryLuxQuery
+from lux import LuxCLI
+from luxdetails import LuxDetailsCLI
+
+class LuxRequestHandler(socketserver.StreamRequestHandler):
+    """Class to handle one request to a LuxServer.
+
+    A request is a JSON object with the program to run ("lux" or "luxdetails"),
+    its arguments, the client's terminal width and its stdin (or null). The response
+    is a stream of JSON objects, one per line: {"stdout": text} and {"stderr": text}
+    as the program writes them, then {"status": exit status} once it is done.
+    """
+
+    def handle(self):
+        """Reads a request until the client stops writing and streams back the response."""
+
+        out = MessageStream(self.wfile, "stdout")
+        err = MessageStream(self.wfile, "stderr")
+        try:
+            request = json.loads(self.rfile.read().decode("utf-8"))
+            status = self.server.run(request["prog"], request["argv"], out, err,
+                                     columns=request.get("columns"), stdin=request.get("stdin"))
+        except (ValueError, KeyError, TypeError) as error:
+            err.write(f"invalid request: {error}\n")
+            status = 1
+
+        out.flush()
+        err.flush()
+        self.wfile.write(json.dumps({"status": status}).encode("utf-8") + b"\n")
+
+class MessageStream(io.TextIOBase):
+    """Class to represent a text stream that sends what is written to it to a client,
+    as {name: text} lines of JSON. Like the stdout of a terminal it is line buffered:
+    text is sent once a line is complete, or when the stream is flushed.
+    """
+
+    def __init__(self, wfile, name):
+        """Initalizes the stream with the file to send messages to and the name
+        of the stream they are for.
+
+        Args:
+            wfile (file): binary file writing to the client
+            name (str): "stdout" or "stderr"
+        """
+
+        super().__init__()
+        self._wfile = wfile
+        self._name = name
+        self._buffer = []
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        self._buffer.append(text)
+        if "\n" in text:
+            self.flush()
+        return len(text)
+
+    def flush(self):
+        if self._buffer:
+            message = {self._name: "".join(self._buffer)}
+            self._buffer.clear()
+            self._wfile.write(json.dumps(message).encode("utf-8") + b"\n")
+
+class LuxServer(socketserver.UnixStreamServer):
+    """Class to represent a server listening on a Unix socket that keeps a LuxQuery
+    and a LuxDetailsQuery, and their connections, warm between requests.
+
+    Requests are answered one at a time. The CLIs write to streams of their own
+    that send the output to the client as it is written, and lay it out for the
+    client's terminal, so the server's own streams and terminal are left alone.
+    """
+
+    def __init__(self, socket_name, db_name, pool_size=None, memory=False):
+        """Initalizes the server with the socket to listen on and the database file.
+
+        Args:
+            socket_name (str): path of the Unix socket, replaced if it exists
+            db_name (str): database file
+            pool_size (int): number of connections to keep open
+            memory (bool): answer searches from an InMemoryLuxQuery, loaded once at start-up
+        """
+
+        if os.path.exists(socket_name):
+            os.unlink(socket_name)
+
+        self._db_name = db_name
+        self._pool = ConnectionPool(db_name, size=pool_size)
+        query_class = InMemoryLuxQuery if memory else LuxQuery
+        self._queries = {
+            "lux": (LuxCLI, query_class(db_name, self._pool)),
+            "luxdetails": (LuxDetailsCLI, LuxDetailsQuery(db_name, self._pool)),
+        }
+
+        super().__init__(socket_name, LuxRequestHandler)
+
+    def run(self, prog, argv, out, err, *, columns=None, stdin=None):
+        """Runs one of the CLIs with the given arguments, writing its output to out and err.
+
+        Args:
+            prog (str): "lux" or "luxdetails"
+            argv (list): arguments for the CLI
+            out (file): stream for the stdout of the CLI
+            err (file): stream for the stderr of the CLI
+            columns (int): terminal width of the client, None if it has no terminal;
+                Table and argparse size their output to it
+            stdin (str): input of the client, for luxdetails.py -
+
+        Return:
+            int: exit status of the CLI
+        """
+
+        if prog not in self._queries:
+            err.write(f"unknown program: {prog}\n")
+            return 1
+        cli, query = self._queries[prog]
+
+        streams = {"stdout": out, "stderr": err, "columns": columns}
+        if prog == "luxdetails":
+            streams["stdin"] = io.StringIO(stdin or "")
+
+        try:
+            cli(self._db_name, argv=list(argv), query=query, **streams)
+        except SystemExit as exit_err:
+            if exit_err.code is None or isinstance(exit_err.code, int):
+                return exit_err.code or 0
+            print(exit_err.code, file=err)
+            return 1
+        except Exception: # pylint: disable=broad-except
+            traceback.print_exc(file=err)
+            return 1
+        return 0
+
+    def server_close(self):
+        """Closes the socket, removes its file and closes the pooled connections."""
+
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+        self._pool.close()
@@ -0,0 +1,202 @@
+"""Module handling the generation of synthetic Lux databases for benchmarking.
+
+The databases have the tables and columns the queries of this project use,
+filled with random but reproducible data: the same scale and seed always give
+the same database, so benchmark results can be compared across commits.
+"""
+
+import os
+import random
+from contextlib import closing
+from sqlite3 import connect
+
+# tables of the Lux database that the queries read
+CREATE_SCHEMA = [
+    "CREATE TABLE objects (id INTEGER PRIMARY KEY, label TEXT, accession_no TEXT, date TEXT)",
+    "CREATE TABLE agents (id INTEGER PRIMARY KEY, name TEXT, begin_date TEXT, end_date TEXT,"
+    " type TEXT, begin_place_id INTEGER, end_place_id INTEGER,"
+    " begin_bce BOOLEAN, end_bce BOOLEAN)",
+    "CREATE TABLE productions (obj_id INTEGER, agt_id INTEGER, part TEXT)",
+    "CREATE TABLE nationalities (id INTEGER PRIMARY KEY, descriptor TEXT)",
+    "CREATE TABLE agents_nationalities (agt_id INTEGER, nat_id INTEGER)",
+    "CREATE TABLE classifiers (id INTEGER PRIMARY KEY, name TEXT)",
+    "CREATE TABLE objects_classifiers (obj_id INTEGER, cls_id INTEGER)",
+    "CREATE TABLE departments (id INTEGER PRIMARY KEY, name TEXT)",
+    "CREATE TABLE objects_departments (obj_id INTEGER, dep_id INTEGER)",
+    'CREATE TABLE "references" (id INTEGER PRIMARY KEY, obj_id INTEGER, type TEXT, content TEXT)',
+]
+
+LABEL_WORDS = ["Portrait", "Landscape", "Still Life", "Study", "Vase", "Bowl", "Map", "Letter",
+               "River", "Mountain", "Woman", "Man", "Harbor", "Sketch", "Coin", "Medal",
+               "Élan", "Café", "Garden", "Temple", "Figure", "Head", "Ship", "Bridge"]
+SURNAMES = ["Smith", "Jones", "Turner", "Hals", "Rembrandt", "Cassatt", "Hokusai", "Dürer",
+            "Whistler", "Sargent", "Vermeer", "Goya", "Kahlo", "Monet", "Okeeffe", "Brontë"]
+GIVEN_NAMES = ["John", "Mary", "Frans", "Winslow", "Katsushika", "Albrecht", "James", "Frida",
+               "Claude", "Georgia", "Anne", "Jan", "Francisco", "Berthe", "Ansel", "Zoë"]
+PARTS = ["artist", "printer", "publisher", "maker", "designer", "engraver"]
+AGENT_TYPES = ["person", "group"]
+NATIONALITIES = ["American", "British", "French", "Dutch", "German", "Japanese", "Spanish",
+                 "Mexican", "Italian", "Flemish", "Chinese", "Egyptian"]
+CLASSIFIERS = ["Paintings", "Prints", "Drawings", "Photographs", "Sculpture", "Textiles",
+               "Coins", "Medals", "Manuscripts", "Maps", "Ceramics", "Furniture", "Jewelry",
+               "Books", "Posters", "Glass"]
+DEPARTMENTS = ["Yale University Art Gallery", "Yale Center for British Art",
+               "Peabody Museum of Natural History", "Beinecke Rare Book & Manuscript Library",
+               "Lewis Walpole Library", "Collection of Musical Instruments"]
+REFERENCE_TYPES = ["Inscription", "Provenance", "Credit Line", "Exhibition History",
+                   "Bibliography", "Signature"]
+
+# default number of objects; the other tables scale with it
+OBJECTS = 10000
+
+class SyntheticLux():
+    """Class to represent the generation of one synthetic Lux database.
+    Stores the scale and seed of the data.
+
+    Every object has a few agents, classifiers, departments and references.
+    The first high_fanout objects have many more of each, to exercise the
+    details of objects with a large number of related rows.
+    """
+
+    def __init__(self, objects=OBJECTS, *, seed=0, high_fanout=10, fanout=200):
+        """Initalizes the generator with the scale of the database.
+
+        Args:
+            objects (int): number of objects
+            seed (int): seed of the random data
+            high_fanout (int): number of objects with many related rows
+            fanout (int): number of agents and references of those objects
+        """
+
+        assert objects > 0, "objects must be positive."
+
+        self._objects = objects
+        self._agents = max(10, objects // 3)
+        self._seed = seed
+        self._high_fanout = min(high_fanout, objects)
+        self._fanout = fanout
+
+    def generate(self, db_file):
+        """Writes a new database, replacing any file at db_file.
+
+        Args:
+            db_file (str): database file to write
+
+        Return:
+            dict: number of rows written to each table
+        """
+
+        if os.path.exists(db_file):
+            os.unlink(db_file)
+
+        rng = random.Random(self._seed)
+        counts = {}
+
+        with closing(connect(db_file, isolation_level=None)) as connection:
+            connection.execute("PRAGMA journal_mode = OFF")
+            connection.execute("PRAGMA synchronous = OFF")
+            connection.execute("BEGIN")
+            for smt_str in CREATE_SCHEMA:
+                connection.execute(smt_str)
+
+            for table, values in (("nationalities", NATIONALITIES),
+                                  ("classifiers", CLASSIFIERS),
+                                  ("departments", DEPARTMENTS)):
+                connection.executemany(f"INSERT INTO {table} VALUES (?, ?)",
+                                       enumerate(values, 1))
+                counts[table] = len(values)
+
+            counts["agents"] = self.insert(connection, "agents", 9, self.agent_rows(rng))
+            counts["agents_nationalities"] = self.insert(
+                connection, "agents_nationalities", 2, self.agent_nationality_rows(rng))
+            counts["objects"] = self.insert(connection, "objects", 4, self.object_rows(rng))
+            counts["productions"] = self.insert(
+                connection, "productions", 3, self.production_rows(rng))
+            counts["objects_classifiers"] = self.insert(
+                connection, "objects_classifiers", 2,
+                self.link_rows(rng, len(CLASSIFIERS), 1, 3, len(CLASSIFIERS)))
+            counts["objects_departments"] = self.insert(
+                connection, "objects_departments", 2,
+                self.link_rows(rng, len(DEPARTMENTS), 0, 2, len(DEPARTMENTS)))
+            counts['references'] = self.insert(
+                connection, '"references"(obj_id, type, content)', 3, self.reference_rows(rng))
+
+            connection.execute("COMMIT")
+
+        return counts
+
+    def insert(self, connection, table, width, rows):
+        """Inserts rows into table and returns how many there were."""
+
+        count = 0
+        def counted():
+            nonlocal count
+            for row in rows:
+                count += 1
+                yield row
+
+        placeholders = ", ".join("?" * width)
+        connection.executemany(f"INSERT INTO {table} VALUES ({placeholders})", counted())
+        return count
+
+    def agent_rows(self, rng):
+        """Generator yielding the rows of agents, with full dates, some of them missing."""
+
+        for agt_id in range(1, self._agents + 1):
+            begin = rng.randint(1400, 1990)
+            begin_date = f"{begin:04d}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+            end = begin + rng.randint(20, 90)
+            end_date = f"{end:04d}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+            if rng.random() < 0.1:
+                begin_date = None
+            if rng.random() < 0.2 or end > 2020:
+                end_date = None
+            name = f"{rng.choice(GIVEN_NAMES)} {rng.choice(SURNAMES)} {agt_id}"
+            yield (agt_id, name, begin_date, end_date, rng.choice(AGENT_TYPES),
+                   None, None, False, False)
+
+    def agent_nationality_rows(self, rng):
+        """Generator yielding up to two nationalities per agent."""
+
+        for agt_id in range(1, self._agents + 1):
+            for nat_id in rng.sample(range(1, len(NATIONALITIES) + 1), rng.randint(0, 2)):
+                yield agt_id, nat_id
+
+    def object_rows(self, rng):
+        """Generator yielding the rows of objects."""
+
+        for obj_id in range(1, self._objects + 1):
+            label = " ".join(rng.sample(LABEL_WORDS, rng.randint(1, 3)))
+            date = rng.choice([None, str(rng.randint(1400, 2020)),
+                               f"ca. {rng.randint(1400, 2020)}",
+                               f"{rng.randint(1400, 2000)}-{rng.randint(1400, 2020)}"])
+            yield obj_id, label, f"{obj_id:08d}", date
+
+    def production_rows(self, rng):
+        """Generator yielding the agents of each object: a few, many for the
+        objects with a high fan-out, and none for some."""
+
+        for obj_id in range(1, self._objects + 1):
+            count = self._fanout if obj_id <= self._high_fanout else rng.choice([0, 1, 1, 1, 2, 3])
+            for agt_id in rng.sample(range(1, self._agents + 1), min(count, self._agents)):
+                yield obj_id, agt_id, rng.choice(PARTS)
+
+    def link_rows(self, rng, size, low, high, fanout):
+        """Generator yielding between low and high related ids (out of size) per object,
+        and fanout of them for the objects with a high fan-out."""
+
+        for obj_id in range(1, self._objects + 1):
+            count = fanout if obj_id <= self._high_fanout else rng.randint(low, high)
+            for rel_id in rng.sample(range(1, size + 1), min(count, size)):
+                yield obj_id, rel_id
+
+    def reference_rows(self, rng):
+        """Generator yielding the references of each object."""
+
+        for obj_id in range(1, self._objects + 1):
+            count = self._fanout if obj_id <= self._high_fanout else rng.randint(0, 4)
+            for number in range(count):
+                content = rng.choice(["Gift of the artist", "signed lower right",
+                                      f"Accession note {obj_id}-{number}",
+                                      f"Purchased {rng.randint(1850, 2020)}"])
+                yield obj_id, rng.choice(REFERENCE_TYPES), content
@@ -10,13 +10,21 @@ The table generated by this program has the following properties:
         * Format specifiers are in the FormatSpec class; the format_str argument to Table.__init__ should be a string of those letters (currently 'p', 'w', or 't').
 
 A Table can be displayed either by calling __str__ or by iterating through each row of the table and printing it.
+
+A StreamingTable formats rows as they arrive from an iterator, so that a large table can be printed without holding all of its rows in memory.
 """
 
 import textwrap
 import itertools
+import heapq
+import operator
+import functools
 from enum import Enum
 import shutil
 
+# Number of cell layouts kept by _cell_lines
+_LAYOUT_CACHE_SIZE = 65536
+
 
 class FormatSpec(Enum):
     """Enum class for format specifiers for the columns in the table.
@@ -134,18 +142,19 @@ class Table:
             #   - the longest value in that column
             #   - the length of the column name
 
-            columns = tuple(zip(self._column_names, *self._data))
-            for fmt, column in zip(self._format_spec, columns):
-                # A PREFORMATTED column needs special treatment. A PREFORMATTED column actually contains several lines before any wrapping functions are applied; we want the longest of those lines.
+            # Each column is read straight out of the rows in a single pass, without building a transposed copy of the data.
+            widths = []
+            for i, (name, fmt) in enumerate(zip(self._column_names, self._format_spec)):
+                column = map(operator.itemgetter(i), self._data)
+                # A PREFORMATTED column needs special treatment. A PREFORMATTED column actually contains several lines before any wrapping functions are applied; we want the longest of those lines. Joining the column on the separator and splitting it once gives every line at C speed.
                 if fmt == FormatSpec.PREFORMATTED:
-                    col_lines = []
-                    for row in column:
-                        col_lines += (str(x)
-                                      for x in row.split(self._preformat_sep))
-                    width = max(len(line) for line in col_lines)
+                    lines = self._preformat_sep.join(
+                        itertools.chain((name,), column)).split(self._preformat_sep)
+                    width = max(map(len, lines))
                 else:
-                    width = max((len(str(line)) for line in column))
-                self._column_widths.append(width)
+                    width = max(len(str(name)), max(map(len, map(str, column)), default=0))
+                widths.append(width)
+            self._column_widths = widths
 
             # Redistribute the columns so they fit in self._max_width
             self._column_widths = self._redistribute_widths()
@@ -175,29 +184,36 @@ class Table:
         else:
             values = self._data[row_idx]
 
-        # formatted_columns is a list[list[str]] in which each element is a value that has been formatted according to self._col_format
-        formatted_columns = []
-        for val, width, fmt in zip(values, self.column_widths, self._format_spec):
-            value = [val]
-            match fmt:
-                case FormatSpec.PREFORMATTED:
-                    value = val.split(self._preformat_sep)
-                case FormatSpec.WRAPPED:
-                    value = textwrap.wrap(str(val), width)
-                case FormatSpec.TRUNCATED:
-                    if len(val) > width:
-                        value = [
-                            f"{val[:(width-len(self._dots))]}{self._dots}"]
-            formatted_columns.append(value)
+        return self.lines_for_values(values, header=is_header(row_idx))
 
-        # Square off and transpose formatted_columns so each line has one value from each column
-        row = [self._col_sep.join(f"{v:<{w}}"
-                                  for (v, w) in zip(line, self.column_widths))
-               for line in itertools.zip_longest(*formatted_columns, fillvalue="")]
+    def lines_for_values(self, values: list[str], *, header: bool = False) -> list[str]:
+        """Generates the lines of text needed to print a row holding values with appropriate formatting, and returns those lines as a list of strings. The values need not be part of data.
 
-        if is_header(row_idx):
+        Parameters:
+            values:
+                The values of the row, one per column.
+            header:
+                Whether the row is the header row, in which case the returned value includes the underline.
+        """
+
+        widths = self.column_widths
+
+        # cells is a list of tuples of lines, one tuple per value, each line already padded to the width of its column
+        cells = [_cell_lines(val, width, fmt, self._preformat_sep, self._dots)
+                 for val, width, fmt in zip(values, widths, self._format_spec)]
+
+        # Square off and transpose cells so each line has one value from each column
+        if all(len(cell) == 1 for cell in cells):
+            row = [self._col_sep.join(cell[0] for cell in cells)]
+        else:
+            blanks = [" " * w for w in widths]
+            row = [self._col_sep.join(blank if v is None else v
+                                      for (v, blank) in zip(line, blanks))
+                   for line in itertools.zip_longest(*cells)]
+
+        if header:
             underline = self._col_sep.join(
-                (self._head_underline*w for w in self.column_widths))
+                (self._head_underline*w for w in widths))
             row.append(underline)
 
         return row
@@ -286,47 +302,124 @@ class Table:
                 case FormatSpec.PREFORMATTED:
                     return width >= nominal_width
                 case FormatSpec.TRUNCATED:
-                    return width >= max(len(header), len(self._dots + 3))
+                    return width >= max(len(header), len(self._dots) + 3)
 
             # This code should never be reached; here only to make pylint happy
             assert False
 
-        # Helper function for REDISRIBUTE algorithm
-        def next_reducable_column_idx(widths: list[int]) -> int:
-            """Returns the index of the widest column that is wider than its header, or -1 if no such column exists.
-            """
-
-            # Sort the widths in decreasing order, keeping track of their original indices
-            sorted_idxes_and_widths = sorted(
-                enumerate(widths), key=lambda t: t[1], reverse=True)
-
-            idx = -1
-
-            # Sweep the widths from highest to lowest, stopping when there is a column that is wide
-            # enough to be reducable.
-            for i, width in sorted_idxes_and_widths:
-                if column_is_wide_enough(
-                        width,
-                        self._column_names[i],
-                        self._format_spec[i],
-                        self._column_widths[i]):
-                    idx = i
-                    break
-
-            return idx
-
-        # Helper function for REDISTRIBUTE algorithm
-        def last(itr) -> int:
-            return itr[-1]
-
-        # Loop for REDISTRIBUTE algorithm.
-        while (to_reduce := next_reducable_column_idx(redistributed_widths)) >= 0 and\
-                not column_is_wide_enough(
-                    last(redistributed_widths),
-                    last(self._column_names),
-                    last(self._format_spec),
-                    last(self._column_widths)):
+        def is_wide_enough(i: int, width: int) -> bool:
+            return column_is_wide_enough(
+                width, self._column_names[i], self._format_spec[i], self._column_widths[i])
+
+        # Loop for REDISTRIBUTE algorithm. A heap holds the columns that are still wide enough to give up a character, widest first and leftmost among equals; only the column just reduced changes width, so only it needs to go back on the heap. The rightmost column only ever grows and is never reduced.
+        last = len(redistributed_widths) - 1
+        reducable = [(-width, i) for i, width in enumerate(redistributed_widths[:last])
+                     if is_wide_enough(i, width)]
+        heapq.heapify(reducable)
+        while reducable and not is_wide_enough(last, redistributed_widths[last]):
+            _, to_reduce = heapq.heappop(reducable)
             redistributed_widths[to_reduce] -= 1
-            redistributed_widths[-1] += 1
+            redistributed_widths[last] += 1
+            if is_wide_enough(to_reduce, redistributed_widths[to_reduce]):
+                heapq.heappush(reducable, (-redistributed_widths[to_reduce], to_reduce))
+
+        return redistributed_widths
+
+
+@functools.lru_cache(maxsize=_LAYOUT_CACHE_SIZE, typed=True)
+def _cell_lines(val, width: int, fmt: FormatSpec, preformat_sep: str, dots: str) -> tuple[str]:
+    """Returns the lines of a single cell holding val, formatted according to fmt and padded to width.
+
+    Layouts are memoized on every argument, so a value that recurs across rows (a department, a classifier) is only wrapped once.
+    The cache is typed, since values that compare equal can print differently (1, 1.0 and True).
+    """
+
+    value = [val]
+    match fmt:
+        case FormatSpec.PREFORMATTED:
+            value = val.split(preformat_sep)
+        case FormatSpec.WRAPPED:
+            text = str(val)
+            # Fast path: a single line that already fits comes out of textwrap unchanged
+            if 0 < len(text) <= width and text.isprintable() and text[-1] != " ":
+                value = [text]
+            else:
+                value = textwrap.wrap(text, width)
+        case FormatSpec.TRUNCATED:
+            if len(val) > width:
+                value = [f"{val[:(width-len(dots))]}{dots}"]
+
+    return tuple(f"{v:<{width}}" for v in value)
+
+
+class StreamingTable(Table):
+    """Class for formatting rows from an iterator in an ASCII table, as they arrive.
+
+    A StreamingTable never holds more than sample_size rows. Its column widths are either declared at init-time or computed, exactly as for a Table, from the first sample_size rows; later rows are formatted to those widths, so a value wider than its column is wrapped, truncated or (if PREFORMATTED) allowed to overflow it.
+
+    The StreamingTable class is:
+        * iterable, once. To print every row as it arrives, use:
+            for line in a_streaming_table.lines():
+                print(line)
+          Iterating over a StreamingTable yields the formatted data rows like iterating over a Table does, without the header row.
+        * stringifiable, once. str(a_streaming_table) consumes every row.
+    """
+
+    _SAMPLE_SIZE = 100
+
+    def __init__(self, column_names: list[str], rows, *,
+                 sample_size: int = None,
+                 column_widths: list[int] = None,
+                 **kwargs) -> None:
+        """Initializer for StreamingTable class.
+
+        Required positional parameters:
+            column_names:
+                A list of strings to use as column headers in the table.
+            rows:
+                An iterable, each item of which is itself a list of strings with the same length as column_names. It is only read as the table is printed, apart from the sample.
+
+        Optional keyword parameters:
+            sample_size:
+                The number of rows read ahead to compute the column widths from. Default is _SAMPLE_SIZE. Ignored if column_widths is given.
+            column_widths:
+                The width of each column. Default computes them from the sample.
+            The other keyword parameters of Table.
+        """
+
+        assert (not sample_size) or (sample_size > 0),\
+            "sample_size must be positive."
+        assert (not column_widths) or (len(column_widths) == len(column_names)),\
+            "column_widths must have the same length as column_names."
+
+        self._rows = iter(rows)
+        sample = []
+        if not column_widths:
+            sample = list(itertools.islice(
+                self._rows, sample_size or StreamingTable._SAMPLE_SIZE))
+
+        super().__init__(column_names, sample, **kwargs)
+
+        if column_widths:
+            self._column_widths = list(column_widths)
+
+    def lines(self):
+        """Generator yielding every line of the table, header and underline first, formatting each row as it arrives."""
+
+        yield from self.headers()
+        for row in self:
+            yield from row
+
+    def __str__(self) -> str:
+        """Returns a string containing every line of the table; see Table.__str__. Consumes the rows."""
+
+        return "\n".join(self.lines())
+
+    def __iter__(self):
+        """Returns an iterator for formatted rows of data in this table (does not include the header row). Consumes the rows."""
 
-        return redistributed_widths
\ No newline at end of file
+        for row in itertools.chain(self._data, self._rows):
+            assert len(row) == len(self._column_names),\
+                "Each row in data must have the same length as the number of column headers."
+            yield self.lines_for_values(row)
+        self._data = []
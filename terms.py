@@ -0,0 +1,33 @@
+"""Module handling the choice of search terms for benchmarks and index advice."""
+
+import sqlite3
+from contextlib import closing
+
+def default_terms(db_file):
+    """Picks a search term for each filter from the database: the first word of
+    the first department and label, the surname of the first agent and the start
+    of the first classifier, so the same database always gets the same terms.
+
+    Args:
+        db_file (str): database file
+
+    Return:
+        dict: search terms keyed like the arguments of LuxQuery.search
+    """
+
+    with closing(sqlite3.connect(db_file)) as connection:
+        def first(smt_str):
+            row = connection.execute(smt_str).fetchone()
+            return str(row[0]) if row and row[0] is not None else ""
+
+        department = first("SELECT name FROM departments ORDER BY id LIMIT 1").split()
+        agent = first("SELECT name FROM agents ORDER BY id LIMIT 1").split()
+        label = first("SELECT label FROM objects ORDER BY id LIMIT 1").split()
+        classifier = first("SELECT name FROM classifiers ORDER BY id LIMIT 1")
+
+    return {
+        "dep": department[0] if department else "a",
+        "agt": agent[1] if len(agent) > 1 else (agent or ["a"])[0],
+        "classifier": classifier[:4].lower() or "a",
+        "label": label[0].lower() if label else "a",
+    }
@@ -0,0 +1,63 @@
+"""Fixtures shared by the tests: small synthetic Lux databases."""
+
+import os
+import shutil
+import sys
+from contextlib import closing
+from sqlite3 import connect
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from synthetic import SyntheticLux
+from index import LuxIndex
+
+# number of objects of the test databases
+OBJECTS = 600
+
+# id of a department without a name, and of one that is not in the departments table
+NULL_DEPARTMENT = 99
+DANGLING_DEPARTMENT = 12345
+
+# objects linked to each of them, on top of their other departments
+NULL_DEPARTMENT_OBJECTS = range(20, 60, 4)
+DANGLING_DEPARTMENT_OBJECTS = range(22, 62, 4)
+
+def make_db(db_file):
+    """Writes a synthetic database with some objects in a department without a name
+    and some in a department that no longer exists, alongside their other ones."""
+
+    SyntheticLux(OBJECTS, seed=7, high_fanout=3, fanout=20).generate(db_file)
+    with closing(connect(db_file, isolation_level=None)) as connection:
+        connection.execute("INSERT INTO departments VALUES (?, NULL)", [NULL_DEPARTMENT])
+        connection.executemany("INSERT INTO objects_departments VALUES (?, ?)",
+                               [(obj_id, NULL_DEPARTMENT) for obj_id in NULL_DEPARTMENT_OBJECTS]
+                               + [(obj_id, DANGLING_DEPARTMENT)
+                                  for obj_id in DANGLING_DEPARTMENT_OBJECTS])
+
+@pytest.fixture(scope="session")
+def live_db(tmp_path_factory):
+    """Database without search indexes, searched with the live query."""
+
+    db_file = str(tmp_path_factory.mktemp("lux") / "live.sqlite")
+    make_db(db_file)
+    return db_file
+
+@pytest.fixture(scope="session")
+def indexed_db(live_db, tmp_path_factory):
+    """Copy of live_db with an up-to-date search table and full-text index."""
+
+    db_file = str(tmp_path_factory.mktemp("lux") / "indexed.sqlite")
+    shutil.copyfile(live_db, db_file)
+    LuxIndex(db_file).build()
+    return db_file
+
+@pytest.fixture
+def scratch_db(tmp_path):
+    """Fresh database the test may write to."""
+
+    db_file = str(tmp_path / "scratch.sqlite")
+    make_db(db_file)
+    return db_file
@@ -0,0 +1,114 @@
+"""Tests of cancelling and timing out asyncio queries."""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sqlite3 import OperationalError
+
+import pytest
+
+from aioquery import AsyncLuxQuery
+from pool import ConnectionPool
+from query import LuxQuery
+
+# statement running for far longer than any test waits, unless it is interrupted
+SLOW_SQL = """WITH RECURSIVE counter(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM counter)
+SELECT COUNT(*) FROM (SELECT x FROM counter LIMIT 10000000000)"""
+
+def wait_for(condition, timeout=5.0):
+    """Waits until condition() is true, for at most timeout seconds."""
+
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+def test_timeout_interrupts_statement(live_db):
+    pool = ConnectionPool(live_db, size=1)
+    errors = []
+
+    def slow():
+        with pool.connection() as connection:
+            try:
+                return connection.execute(SLOW_SQL).fetchone()
+            except OperationalError as err:
+                errors.append(err)
+                raise
+
+    async def main():
+        async with AsyncLuxQuery(live_db, pool) as query:
+            with pytest.raises(asyncio.TimeoutError):
+                await query.run(slow, timeout=0.1)
+            # the only worker and connection are free again
+            return await query.search(label="o", timeout=5)
+
+    assert asyncio.run(main()) == LuxQuery(live_db).search(label="o")
+    assert len(errors) == 1
+
+def test_cancel_interrupts_connection_kept_across_workers(live_db):
+    pool = ConnectionPool(live_db, size=2)
+    errors = []
+    checked_out = []
+    release = threading.Event()
+
+    def steps():
+        with pool.connection() as connection:
+            checked_out.append(connection)
+            yield
+            try:
+                yield connection.execute(SLOW_SQL).fetchone()
+            except OperationalError as err:
+                errors.append(err)
+                raise
+
+    async def main():
+        async with AsyncLuxQuery(live_db, pool) as query:
+            owner = object()
+            generator = steps()
+            await query.run(next, generator, owner=owner)
+
+            # keep the worker that checked the connection out busy,
+            # so that the next step runs on the other one
+            loop = asyncio.get_running_loop()
+            executor = query._executor # pylint: disable=protected-access
+            blocker = loop.run_in_executor(executor, release.wait)
+            try:
+                with pytest.raises(asyncio.TimeoutError):
+                    await query.run(next, generator, timeout=0.2, owner=owner)
+                await loop.run_in_executor(None, wait_for, lambda: errors)
+            finally:
+                # should the statement not have been interrupted, end it for the
+                # test to fail rather than hang while the workers shut down
+                if not errors:
+                    checked_out[0].interrupt()
+                release.set()
+                await blocker
+
+    asyncio.run(main())
+    assert len(errors) == 1
+
+def test_interrupt_only_reaches_owner(live_db):
+    pool = ConnectionPool(live_db, size=2)
+    started = threading.Barrier(3)
+    owners = ("first", "second")
+
+    def run(owner):
+        with pool.owned_by(owner):
+            with pool.connection() as connection:
+                started.wait()
+                if owner == "first":
+                    return connection.execute(SLOW_SQL).fetchone()
+                return connection.execute("SELECT COUNT(*) FROM objects").fetchone()
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [executor.submit(run, owner) for owner in owners]
+        started.wait()
+        time.sleep(0.1)
+        assert futures[1].result(timeout=5)[0] > 0
+        assert pool.interrupt("first")
+        assert not pool.interrupt("second")
+        with pytest.raises(OperationalError):
+            futures[0].result(timeout=5)
+
+    assert not pool.interrupt("first")
@@ -0,0 +1,23 @@
+"""Tests of the benchmark cases."""
+
+import table
+from bench import LuxBench
+
+def test_table_cases_cold_and_warm(live_db):
+    bench = LuxBench(live_db, repeat=3, warmup=1, details_objects=1)
+    cases = {name: (func, setup) for name, func, *setup in bench.table_cases()}
+
+    assert set(cases) == {"table[search]", "table[details]",
+                          "table_warm[search]", "table_warm[details]"}
+
+    for name, (func, setup) in cases.items():
+        sizes = []
+        def run(func=func):
+            sizes.append(table._cell_lines.cache_info().currsize) # pylint: disable=protected-access
+            func()
+        bench.measure(run, *setup)
+
+        if name.startswith("table_warm"):
+            assert all(sizes[1:])
+        else:
+            assert not any(sizes)
@@ -0,0 +1,63 @@
+"""Tests of the result cache and its invalidation."""
+
+from contextlib import closing
+from sqlite3 import connect
+from urllib.parse import quote
+
+from cache import ResultCache
+from query import LuxQuery
+
+def write(db_file):
+    """Changes the label of an object from another connection."""
+
+    with closing(connect(db_file, isolation_level=None)) as connection:
+        connection.execute("UPDATE objects SET label = label || ' (changed)' WHERE id = 1")
+
+def test_hit_until_database_changes(scratch_db):
+    cache = ResultCache(scratch_db)
+
+    assert cache.get("key") is None
+    cache.put("key", "value", cache.stamp())
+    assert cache.get("key") == "value"
+
+    write(scratch_db)
+    assert cache.get("key") is None
+
+def test_result_computed_during_a_change_is_dropped(scratch_db):
+    cache = ResultCache(scratch_db)
+
+    assert cache.get("key") is None
+    stamp = cache.stamp()
+    write(scratch_db)
+    cache.put("key", "stale value", stamp)
+
+    assert cache.get("key") is None
+    assert len(cache) == 0
+
+def test_search_sees_changes(scratch_db):
+    query = LuxQuery(scratch_db, cache=ResultCache(scratch_db))
+
+    before = query.search(label="changed")
+    assert query.search(label="changed") is before
+
+    write(scratch_db)
+    after = query.search(label="changed")
+    assert after[0] == before[0] + 1
+    assert query.search(label="changed") is after
+
+def test_file_uri_sees_changes(scratch_db):
+    cache = ResultCache("file:" + quote(scratch_db) + "?mode=ro")
+
+    cache.put("key", "value", cache.stamp())
+    assert cache.get("key") == "value"
+
+    write(scratch_db)
+    assert cache.get("key") is None
+
+def test_nothing_cached_without_a_stamp(tmp_path):
+    cache = ResultCache("file:" + quote(str(tmp_path / "missing.sqlite")) + "?mode=ro")
+
+    assert cache.stamp() is None
+    cache.put("key", "value", cache.stamp())
+    assert cache.get("key") is None
+    assert len(cache) == 0
@@ -0,0 +1,67 @@
+"""Tests of the case-folded classifier names stored alongside the database."""
+
+import shutil
+from contextlib import closing
+from sqlite3 import connect
+
+import pytest
+
+from index import LuxIndex
+from lux_query_sql import CLASSIFIER_NAMES_TABLE
+from query import LuxQuery, build_statement, build_count_statement
+
+SEARCHES = [{"classifier": "mixed"}, {"classifier": "s", "label": "o"},
+            {"classifier": "i", "agt": "an", "dep": "art"}, {"label": "o"}]
+
+def stored_names(db_file):
+    """Returns the stored names and the names of the classifiers, case-folded, by id."""
+
+    with closing(connect(db_file)) as connection:
+        stored = dict(connection.execute(f"SELECT id, name FROM {CLASSIFIER_NAMES_TABLE}"))
+        folded = dict(connection.execute("SELECT id, LOWER(name) FROM classifiers"))
+    return stored, folded
+
+@pytest.fixture
+def changed_db(scratch_db):
+    """Indexed database whose classifiers changed since, leaving the index dirty."""
+
+    LuxIndex(scratch_db).build()
+    with closing(connect(scratch_db, isolation_level=None)) as connection:
+        connection.execute("UPDATE classifiers SET name = 'MiXed Case' WHERE id = 1")
+        connection.execute("INSERT INTO classifiers VALUES (100, 'Added NAME')")
+        connection.execute("INSERT INTO objects_classifiers VALUES (5, 100)")
+        connection.execute("DELETE FROM classifiers WHERE id = 2")
+    return scratch_db
+
+def test_triggers_keep_names_in_step(changed_db):
+    stored, folded = stored_names(changed_db)
+
+    assert stored == folded
+    assert stored[1] == "mixed case" and stored[100] == "added name" and 2 not in stored
+
+def test_live_query_reads_stored_names(changed_db):
+    query = LuxQuery(changed_db)
+    with closing(connect(changed_db)) as connection:
+        shape, _ = query.statement_shape(connection.cursor(), {
+            "dep": None, "agt": None, "classifier": "mixed", "label": None})
+
+    assert not shape[0] and shape[4]
+    assert "LOWER(" not in build_statement(*shape)
+    assert "LOWER(" not in build_count_statement(*shape[:3], shape[4])
+
+@pytest.mark.parametrize("terms", SEARCHES, ids=lambda terms: ",".join(terms))
+def test_stored_names_match_folding(changed_db, tmp_path, terms):
+    # a copy without the stored names folds them in the live query instead
+    folding_db = str(tmp_path / "folding.sqlite")
+    shutil.copyfile(changed_db, folding_db)
+    with closing(connect(folding_db, isolation_level=None)) as connection:
+        connection.execute(f"DROP TABLE {CLASSIFIER_NAMES_TABLE}")
+
+    stored, folding = LuxQuery(changed_db), LuxQuery(folding_db)
+
+    assert stored.search(**terms) == folding.search(**terms)
+    assert list(stored.iter_search(**terms)) == list(folding.iter_search(**terms))
+    assert stored.count(**terms) == folding.count(**terms)
+
+    LuxIndex(changed_db).refresh()
+    assert LuxQuery(changed_db).search(**terms) == folding.search(**terms)
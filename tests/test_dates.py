@@ -0,0 +1,54 @@
+"""Tests of the years shown in the timespans of agents."""
+
+import pytest
+
+from query import DATE_PATTERN, LuxDetailsQuery, date_year
+
+# date, bce flag, year shown
+YEARS = [
+    ("1850", False, "1850"),
+    ("1850-03", False, "1850"),
+    ("1850-3", False, "1850"),
+    ("1850-03-01", False, "1850"),
+    ("  1850-03-01", False, "1850"),
+    ("1850-03-01T12:30:00", False, "1850"),
+    ("1850-03-01 12:30:00", False, "1850"),
+    ("1850-03-01T00:00:00Z", False, "1850"),
+    ("-0500-01-01", False, "500 BCE"),
+    ("-0500", False, "500 BCE"),
+    ("-0500-01-01", True, "500 BCE"),
+    ("0500-03-01", True, "500 BCE"),
+    ("0500", True, "500 BCE"),
+    ("0500-03-01", False, "500"),
+    ("0000-01-01", False, "0"),
+    ("circa 1850", False, "circa 1850"),
+    ("1850s", False, "1850s"),
+    ("1850-03-01-04", False, "1850-03-01-04"),
+    ("03/01/1850", True, "03/01/1850"),
+    ("", False, ""),
+]
+
+# begin date, end date, begin bce flag, end bce flag, timespan shown
+TIMESPANS = [
+    ("1850-03-01", "1900-12-31", 0, 0, "1850-1900"),
+    ("1850", "1900-12", 0, 0, "1850-1900"),
+    ("-0500-01-01", "0450-01-01", 0, 1, "500 BCE-450 BCE"),
+    ("0500-01-01", "0020-01-01", 1, 0, "500 BCE-20"),
+    ("1850-03-01T00:00:00", None, 0, None, "1850-"),
+    (None, "1900-12-31 23:59", None, 0, "-1900"),
+    (None, None, None, None, "-"),
+    ("", "", 0, 0, "-"),
+    ("unknown", "1900", 0, 0, "unknown-1900"),
+]
+
+@pytest.mark.parametrize("date, bce, year", YEARS)
+def test_date_year(date, bce, year):
+    assert date_year(date, bce) == year
+    assert (DATE_PATTERN.fullmatch(date) is not None) == year.replace(" BCE", "").isdigit()
+
+@pytest.mark.parametrize("begin, end, begin_bce, end_bce, timespan", TIMESPANS)
+def test_parse_date(live_db, begin, end, begin_bce, end_bce, timespan):
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    query = LuxDetailsQuery(live_db)
+
+    assert query.parse_date(begin, end, begin_bce, end_bce) == timespan
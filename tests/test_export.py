@@ -0,0 +1,27 @@
+"""Tests of the columnar export against LuxQuery."""
+
+import pytest
+
+from export import LuxExport, read_export
+from query import LuxQuery
+
+# the formats, and the package each of them needs
+FORMATS = [("arrow", "pyarrow"), ("parquet", "pyarrow"), ("npz", "numpy")]
+
+@pytest.mark.parametrize("export_format, package", FORMATS, ids=[fmt for fmt, _ in FORMATS])
+def test_export_matches_search(live_db, tmp_path, export_format, package):
+    pytest.importorskip(package)
+    path = str(tmp_path / f"corpus.{export_format}")
+    query = LuxQuery(live_db)
+    search_count, _, _, data = query.search()
+
+    # chunks smaller than the corpus, so that they have to be put back together
+    assert LuxExport(live_db).export(path, chunk_size=64) == search_count
+    exported = read_export(path)
+
+    assert list(exported) == query.column_keys
+    assert all(len(values) == search_count for values in exported.values())
+    for idx in (0, 63, 64, search_count // 2, search_count - 1):
+        row = [value if value is None or key == "id" else str(value)
+               for key, value in zip(query.column_keys, data[idx])]
+        assert [exported[key][idx] for key in query.column_keys] == row
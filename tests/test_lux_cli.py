@@ -0,0 +1,30 @@
+"""Tests of the options of lux.py."""
+
+import pytest
+
+from lux import LuxCLI
+from query import LuxQuery
+
+def test_page_size_needs_page_or_all(live_db, capsys):
+    with pytest.raises(SystemExit):
+        LuxCLI(live_db, ["-a", "an", "--page-size", "5"])
+
+    assert "--page-size" in capsys.readouterr().err
+
+@pytest.mark.parametrize("argv", [["--page", "2"], ["--all"],
+                                  ["--page", "2", "--format", "jsonl"],
+                                  ["--all", "--format", "csv"]], ids=" ".join)
+def test_page_size_applies_to_every_output(live_db, capsys, argv):
+    query = LuxQuery(live_db)
+    page_sizes = []
+    iter_pages = query.iter_pages
+    def recording_iter_pages(**kwargs):
+        page_sizes.append(kwargs["page_size"])
+        return iter_pages(**kwargs)
+    query.iter_pages = recording_iter_pages
+
+    LuxCLI(live_db, ["-a", "an", "--page-size", "7"] + argv, query=query)
+
+    assert page_sizes == [7]
+    if argv == ["--page", "2", "--format", "jsonl"]:
+        assert len(capsys.readouterr().out.splitlines()) == 7
@@ -0,0 +1,38 @@
+"""Tests of the in-memory search backend against LuxQuery."""
+
+import pytest
+
+from conftest import NULL_DEPARTMENT_OBJECTS, DANGLING_DEPARTMENT_OBJECTS
+from memquery import InMemoryLuxQuery
+from query import LuxQuery
+from test_search_table import SEARCHES
+
+@pytest.fixture(scope="module", params=["live", "indexed"])
+def memory_query(request, live_db, indexed_db):
+    """InMemoryLuxQuery loaded from the live query or from the search table."""
+
+    return InMemoryLuxQuery(live_db if request.param == "live" else indexed_db)
+
+@pytest.mark.parametrize("terms", SEARCHES, ids=lambda terms: ",".join(terms) or "all")
+def test_memory_search_matches_lux_query(live_db, memory_query, terms):
+    query = LuxQuery(live_db)
+
+    assert memory_query.search(**terms) == query.search(**terms)
+    assert list(memory_query.iter_search(**terms, page_size=50)) == \
+        list(query.iter_search(**terms))
+    assert memory_query.count(**terms) == query.count(**terms)
+
+def test_memory_search_shows_missing_departments_as_null(live_db, memory_query):
+    odd_ids = set(NULL_DEPARTMENT_OBJECTS) | set(DANGLING_DEPARTMENT_OBJECTS)
+
+    rows = {row[0]: row for row in memory_query.iter_search() if row[0] in odd_ids}
+    live_rows = {row[0]: row for row in LuxQuery(live_db).iter_search() if row[0] in odd_ids}
+
+    assert rows == live_rows
+    assert all(row[4] is None for row in rows.values())
+
+def test_memory_resume_after_row(live_db, memory_query):
+    rows = list(LuxQuery(live_db).iter_search(agt="an"))
+
+    for idx in (0, len(rows) // 2, len(rows) - 1):
+        assert list(memory_query.iter_search(agt="an", after=rows[idx])) == rows[idx + 1:]
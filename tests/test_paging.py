@@ -0,0 +1,78 @@
+"""Tests of paging through search results with LuxQuery.iter_pages."""
+
+from contextlib import closing
+from sqlite3 import connect
+
+import pytest
+
+from synthetic import SyntheticLux
+from index import LuxIndex
+from query import (LuxQuery, RESULT_COLUMNS, build_statement, page_params_after,
+                   search_sort_keys)
+from lux_query_sql import SEARCH_TABLE
+
+# number of objects of the paged database, many times the page sizes tested
+OBJECTS = 4000
+
+SEARCHES = [{}, {"dep": "art"}, {"agt": "an"}, {"classifier": "s", "label": "o"}]
+
+def sort_key(row, terms):
+    """Returns the sort key of a result row, with NULLs first as in SQLite."""
+
+    keys = ("label", "date") + search_sort_keys(
+        {key: terms.get(key) for key in ("dep", "agt", "classifier", "label")}) + ("id",)
+    return tuple((row[RESULT_COLUMNS[key][1]] is not None, row[RESULT_COLUMNS[key][1]] or "")
+                 for key in keys)
+
+@pytest.fixture(scope="module", params=["live", "indexed"])
+def paged_db(request, tmp_path_factory):
+    """Database with many objects sharing labels, some of them NULL."""
+
+    db_file = str(tmp_path_factory.mktemp("paged") / "paged.sqlite")
+    SyntheticLux(OBJECTS, seed=3, high_fanout=0).generate(db_file)
+    with closing(connect(db_file, isolation_level=None)) as connection:
+        connection.execute("UPDATE objects SET label = NULL WHERE id % 97 = 0")
+    if request.param == "indexed":
+        LuxIndex(db_file).build()
+    return db_file
+
+@pytest.mark.parametrize("terms", SEARCHES, ids=lambda terms: ",".join(terms) or "all")
+@pytest.mark.parametrize("page_size", [7, 250])
+def test_pages_cover_results_once_in_order(paged_db, terms, page_size):
+    query = LuxQuery(paged_db)
+
+    pages = list(query.iter_pages(**terms, page_size=page_size))
+    rows = [row for page in pages for row in page]
+
+    assert all(len(page) == page_size for page in pages[:-1])
+    assert 0 < len(pages[-1]) <= page_size
+    assert rows == sorted(rows, key=lambda row: sort_key(row, terms))
+    assert len({row[0] for row in rows}) == len(rows) == query.count(**terms)
+    assert rows[:1000] == query.search(**terms)[3]
+
+def test_resume_after_row(paged_db):
+    query = LuxQuery(paged_db)
+    rows = list(query.iter_search(page_size=100))
+
+    # resuming after a NULL label, then after the other rows of a page
+    null_label = max(idx for idx, row in enumerate(rows) if row[1] is None)
+    for idx in (null_label, null_label + 1, 1234, len(rows) - 1):
+        assert list(query.iter_search(page_size=100, after=rows[idx])) == rows[idx + 1:]
+
+@pytest.mark.parametrize("terms", SEARCHES, ids=lambda terms: ",".join(terms) or "all")
+def test_pages_seek_on_label_index(paged_db, terms):
+    query = LuxQuery(paged_db)
+    rows = list(query.iter_search(**terms))
+    after = rows[len(rows) // 2]
+
+    with closing(connect(paged_db)) as connection:
+        shape, params = query.statement_shape(connection.cursor(), dict(
+            {"dep": None, "agt": None, "classifier": None, "label": None}, **terms), fts=False)
+        if not shape[0]:
+            pytest.skip("only pages of the search table are separate statements")
+        smt_str = build_statement(*shape, keyset=True, bounded=True)
+        params += page_params_after(after, shape[3]) + [10]
+        plan = [row[3] for row in connection.execute("EXPLAIN QUERY PLAN " + smt_str, params)]
+
+    assert any(detail.startswith(f"SEARCH {SEARCH_TABLE} USING INDEX") and "label>" in detail
+               for detail in plan), plan
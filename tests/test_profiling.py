@@ -0,0 +1,23 @@
+"""Tests of query profiling."""
+
+import io
+import json
+import logging
+
+import profiling
+from query import LuxQuery
+
+def test_profile_logs_to_stream_and_restores_level(live_db):
+    profiling.LOGGER.setLevel(logging.WARNING)
+    stream = io.StringIO()
+    try:
+        with profiling.profile("test", stream=stream) as active:
+            LuxQuery(live_db).search(agt="an")
+        assert profiling.LOGGER.level == logging.WARNING
+        assert not profiling.LOGGER.isEnabledFor(logging.INFO)
+    finally:
+        profiling.LOGGER.setLevel(logging.NOTSET)
+
+    report = json.loads(stream.getvalue().splitlines()[0])
+    assert report == active.report()
+    assert report["name"] == "test" and report["statements"]
@@ -0,0 +1,60 @@
+"""Tests of the search table against the live query."""
+
+import itertools
+from contextlib import closing
+from sqlite3 import connect
+
+import pytest
+
+import index
+from conftest import NULL_DEPARTMENT_OBJECTS, DANGLING_DEPARTMENT, DANGLING_DEPARTMENT_OBJECTS
+from lux_query_sql import FTS_TABLE
+from query import LuxQuery, FILTER_KEYS
+
+# a term for each filter that matches a fair share of the objects
+TERMS = {"dep": "art", "agt": "an", "classifier": "s", "label": "o"}
+
+SEARCHES = [{key: TERMS[key] for key in keys}
+            for size in range(len(FILTER_KEYS) + 1)
+            for keys in itertools.combinations(FILTER_KEYS, size)]
+
+@pytest.mark.parametrize("terms", SEARCHES, ids=lambda terms: ",".join(terms) or "all")
+def test_indexed_search_matches_live(live_db, indexed_db, terms):
+    live, indexed = LuxQuery(live_db), LuxQuery(indexed_db)
+
+    assert indexed.search(**terms) == live.search(**terms)
+    assert list(indexed.iter_search(**terms)) == list(live.iter_search(**terms))
+    assert indexed.count(**terms) == live.count(**terms)
+
+def test_missing_department_names_show_as_null(live_db, indexed_db):
+    odd_ids = set(NULL_DEPARTMENT_OBJECTS) | set(DANGLING_DEPARTMENT_OBJECTS)
+
+    live_rows = {row[0]: row for row in LuxQuery(live_db).iter_search()}
+    indexed_rows = {row[0]: row for row in LuxQuery(indexed_db).iter_search()}
+
+    assert all(live_rows[obj_id][4] is None for obj_id in odd_ids)
+    assert {obj_id: indexed_rows[obj_id] for obj_id in odd_ids} == \
+        {obj_id: live_rows[obj_id] for obj_id in odd_ids}
+
+def test_index_without_trigram_tokenizer(live_db, scratch_db, monkeypatch):
+    # SQLite before 3.34 gets the search table without the full-text index
+    monkeypatch.setattr(index, "FTS_TRIGRAM", False)
+    index.LuxIndex(scratch_db).build()
+    with closing(connect(scratch_db, isolation_level=None)) as connection:
+        assert connection.execute("SELECT 1 FROM sqlite_master WHERE name = ?",
+                                  [FTS_TABLE]).fetchone() is None
+        connection.execute("UPDATE objects SET label = label WHERE id = 1")
+
+    assert index.LuxIndex(scratch_db).refresh() == 1
+    for terms in SEARCHES:
+        assert LuxQuery(scratch_db).search(**terms) == LuxQuery(live_db).search(**terms)
+
+def test_inserted_department_dirties_its_objects(scratch_db):
+    index.LuxIndex(scratch_db).build()
+    with closing(connect(scratch_db, isolation_level=None)) as connection:
+        connection.execute("INSERT INTO departments VALUES (?, 'Found')", [DANGLING_DEPARTMENT])
+
+    # the live query answers until the refresh, the search table after it
+    for refresh in (lambda: None, index.LuxIndex(scratch_db).refresh):
+        refresh()
+        assert LuxQuery(scratch_db).count(dep="found") == len(DANGLING_DEPARTMENT_OBJECTS)
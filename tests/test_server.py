@@ -0,0 +1,69 @@
+"""Tests of the query server and its client against the CLIs run directly."""
+
+import io
+import json
+import socket
+import threading
+
+import pytest
+
+import luxclient
+from lux import LuxCLI
+from luxdetails import LuxDetailsCLI
+from server import LuxServer
+
+RUNS = [(LuxCLI, ["-a", "an"]), (LuxCLI, ["-l", "o", "--all", "--page-size", "7"]),
+        (LuxCLI, ["-d", "art", "--format", "csv"]), (LuxCLI, ["--page", "0"]),
+        (LuxDetailsCLI, ["1", "2", "9999"]), (LuxDetailsCLI, ["-", "--format", "jsonl"]),
+        (LuxDetailsCLI, ["--help"])]
+
+@pytest.fixture
+def socket_name(live_db, tmp_path, monkeypatch):
+    """Socket of a LuxServer serving live_db from a thread."""
+
+    name = str(tmp_path / "lux.sock")
+    server = LuxServer(name, live_db)
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.01},
+                              daemon=True)
+    thread.start()
+    monkeypatch.setenv("LUX_SOCKET", name)
+    yield name
+    server.shutdown()
+    server.server_close()
+
+@pytest.mark.usefixtures("socket_name")
+@pytest.mark.parametrize("columns", [None, 60])
+@pytest.mark.parametrize("cli, argv", RUNS, ids=lambda run: " ".join(run)
+                         if isinstance(run, list) else run.__name__)
+def test_client_output_matches_cli(live_db, capsys, monkeypatch, cli, argv, columns):
+    # pylint: disable=too-many-arguments
+    monkeypatch.setattr(luxclient, "terminal_columns", lambda: columns)
+    monkeypatch.setattr("sys.stdin", io.StringIO("3 4\n"))
+    prog = "lux" if cli is LuxCLI else "luxdetails"
+    status = luxclient.main([prog] + argv)
+    served = capsys.readouterr()
+
+    out, err = io.StringIO(), io.StringIO()
+    streams = {"stdout": out, "stderr": err, "columns": columns}
+    if cli is LuxDetailsCLI:
+        streams["stdin"] = io.StringIO("3 4\n")
+    try:
+        cli(live_db, argv, **streams)
+        direct_status = 0
+    except SystemExit as exit_err:
+        direct_status = exit_err.code or 0
+
+    assert (served.out, served.err, status) == (out.getvalue(), err.getvalue(), direct_status)
+
+def test_output_is_streamed(socket_name):
+    request = {"prog": "lux", "argv": ["--all"], "columns": None, "stdin": None}
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_name)
+        sock.sendall(json.dumps(request).encode("utf-8"))
+        sock.shutdown(socket.SHUT_WR)
+        with sock.makefile("rb") as response:
+            messages = [json.loads(line) for line in response]
+
+    assert messages[-1] == {"status": 0}
+    assert len(messages) > 100
+    assert all(list(message) == ["stdout"] for message in messages[:-1])